@@ -128,9 +128,13 @@ class ReferenceDataAPI:
         load_type: str = "fullload",
         table_name: Optional[str] = None,
         target_schema: str = "ref",
-        config_reference_data: bool = False
+        config_reference_data: bool = False,
+        resume: bool = False,
+        key_columns: Optional[List[str]] = None
     ) -> Dict[str, Any]:
-        """Process a file asynchronously using existing ingestion logic"""
+        """Process a file asynchronously using existing ingestion logic.
+        resume=True continues an interrupted load of the same file from its last checkpoint.
+        key_columns is the business key for load_type='upsert'."""
         try:
             # Extract table name if not provided
             if table_name is None:
@@ -166,7 +170,8 @@ class ReferenceDataAPI:
                 "processing_options": {
                     "encoding": "utf-8",
                     "skip_blank_lines": True,
-                    "strip_whitespace": True
+                    "strip_whitespace": True,
+                    "key_columns": key_columns or []
                 }
             }
 
@@ -184,7 +189,8 @@ class ReferenceDataAPI:
                 filename=Path(file_path).name,
                 override_load_type=load_type,
                 config_reference_data=config_reference_data,
-                target_schema=target_schema
+                target_schema=target_schema,
+                resume=resume
             ):
                 messages.append(message)
                 self.logger.info(f"Ingestion progress: {message}")
@@ -218,7 +224,9 @@ class ReferenceDataAPI:
         load_type: str = "fullload",
         table_name: Optional[str] = None,
         target_schema: str = "ref",
-        config_reference_data: bool = False
+        config_reference_data: bool = False,
+        resume: bool = False,
+        key_columns: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """Synchronous wrapper for file processing"""
         try:
@@ -235,7 +243,7 @@ class ReferenceDataAPI:
                     try:
                         return new_loop.run_until_complete(
                             self.process_file_async(
-                                file_path, load_type, table_name, target_schema, config_reference_data
+                                file_path, load_type, table_name, target_schema, config_reference_data, resume, key_columns
                             )
                         )
                     finally:
@@ -248,7 +256,7 @@ class ReferenceDataAPI:
                 # Loop exists but not running, use it
                 return loop.run_until_complete(
                     self.process_file_async(
-                        file_path, load_type, table_name, target_schema, config_reference_data
+                        file_path, load_type, table_name, target_schema, config_reference_data, resume, key_columns
                     )
                 )
         except RuntimeError:
@@ -258,7 +266,7 @@ class ReferenceDataAPI:
             try:
                 return loop.run_until_complete(
                     self.process_file_async(
-                        file_path, load_type, table_name, target_schema, config_reference_data
+                        file_path, load_type, table_name, target_schema, config_reference_data, resume, key_columns
                     )
                 )
             finally:
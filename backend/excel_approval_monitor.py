@@ -103,6 +103,7 @@ class ExcelApprovalMonitor:
                     time.sleep(APPROVAL_CHECK_INTERVAL)  # Continue monitoring despite errors
 
         finally:
+            self.workflow_manager.close()
             self.logger.info("Excel approval monitor stopped")
 
     def check_for_approvals(self):
@@ -186,7 +187,8 @@ class ExcelApprovalMonitor:
                 load_type=processing_config['load_type'],
                 table_name=table_name,
                 target_schema=processing_config.get('target_schema', 'ref'),
-                config_reference_data=processing_config.get('is_reference_data', False)
+                config_reference_data=processing_config.get('is_reference_data', False),
+                key_columns=processing_config.get('key_columns')
             )
 
             # Process the result and update workflow
@@ -319,16 +321,20 @@ class ExcelApprovalMonitor:
             # For now, we'll just check pending workflows periodically
             reviewing_workflows = self.workflow_manager.get_pending_workflows()
 
+            ready_workflow_ids = []
             for workflow in reviewing_workflows:
                 excel_path = workflow.get('excel_file_path')
                 if excel_path and os.path.exists(excel_path):
                     # Check if Excel is now ready for processing
                     if self.excel_processor.is_excel_ready_for_processing(excel_path):
-                        # Move back to excel_generated state for processing
-                        self.workflow_manager.update_status(
-                            workflow['workflow_id'],
-                            self.workflow_manager.STATES['EXCEL_GENERATED']
-                        )
+                        ready_workflow_ids.append(workflow['workflow_id'])
+
+            # Move back to excel_generated state for processing
+            if ready_workflow_ids:
+                self.workflow_manager.update_statuses(
+                    ready_workflow_ids,
+                    self.workflow_manager.STATES['EXCEL_GENERATED']
+                )
 
         except Exception as e:
             self.logger.error(f"Error checking for Excel modifications: {str(e)}")
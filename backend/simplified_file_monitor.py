@@ -47,6 +47,12 @@ class SimplifiedFileMonitor:
         # File tracking for stability checks
         self.file_tracking = {}  # {file_path: {'size': int, 'mtime': float, 'stable_count': int}}
 
+        # CSV paths with an open workflow, loaded once per monitoring cycle and extended as workflows
+        # are created, so processing checks are local set lookups instead of one query per file
+        self.active_file_paths = None  # Set[str] once loaded
+        self.cycle_db_round_trips = 0
+        self.last_cycle_db_round_trips = None
+
         # Initialize backend API for format detection
         try:
             self.api = ReferenceDataAPI()
@@ -98,6 +104,10 @@ class SimplifiedFileMonitor:
         try:
             while True:
                 try:
+                    # Load open workflows once for this cycle
+                    self.cycle_db_round_trips = 0
+                    self.refresh_active_workflows()
+
                     # Scan for new files
                     self.scan_simplified_directory()
 
@@ -107,6 +117,8 @@ class SimplifiedFileMonitor:
                     # Clean up old tracking entries
                     self.cleanup_tracking()
 
+                    self.last_cycle_db_round_trips = self.cycle_db_round_trips
+
                     # Sleep for monitoring interval
                     time.sleep(MONITOR_INTERVAL)
 
@@ -118,6 +130,7 @@ class SimplifiedFileMonitor:
                     time.sleep(MONITOR_INTERVAL)  # Continue monitoring despite errors
 
         finally:
+            self.workflow_manager.close()
             self.logger.info("Simplified file monitor stopped")
 
     def scan_simplified_directory(self):
@@ -173,7 +186,10 @@ class SimplifiedFileMonitor:
         """
         try:
             # Create workflow in database
+            self.cycle_db_round_trips += 1
             workflow_id = self.workflow_manager.create_workflow(csv_path)
+            if self.active_file_paths is not None:
+                self.active_file_paths.add(csv_path)
 
             # Detect CSV format
             self.logger.info(f"Detecting format for: {csv_path}")
@@ -188,6 +204,7 @@ class SimplifiedFileMonitor:
             excel_path = self.excel_generator.generate_form(csv_path, format_data, workflow_id)
 
             # Update workflow with Excel path
+            self.cycle_db_round_trips += 1
             self.workflow_manager.update_status(
                 workflow_id,
                 self.workflow_manager.STATES['EXCEL_GENERATED'],
@@ -203,6 +220,7 @@ class SimplifiedFileMonitor:
 
             # Update workflow to error state if workflow was created
             if 'workflow_id' in locals():
+                self.cycle_db_round_trips += 1
                 self.workflow_manager.update_status(
                     workflow_id,
                     self.workflow_manager.STATES['ERROR'],
@@ -210,25 +228,21 @@ class SimplifiedFileMonitor:
                 )
             return None
 
+    def refresh_active_workflows(self):
+        """Reload the CSV paths that already have an open workflow (one query)"""
+        self.cycle_db_round_trips += 1
+        active_file_paths = self.workflow_manager.get_active_file_paths()
+        if active_file_paths is not None:
+            self.active_file_paths = active_file_paths
+        elif self.active_file_paths is None:
+            # Assume nothing is being processed if we can't check; otherwise keep the last known set
+            self.active_file_paths = set()
+
     def is_file_being_processed(self, file_path: str) -> bool:
         """Check if file is already in a workflow"""
-        try:
-            # Query database for existing workflow with this file
-            query_sql = """
-            SELECT workflow_id FROM ref.Excel_Workflow_Tracking
-            WHERE csv_file_path = ? AND status NOT IN ('completed', 'error')
-            """
-
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(query_sql, (file_path,))
-                result = cursor.fetchone()
-
-            return result is not None
-
-        except Exception as e:
-            self.logger.error(f"Error checking file processing status: {str(e)}")
-            return False  # Assume not being processed if we can't check
+        if self.active_file_paths is None:
+            self.refresh_active_workflows()
+        return file_path in self.active_file_paths
 
     def is_file_stable(self, file_path: str) -> bool:
         """
@@ -293,6 +307,11 @@ class SimplifiedFileMonitor:
 
     def _log_stability_status(self):
         """Log current file stability status"""
+        if self.last_cycle_db_round_trips is not None:
+            self.logger.info(
+                f"Last monitoring cycle made {self.last_cycle_db_round_trips} database round trips "
+                f"({len(self.active_file_paths or ())} active workflow files)"
+            )
         if self.file_tracking:
             self.logger.info(f"Currently tracking {len(self.file_tracking)} files for stability")
             for file_path, info in self.file_tracking.items():
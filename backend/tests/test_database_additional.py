@@ -141,15 +141,11 @@ class TestDatabaseAdditionalMethods:
             with patch('builtins.print') as mock_print:
                 db_manager.ensure_metadata_columns(mock_conn, "test_table", "ref")
         
-        # Should execute ALTER TABLE commands to add missing columns
-        assert mock_cursor.execute.call_count == 2
-        calls = mock_cursor.execute.call_args_list
-        
-        alter1 = calls[0][0][0]
-        alter2 = calls[1][0][0]
+        # Should add both missing columns in one ALTER TABLE command
+        assert mock_cursor.execute.call_count == 1
+        alter = mock_cursor.execute.call_args_list[0][0][0]
         
-        assert "ALTER TABLE [ref].[test_table] ADD [ref_data_loadtime] datetime DEFAULT GETDATE()" in alter1
-        assert "ALTER TABLE [ref].[test_table] ADD [ref_data_loadtype] varchar(255)" in alter2
+        assert alter == "ALTER TABLE [ref].[test_table] ADD [ref_data_loadtime] datetime DEFAULT GETDATE(), [ref_data_loadtype] varchar(255)"
 
     @patch.dict(os.environ, {
         'db_user': 'test_user',
@@ -0,0 +1,489 @@
+"""
+Tests for backup versioning helpers in DatabaseManager
+"""
+import sys
+import pytest
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+# pyodbc needs the unixODBC driver manager; mock it when unavailable
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    sys.modules['pyodbc'] = MagicMock()
+
+
+@pytest.fixture
+def db_manager():
+    with patch.dict('os.environ', {
+        'db_user': 'test_user',
+        'db_password': 'test_pass'
+    }):
+        from utils.database import DatabaseManager
+        manager = DatabaseManager()
+    manager.data_schema = 'ref'
+    manager.backup_schema = 'bkp'
+    return manager
+
+
+def test_table_fingerprint_hashes_data_columns_in_name_order(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (3, Decimal('123456789012345678901'))
+    columns = [
+        {'name': 'name', 'data_type': 'varchar'},
+        {'name': 'ref_data_loadtime', 'data_type': 'datetime'},
+        {'name': 'Amount', 'data_type': 'float'},
+        {'name': 'born', 'data_type': 'date'},
+        {'name': 'ref_data_row_hash', 'data_type': 'bigint'},
+    ]
+
+    with patch.object(db_manager, 'get_table_columns', return_value=columns):
+        result = db_manager.get_table_fingerprint(connection, 'people')
+
+    assert result == {'row_count': 3, 'content_hash': '123456789012345678901'}
+    sql = cursor.execute.call_args.args[0]
+    assert ("HASHBYTES('SHA2_256', COALESCE(CONVERT(nvarchar(max), [Amount], 3), N'~NULL~') + NCHAR(31) + "
+            "COALESCE(CONVERT(nvarchar(max), [born], 126), N'~NULL~') + NCHAR(31) + "
+            "COALESCE(CONVERT(nvarchar(max), [name]), N'~NULL~'))") in sql
+    assert 'ref_data_loadtime' not in sql and 'ref_data_row_hash' not in sql
+    assert "FROM [ref].[people]" in sql
+
+
+def test_table_fingerprint_of_empty_table(db_manager):
+    connection = MagicMock()
+    connection.cursor.return_value.fetchone.return_value = (0, None)
+
+    with patch.object(db_manager, 'get_table_columns', return_value=[{'name': 'name', 'data_type': 'varchar'}]):
+        assert db_manager.get_table_fingerprint(connection, 'people') == {'row_count': 0, 'content_hash': '0'}
+
+
+def test_get_latest_backup_version(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (4, 10, '99')
+
+    assert db_manager.get_latest_backup_version(connection, 'people') == {
+        'version_id': 4, 'row_count': 10, 'content_hash': '99'
+    }
+    sql, *params = cursor.execute.call_args.args
+    assert "FROM [bkp].[Backup_Version]" in sql and "ORDER BY [version_id] DESC" in sql
+    assert "[created_at] >= (SELECT [create_date] FROM sys.tables" in sql
+    assert params == ['people', 'people_backup', 'bkp']
+
+    cursor.fetchone.return_value = None
+    assert db_manager.get_latest_backup_version(connection, 'people') is None
+
+
+def test_backup_existing_data_records_version_in_catalog(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (5,)
+    cursor.rowcount = 12
+    columns = [{'name': 'name'}, {'name': 'ref_data_loadtime'}, {'name': 'ref_data_version_id'}]
+
+    with patch.object(db_manager, 'get_table_columns', return_value=columns):
+        rows = db_manager.backup_existing_data(connection, 'people', 'people', {'row_count': 12, 'content_hash': '77'})
+
+    assert rows == 12
+    statements = [c.args for c in cursor.execute.call_args_list]
+    backup = next(s for s in statements if s[0].startswith('INSERT INTO [bkp].[people_backup]'))
+    assert backup[1] == 5
+    catalog = statements[-1]
+    assert catalog[0].startswith('INSERT INTO [bkp].[Backup_Version]')
+    assert catalog[1:] == ('people', 5, 12, '77')
+    connection.commit.assert_called_once()
+    assert connection.autocommit is True
+
+
+BACKUP_COLUMNS = [
+    {'name': 'name'}, {'name': 'age'}, {'name': 'ref_data_loadtime'}, {'name': 'ref_data_loadtype'},
+    {'name': 'ref_data_version_id'},
+]
+
+
+def test_snapshot_version_walks_back_over_delta_versions(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+
+    cursor.fetchall.return_value = [(7,), (6,), (4,)]
+    assert db_manager._backup_snapshot_version(connection, 'people', 7) == 5
+    assert cursor.execute.call_args.args[1:] == ('people', 7)
+
+    cursor.fetchall.return_value = [(4,)]
+    assert db_manager._backup_snapshot_version(connection, 'people', 7) == 7
+
+
+def test_backup_writes_delta_against_previous_version(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (4,)
+    cursor.rowcount = 3
+    source = [{'name': 'name'}, {'name': 'age'}, {'name': 'ref_data_loadtime'}, {'name': 'ref_data_loadtype'}]
+    columns = lambda conn, table, schema: BACKUP_COLUMNS if table.endswith('_backup') else source
+
+    with patch.object(db_manager, 'get_table_columns', side_effect=columns), \
+         patch.object(db_manager, '_backup_snapshot_version', return_value=1) as snapshot:
+        rows = db_manager.backup_existing_data(
+            connection, 'people', 'people', {'row_count': 10, 'content_hash': '9'}, snapshot_interval=5
+        )
+
+    assert rows == 10
+    snapshot.assert_called_once_with(connection, 'people', 3)
+    statements = [c.args for c in cursor.execute.call_args_list]
+    assert ("ALTER TABLE [bkp].[people_backup] ADD [ref_data_backup_op] char(1) NULL",) in statements
+    delta = next(st for st in statements if 'UNION ALL' in st[0])
+    assert delta[1:] == (4, 1, 3)
+    sql = delta[0]
+    assert "SELECT [name] AS [name], [age] AS [age], 1 AS [w] FROM [ref].[people]" in sql
+    assert "-(CASE WHEN [ref_data_backup_op] = '-' THEN -1 ELSE 1 END) FROM [bkp].[people_backup]" in sql
+    assert "HAVING SUM([w]) <> 0" in sql
+    assert "TOP (ABS([diff].[ref_data_copies]))" in sql
+    catalog = statements[-1]
+    assert "[is_delta]) VALUES (?, ?, ?, ?, 1)" in catalog[0]
+    assert catalog[1:] == ('people', 4, 10, '9')
+    connection.commit.assert_called_once()
+
+
+def test_backup_writes_full_snapshot_when_interval_reached(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (6,)
+    cursor.rowcount = 10
+
+    with patch.object(db_manager, 'get_table_columns', return_value=BACKUP_COLUMNS[:2]), \
+         patch.object(db_manager, '_backup_snapshot_version', return_value=1):
+        rows = db_manager.backup_existing_data(connection, 'people', 'people', snapshot_interval=5)
+
+    assert rows == 10
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    assert not any('UNION ALL' in st for st in statements)
+    assert any(st.startswith("INSERT INTO [bkp].[people_backup] ([name], [age], [ref_data_loadtime]") for st in statements)
+
+
+def test_delta_backup_source_rebuilds_from_snapshot(db_manager):
+    connection = MagicMock()
+    columns = BACKUP_COLUMNS + [{'name': 'ref_data_backup_op'}]
+
+    with patch.object(db_manager, '_backup_snapshot_version', return_value=3), \
+         patch.object(db_manager, 'get_table_columns', return_value=columns):
+        assert db_manager._delta_backup_source(connection, 'people', 3) is None
+        source = db_manager._delta_backup_source(connection, 'people', 6)
+
+    assert source.startswith("(\n            SELECT [g].[name], [g].[age], [g].[ref_data_loadtime], 'backup' AS [ref_data_loadtype], "
+                             "6 AS [ref_data_version_id], CAST(NULL AS char(1)) AS [ref_data_backup_op] FROM (")
+    assert "WHERE [ref_data_version_id] BETWEEN 3 AND 6" in source
+    assert "GROUP BY [name], [age]" in source
+    assert "HAVING SUM(CASE WHEN [ref_data_backup_op] = '-' THEN -1 ELSE 1 END) > 0" in source
+    assert "TOP ([g].[ref_data_copies])" in source
+    assert source.endswith(") AS [version_rows]")
+
+
+def test_version_rows_and_rollback_read_delta_versions_through_reconstruction(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (2,)
+    cursor.fetchall.return_value = []
+    cursor.rowcount = 2
+
+    with patch.object(db_manager, '_delta_backup_source', return_value="(REBUILT) AS [version_rows]"), \
+         patch.object(db_manager, 'get_table_columns', return_value=BACKUP_COLUMNS[:2]), \
+         patch.object(db_manager, 'table_exists', side_effect=lambda conn, table, schema: table == 'people'):
+        page = db_manager.get_backup_version_rows(connection, 'people', 6, limit=10, offset=5)
+        paged = [c.args for c in cursor.execute.call_args_list]
+        cursor.reset_mock()
+        outcome = db_manager.rollback_to_version(connection, 'people', 6)
+
+    assert page['total_rows'] == 2
+    assert paged[0] == ("SELECT COUNT(*) FROM (REBUILT) AS [version_rows]",)
+    assert paged[1] == ("SELECT * FROM (REBUILT) AS [version_rows] ORDER BY 1 OFFSET ? ROWS FETCH NEXT ? ROWS ONLY", 5, 10)
+    assert outcome['status'] == 'success' and outcome['main_rows'] == 2
+    assert cursor.execute.call_args_list[-1].args == (
+        "INSERT INTO [ref].[people] ([name], [age]) SELECT [name], [age] FROM (REBUILT) AS [version_rows]",
+    )
+
+
+def test_list_backup_tables_reads_catalog_in_one_query(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchall.return_value = [
+        ('people_backup', 3, 3, '2026-01-02', 1, 0),
+        ('orders_backup', 1, 1, '2026-01-01', 0, 1),
+    ]
+
+    with patch.object(db_manager, 'table_exists') as table_exists:
+        result = db_manager.list_backup_tables(connection)
+
+    table_exists.assert_not_called()
+    assert result[0] == {
+        'backup_table': 'people_backup', 'base_name': 'people', 'has_main': True, 'has_stage': False,
+        'version_count': 3, 'latest_version': 3, 'last_backup_at': '2026-01-02'
+    }
+    assert result[1]['base_name'] == 'orders' and result[1]['has_stage'] is True
+    queries = [c for c in cursor.execute.call_args_list if 'INFORMATION_SCHEMA.TABLES' in c.args[0]]
+    assert len(queries) == 1
+    sql = queries[0].args[0]
+    assert "FROM [bkp].[Backup_Version]" in sql and "COUNT(DISTINCT" not in sql
+    assert "WHERE [cv].[created_at] >= [st].[create_date]" in sql
+    assert queries[0].args[1:] == ('bkp', 'ref', 'ref', 'bkp')
+
+
+def test_list_backup_tables_backfills_precatalog_versions_once(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchall.side_effect = [
+        [('people_backup', 1, 4, None, 1, 1), ('orders_backup', None, None, None, 1, 0)],
+        [('people_backup', 4, 4, None, 1, 1), ('orders_backup', None, None, None, 1, 0)],
+        [('people_backup', 4, 4, None, 1, 1), ('orders_backup', None, None, None, 1, 0)],
+    ]
+    cursor.rowcount = 3
+
+    result = db_manager.list_backup_tables(connection)
+
+    assert result[0]['version_count'] == 4
+    backfills = [c.args for c in cursor.execute.call_args_list if 'NOT EXISTS' in c.args[0]]
+    assert [b[1:] for b in backfills] == [('people', 'people'), ('orders', 'orders')]
+    assert "FROM [bkp].[people_backup] AS [b]" in backfills[0][0]
+
+    cursor.execute.reset_mock()
+    db_manager.list_backup_tables(connection)
+    assert not any('NOT EXISTS' in c.args[0] for c in cursor.execute.call_args_list)
+
+
+def test_get_backup_versions_from_catalog(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchall.return_value = [(3,), (2,), (1,)]
+
+    with patch.object(db_manager, 'table_exists') as table_exists:
+        assert db_manager.get_backup_versions(connection, 'people') == [3, 2, 1]
+
+    table_exists.assert_not_called()
+    sql, *params = cursor.execute.call_args.args
+    assert "FROM [bkp].[Backup_Version] WHERE [base_name] = ? AND [created_at] >= " in sql
+    assert sql.endswith("ORDER BY [version_id] DESC")
+    assert params == ['people', 'people_backup', 'bkp']
+    assert db_manager.get_backup_versions(connection, 'bad name;') == []
+
+
+PAGED_COLUMNS = BACKUP_COLUMNS + [{'name': 'ref_data_backup_row_id'}]
+
+
+def test_backup_version_page_seeks_past_cursor(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (5,)
+    cursor.fetchall.return_value = [('a', 1, None, 'backup', 2, 11), ('b', 2, None, 'backup', 2, 12),
+                                    ('c', 3, None, 'backup', 2, 15)]
+
+    with patch.object(db_manager, 'get_table_columns', return_value=PAGED_COLUMNS), \
+         patch.object(db_manager, '_delta_backup_source', return_value=None):
+        first = db_manager.get_backup_version_page(connection, 'people', 2, limit=2)
+        statements = [c.args for c in cursor.execute.call_args_list]
+        cursor.reset_mock()
+        cursor.fetchall.return_value = [('c', 3, None, 'backup', 2, 15)]
+        second = db_manager.get_backup_version_page(connection, 'people', 2, limit=2, cursor=first['next_cursor'])
+
+    assert first['total_rows'] == 5 and first['total_is_approximate'] is False
+    assert [r[0] for r in first['rows']] == ['a', 'b']
+    assert statements[0] == ("SELECT COUNT_BIG(*) FROM [bkp].[people_backup] WHERE [ref_data_version_id] = ?", 2)
+    assert statements[1] == (
+        "SELECT TOP (?) * FROM [bkp].[people_backup] WHERE [ref_data_version_id] = ? AND [ref_data_backup_row_id] > ? "
+        "ORDER BY [ref_data_backup_row_id]", 3, 2, 0
+    )
+    assert [c.args[1:] for c in cursor.execute.call_args_list] == [(3, 2, 12)]
+    assert second['total_rows'] is None
+    assert [r[0] for r in second['rows']] == ['c'] and second['next_cursor'] is None
+
+
+def test_backup_version_page_approximate_count_and_cursor_checks(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (1000000,)
+    cursor.fetchall.return_value = []
+
+    with patch.object(db_manager, 'get_table_columns', return_value=PAGED_COLUMNS), \
+         patch.object(db_manager, '_delta_backup_source', return_value=None):
+        page = db_manager.get_backup_version_page(connection, 'people', 2, approximate_count=True)
+        token = db_manager._encode_backup_cursor(3, {'r': 10})
+        wrong_version = db_manager.get_backup_version_page(connection, 'people', 2, cursor=token)
+        garbage = db_manager.get_backup_version_page(connection, 'people', 2, cursor='not-a-token')
+
+    assert page['total_rows'] == 1000000 and page['total_is_approximate'] is True
+    assert "FROM [bkp].[Backup_Version] WHERE [base_name] = ? AND [version_id] = ?" in cursor.execute.call_args_list[1].args[0]
+    assert not any('COUNT_BIG' in c.args[0] for c in cursor.execute.call_args_list)
+    assert wrong_version['error'] == garbage['error'] == 'Invalid cursor for this backup version'
+
+
+def test_backup_version_page_pages_delta_versions_by_rebuilt_row_id(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchall.return_value = []
+
+    with patch.object(db_manager, 'get_table_columns', return_value=PAGED_COLUMNS), \
+         patch.object(db_manager, '_delta_backup_source', return_value="(REBUILT) AS [version_rows]"):
+        token = db_manager._encode_backup_cursor(6, {'r': 40})
+        db_manager.get_backup_version_page(connection, 'people', 6, limit=20, cursor=token)
+
+    assert cursor.execute.call_args.args == (
+        "SELECT TOP (?) * FROM (REBUILT) AS [version_rows] WHERE [ref_data_backup_row_id] > ? "
+        "ORDER BY [ref_data_backup_row_id]", 21, 40
+    )
+
+
+def test_backup_version_page_falls_back_to_offset_without_row_id(db_manager):
+    connection = MagicMock()
+    rows = {'rows': [[1], [2], [3]], 'columns': ['name'], 'total_rows': 9}
+
+    with patch.object(db_manager, 'get_table_columns', return_value=BACKUP_COLUMNS), \
+         patch.object(db_manager, '_delta_backup_source', return_value=None), \
+         patch.object(db_manager, 'get_backup_version_rows', return_value=rows) as offset_rows:
+        token = db_manager._encode_backup_cursor(2, {'o': 4})
+        page = db_manager.get_backup_version_page(connection, 'people', 2, limit=2, cursor=token)
+
+    offset_rows.assert_called_once_with(connection, 'people', 2, 3, 4)
+    assert page['rows'] == [[1], [2]]
+    assert db_manager._decode_backup_cursor(page['next_cursor'], 2) == {'o': 6}
+
+
+def test_new_backup_tables_get_row_id_and_clustered_index(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (0,)
+
+    db_manager.create_backup_table(connection, 'people', [{'name': 'name', 'data_type': 'varchar(50)'}])
+
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    create = next(st for st in statements if st.startswith('CREATE TABLE'))
+    assert "[ref_data_backup_row_id] bigint IDENTITY(1,1) NOT NULL" in create
+    assert ("ON [bkp].[people_backup] ([ref_data_version_id], [ref_data_backup_row_id])" in statements[-1])
+
+
+def test_rename_fallback_moves_catalog_rows_with_renamed_table(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (1,)
+    db_manager._backup_catalog_backfilled.add('people')
+
+    with patch.object(db_manager, '_backup_schema_matches', return_value=False), \
+         patch.object(db_manager, '_sync_backup_table_schema', return_value={'success': False, 'error': 'narrowing'}), \
+         patch.object(db_manager, '_get_timestamp_suffix', return_value='20240101_120000'):
+        db_manager.create_backup_table(connection, 'people', [{'name': 'name', 'data_type': 'varchar(50)'}])
+
+    statements = [c.args for c in cursor.execute.call_args_list]
+    rename = next(i for i, st in enumerate(statements) if 'sp_rename' in st[0])
+    move = statements[rename + 1]
+    assert move[0] == "UPDATE [bkp].[Backup_Version] SET [base_name] = ? WHERE [base_name] = ?"
+    assert move[1:] == ('people_backup_20240101_120000', 'people')
+    connection.commit.assert_called_once()
+    assert connection.autocommit is True
+    assert any(st[0].startswith('CREATE TABLE [bkp].[people_backup]') for st in statements[rename + 2:])
+    assert 'people' not in db_manager._backup_catalog_backfilled
+
+
+def test_rename_fallback_rolls_back_when_catalog_move_fails(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (1,)
+    cursor.execute.side_effect = lambda sql, *args: (_ for _ in ()).throw(Exception('deadlock')) if sql.startswith('UPDATE') else None
+
+    with patch.object(db_manager, '_backup_schema_matches', return_value=False), \
+         patch.object(db_manager, '_sync_backup_table_schema', return_value={'success': False, 'error': 'narrowing'}):
+        with pytest.raises(Exception, match='deadlock'):
+            db_manager.create_backup_table(connection, 'people', [{'name': 'name', 'data_type': 'varchar(50)'}])
+
+    connection.rollback.assert_called_once()
+    assert connection.autocommit is True
+
+
+def test_backfill_purges_catalog_rows_older_than_backup_table(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.rowcount = 2
+
+    db_manager._backfill_backup_catalog(connection, 'people')
+
+    statements = [c.args for c in cursor.execute.call_args_list]
+    purge = next(i for i, st in enumerate(statements) if st[0].strip().startswith('DELETE'))
+    assert "NOT ([created_at] >= (SELECT [create_date] FROM sys.tables" in statements[purge][0]
+    assert statements[purge][1:] == ('people', 'people_backup', 'bkp', '[bkp].[people_backup]')
+    assert 'NOT EXISTS' in statements[purge + 1][0]
+
+
+def test_first_backup_version_purges_stale_catalog_rows_in_its_transaction(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (1,)
+    cursor.rowcount = 5
+
+    with patch.object(db_manager, 'get_table_columns', return_value=BACKUP_COLUMNS):
+        db_manager.backup_existing_data(connection, 'people', 'people')
+
+    statements = [c.args[0].strip() for c in cursor.execute.call_args_list]
+    purge = next(i for i, st in enumerate(statements) if st.startswith('DELETE'))
+    insert = next(i for i, st in enumerate(statements) if st.startswith('INSERT INTO [bkp].[Backup_Version]'))
+    assert purge < insert
+    connection.commit.assert_called_once()
+
+
+def test_metadata_column_sync_leaves_row_id_retrofit_to_the_migration(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+
+    with patch.object(db_manager, 'get_table_columns', return_value=[{'name': 'name', 'data_type': 'varchar'}]):
+        result = db_manager.ensure_backup_table_metadata_columns(connection, 'people_backup')
+
+    assert [a['column'] for a in result['added']] == ['ref_data_loadtime', 'ref_data_loadtype', 'ref_data_version_id']
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    assert len(statements) == 1 and statements[0].startswith('ALTER TABLE [bkp].[people_backup] ADD')
+    assert 'ref_data_backup_row_id' not in statements[0] and 'INDEX' not in statements[0]
+
+
+class _VersionRowsCursor:
+    """Cursor answering the paging queries over an in-memory version, ordered as the SQL asks"""
+
+    def __init__(self, rows, row_id_index):
+        self.rows = rows
+        self.row_id_index = row_id_index
+        self.result = []
+
+    def execute(self, sql, *params):
+        if 'COUNT' in sql:
+            self.result = [(len(self.rows),)]
+        elif 'OFFSET ? ROWS' in sql:
+            key = self.row_id_index if 'ORDER BY [ref_data_backup_row_id]' in sql else 0
+            offset, limit = params
+            self.result = sorted(self.rows, key=lambda r: r[key])[offset:offset + limit]
+        elif 'TOP (?)' in sql:
+            limit, after = params[0], params[-1]
+            ordered = sorted(self.rows, key=lambda r: r[self.row_id_index])
+            self.result = [r for r in ordered if r[self.row_id_index] > after][:limit]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+def test_delta_version_keyset_pages_match_offset_pages(db_manager):
+    # Rebuilt delta rows: name, age, row id (ROW_NUMBER over the data columns)
+    rebuilt = [('zed', 1, 1), ('amy', 2, 2), ('bob', 3, 3), ('cat', 4, 4), ('dan', 5, 5)]
+    columns = [{'name': 'name'}, {'name': 'age'}, {'name': 'ref_data_backup_row_id'}]
+    connection = MagicMock()
+    connection.cursor.return_value = _VersionRowsCursor(rebuilt, 2)
+
+    with patch.object(db_manager, 'get_table_columns', return_value=columns), \
+         patch.object(db_manager, '_delta_backup_source', return_value="(REBUILT) AS [version_rows]"):
+        keyset, token = [], None
+        while True:
+            page = db_manager.get_backup_version_page(connection, 'people', 6, limit=2, cursor=token)
+            keyset.extend(page['rows'])
+            token = page['next_cursor']
+            if not token:
+                break
+        offset = []
+        for start in range(0, len(rebuilt), 2):
+            offset.extend(db_manager.get_backup_version_rows(connection, 'people', 6, limit=2, offset=start)['rows'])
+
+    assert keyset == offset == [list(r) for r in rebuilt]
@@ -580,8 +580,8 @@ class TestDatabaseBackupOperations:
             with patch('builtins.print'):
                 db_manager.create_backup_table(mock_conn, "test_table", columns)
         
-        # Should execute existence check and CREATE TABLE
-        assert mock_cursor.execute.call_count == 2
+        # Should execute existence check, CREATE TABLE and the clustered (version, row id) index
+        assert mock_cursor.execute.call_count == 3
         calls = mock_cursor.execute.call_args_list
         create_sql = calls[1][0][0]
         
@@ -790,9 +790,9 @@ class TestDatabaseErrorHandling:
         'db_password': 'test_pass'
     })
     @patch('utils.database.pyodbc')
-    @patch('utils.database.time.sleep')
-    def test_pooled_connection_recursive_call(self, mock_sleep, mock_pyodbc):
-        """Test pooled connection recursive waiting"""
+    def test_pooled_connection_waits_for_release(self, mock_pyodbc):
+        """Test an exhausted pool hands a released connection to the waiting caller"""
+        import threading
         from utils.database import DatabaseManager
         
         mock_conn = MagicMock()
@@ -800,26 +800,20 @@ class TestDatabaseErrorHandling:
         
         db_manager = DatabaseManager()
         db_manager.pool_size = 1
+        held = db_manager.get_pooled_connection()
         
-        # Simulate pool being full by setting _in_use to pool_size
-        db_manager._in_use = 1
-        
-        # Mock get_connection to return a connection after one sleep cycle
-        original_get_connection = db_manager.get_connection
-        call_count = 0
+        # The only slot is checked out: a short wait times out
+        with pytest.raises(TimeoutError):
+            db_manager.get_pooled_connection(timeout=0.01)
         
-        def mock_get_connection():
-            nonlocal call_count
-            call_count += 1
-            if call_count == 1:
-                # First call - simulate pool being full, trigger recursive call
-                db_manager._in_use = 0  # Reset for second call
-                return original_get_connection()
-            else:
-                return mock_conn
+        # A release from another thread wakes the waiter, which reuses the released connection
+        releaser = threading.Timer(0.05, db_manager.release_connection, args=(held,))
+        releaser.start()
+        result = db_manager.get_pooled_connection(timeout=5)
+        releaser.join()
         
-        with patch.object(db_manager, 'get_connection', side_effect=mock_get_connection):
-            result = db_manager.get_pooled_connection()
-        
-        assert result == mock_conn
-        mock_sleep.assert_called_with(0.05)
\ No newline at end of file
+        assert result is held
+        stats = db_manager.get_pool_stats()
+        assert stats['created'] == 1
+        assert stats['timeouts'] == 1
+        assert stats['in_use'] == 1
\ No newline at end of file
@@ -219,10 +219,10 @@ class TestDatabaseBackupOperations:
             # Should attempt to add missing metadata columns
             assert 'added' in result
             assert len(result['added']) == 3  # All three metadata columns should be added
-            # Should have called ALTER TABLE to add missing columns
+            # Should have called ALTER TABLE once to add all missing columns
             alter_calls = [call for call in mock_cursor.execute.call_args_list 
                           if 'ALTER TABLE' in str(call)]
-            assert len(alter_calls) == 3
+            assert len(alter_calls) == 1
 
     def test_validation_procedure_execution_json_parsing_lines_676_690(self):
         """Test validation procedure execution with JSON parsing - covers lines 676-690"""
@@ -471,12 +471,8 @@ class TestDatabaseConfigurationEdgeCases:
         
         # Mock backup tables with version information
         mock_cursor.fetchall.side_effect = [
-            # Backup tables query
-            [('table1_backup', 100), ('table2_backup', 50)],
-            # Version query for table1 (exception scenario)
-            Exception("Version query failed"),
-            # Version query for table2
-            [(1, 5)]
+            # Backup tables joined with the version catalog
+            [('table1_backup', 100, 100, None, 1, 1), ('table2_backup', 50, 50, None, 1, 0)],
         ]
         
         with patch.object(db_manager, 'table_exists', return_value=True):
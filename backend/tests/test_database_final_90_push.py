@@ -74,10 +74,11 @@ class TestDatabaseManagerFinal90Push:
                 # Should have detected mismatched columns
                 assert len(result['mismatched']) >= 1
                 
-                # Should execute ALTER TABLE statements for new columns
+                # Should execute one ALTER TABLE statement for all new columns
                 alter_calls = [call for call in mock_cursor.execute.call_args_list 
                              if call[0] and 'ALTER TABLE' in call[0][0] and 'ADD' in call[0][0]]
-                assert len(alter_calls) >= 2
+                assert len(alter_calls) == 1
+                assert '[description] varchar(255), [age] int' in alter_calls[0][0][0]
                 
                 # Should commit changes
                 mock_conn.commit.assert_called()
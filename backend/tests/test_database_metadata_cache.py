@@ -0,0 +1,158 @@
+"""
+Tests for table metadata caching and batched column DDL in DatabaseManager
+"""
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+
+# pyodbc needs the unixODBC driver manager; mock it when unavailable
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    sys.modules['pyodbc'] = MagicMock()
+
+
+@pytest.fixture
+def db_manager():
+    with patch.dict('os.environ', {
+        'db_user': 'test_user',
+        'db_password': 'test_pass'
+    }):
+        from utils.database import DatabaseManager
+        manager = DatabaseManager()
+    manager.data_schema = 'ref'
+    manager.backup_schema = 'bkp'
+    return manager
+
+
+def column_row(name):
+    row = MagicMock()
+    row.COLUMN_NAME = name
+    row.DATA_TYPE = 'varchar'
+    row.IS_NULLABLE = 'YES'
+    return row
+
+
+def test_lookups_are_not_cached_outside_a_scope(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (1,)
+
+    assert db_manager.table_exists(connection, 'people') is True
+    assert db_manager.table_exists(connection, 'people') is True
+    assert cursor.execute.call_count == 2
+
+
+def test_scope_caches_existence_schema_and_columns(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.side_effect = [(1,), ('ref',)]
+    cursor.fetchall.return_value = [column_row('name'), column_row('age')]
+
+    db_manager.begin_metadata_cache(connection)
+    for _ in range(3):
+        assert db_manager.table_exists(connection, 'people') is True
+        assert db_manager.table_exists(connection, 'People', 'ref') is True
+        assert db_manager.get_table_schema(connection, 'people') == 'ref'
+        columns = db_manager.get_table_columns(connection, 'people')
+        assert [c['name'] for c in columns] == ['name', 'age']
+        # Callers' changes do not leak into the cache
+        columns[0]['name'] = 'changed'
+    assert cursor.execute.call_count == 3
+
+    db_manager.end_metadata_cache(connection)
+    cursor.fetchone.side_effect = None
+    cursor.fetchone.return_value = (0,)
+    assert db_manager.table_exists(connection, 'people') is False
+
+
+def test_scope_is_per_connection(db_manager):
+    first, second = MagicMock(), MagicMock()
+    first.cursor.return_value.fetchone.return_value = (1,)
+    second.cursor.return_value.fetchone.return_value = (0,)
+
+    db_manager.begin_metadata_cache(first)
+    assert db_manager.table_exists(first, 'people') is True
+    assert db_manager.table_exists(second, 'people') is False
+    assert db_manager.table_exists(second, 'people') is False
+    assert second.cursor.return_value.execute.call_count == 2
+
+
+def test_ddl_invalidates_the_altered_table_only(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (1,)
+    cursor.fetchall.return_value = [column_row('name')]
+
+    db_manager.begin_metadata_cache(connection)
+    db_manager.get_table_columns(connection, 'people')
+    db_manager.get_table_columns(connection, 'orders')
+    db_manager.table_exists(connection, 'people_backup', 'bkp')
+
+    db_manager.sync_main_table_columns(connection, 'people', [{'name': 'name', 'data_type': 'varchar(50)'},
+                                                              {'name': 'age', 'data_type': 'varchar(50)'}])
+    cursor.fetchall.return_value = [column_row('name'), column_row('age')]
+    cursor.execute.reset_mock()
+
+    assert [c['name'] for c in db_manager.get_table_columns(connection, 'people')] == ['name', 'age']
+    assert [c['name'] for c in db_manager.get_table_columns(connection, 'orders')] == ['name']
+    assert db_manager.table_exists(connection, 'people_backup', 'bkp') is True
+    assert cursor.execute.call_count == 1
+
+    db_manager.create_table(connection, 'people_backup', [{'name': 'name', 'data_type': 'varchar(50)'}], schema='bkp')
+    db_manager.drop_table_if_exists(connection, 'orders')
+    cursor.execute.reset_mock()
+    db_manager.table_exists(connection, 'people_backup', 'bkp')
+    db_manager.get_table_columns(connection, 'orders')
+    assert cursor.execute.call_count == 2
+
+
+def test_missing_columns_are_added_in_one_alter(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    existing = [{'name': 'id', 'data_type': 'varchar', 'max_length': 50}]
+    file_columns = [{'name': 'id', 'data_type': 'varchar(50)'}] + \
+        [{'name': f'c{i}', 'data_type': 'varchar(50)'} for i in range(300)]
+
+    with patch.object(db_manager, 'get_table_columns', return_value=existing):
+        plan = db_manager.sync_main_table_columns(connection, 'vendor', file_columns, dry_run=True)
+        cursor.execute.assert_not_called()
+        actions = db_manager.sync_main_table_columns(connection, 'vendor', file_columns)
+
+    assert plan['dry_run'] is True and len(plan['added']) == 300
+    assert cursor.execute.call_count == 1
+    assert actions['ddl'] == plan['ddl'] == [cursor.execute.call_args.args[0]]
+    assert actions['ddl'][0].startswith("ALTER TABLE [ref].[vendor] ADD [c0] varchar(50), [c1] varchar(50), ")
+
+
+def test_failed_batch_add_falls_back_to_one_column_at_a_time(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.execute.side_effect = lambda sql: (_ for _ in ()).throw(Exception('bad type')) \
+        if ', ' in sql or '[bad]' in sql else None
+    file_columns = [{'name': 'good', 'data_type': 'varchar(10)'}, {'name': 'bad', 'data_type': 'nope'}]
+
+    with patch.object(db_manager, 'get_table_columns', return_value=[]):
+        actions = db_manager.sync_main_table_columns(connection, 'vendor', file_columns)
+
+    assert [a['column'] for a in actions['added']] == ['good']
+    assert actions['ddl'][1:] == ["ALTER TABLE [ref].[vendor] ADD [good] varchar(10)",
+                                  "ALTER TABLE [ref].[vendor] ADD [bad] nope"]
+
+
+def test_backup_sync_batches_adds_and_plans_alters(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    existing = [{'name': 'name', 'data_type': 'varchar', 'max_length': 10}, {'name': 'ref_data_version_id', 'data_type': 'int'}]
+    expected = [{'name': 'name', 'data_type': 'varchar', 'max_length': 20},
+                {'name': 'a', 'data_type': 'int'}, {'name': 'b', 'data_type': 'int'}]
+
+    with patch.object(db_manager, 'get_table_columns', return_value=existing):
+        result = db_manager._sync_backup_table_schema(connection, 'people_backup', expected, dry_run=True)
+
+    cursor.execute.assert_not_called()
+    assert result['success'] is True
+    assert result['changes']['ddl'] == [
+        "ALTER TABLE [bkp].[people_backup] ALTER COLUMN [name] varchar(20)",
+        "ALTER TABLE [bkp].[people_backup] ADD [a] int, [b] int",
+    ]
@@ -0,0 +1,119 @@
+"""
+Tests for the DatabaseManager connection pool
+"""
+import sys
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+# pyodbc needs the unixODBC driver manager; mock it when unavailable
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    sys.modules['pyodbc'] = MagicMock()
+
+
+@pytest.fixture
+def db_manager():
+    with patch.dict('os.environ', {
+        'db_user': 'test_user',
+        'db_password': 'test_pass'
+    }):
+        from utils.database import DatabaseManager
+        manager = DatabaseManager()
+    manager.pool_size = 2
+    manager.pool_timeout = 1
+    manager.pool_max_lifetime = 1800
+    manager.pool_validate_idle = 30
+    return manager
+
+
+def new_connection():
+    connection = MagicMock()
+    connection.autocommit = True
+    return connection
+
+
+def test_checkout_reuses_released_connection(db_manager):
+    with patch.object(db_manager, 'get_connection', side_effect=new_connection) as connect:
+        with db_manager.pooled_connection() as first:
+            pass
+        with db_manager.pooled_connection() as second:
+            assert db_manager.get_pool_stats()['in_use'] == 1
+
+    assert first is second
+    assert connect.call_count == 1
+    stats = db_manager.get_pool_stats()
+    assert stats['in_use'] == 0 and stats['idle'] == 1
+    assert stats['checkouts'] == 2 and stats['created'] == 1
+    assert sum(stats['wait_ms_histogram'].values()) == 2
+    assert sum(stats['checkout_ms_histogram'].values()) == 2
+
+
+def test_exhausted_pool_waits_for_release(db_manager):
+    with patch.object(db_manager, 'get_connection', side_effect=new_connection):
+        held = [db_manager.get_pooled_connection(), db_manager.get_pooled_connection()]
+        releaser = threading.Timer(0.1, db_manager.release_connection, args=(held[0],))
+        releaser.start()
+        started = time.monotonic()
+        connection = db_manager.get_pooled_connection(timeout=5)
+        releaser.join()
+
+    assert connection is held[0]
+    assert 0.05 < time.monotonic() - started < 5
+    assert db_manager.get_pool_stats()['wait_ms_histogram']['<=500ms'] == 1
+
+
+def test_exhausted_pool_times_out(db_manager):
+    with patch.object(db_manager, 'get_connection', side_effect=new_connection):
+        db_manager.get_pooled_connection()
+        db_manager.get_pooled_connection()
+        with pytest.raises(TimeoutError, match='within 0.05s'):
+            db_manager.get_pooled_connection(timeout=0.05)
+
+    assert db_manager.get_pool_stats()['timeouts'] == 1
+    assert db_manager._in_use == 2
+
+
+def test_idle_connection_is_validated_and_replaced_when_broken(db_manager, caplog):
+    db_manager.pool_validate_idle = 0
+    with patch.object(db_manager, 'get_connection', side_effect=new_connection):
+        stale = db_manager.get_pooled_connection()
+        db_manager.release_connection(stale)
+        stale.cursor.return_value.execute.side_effect = Exception('Communication link failure')
+        with caplog.at_level('WARNING', logger='utils.database'):
+            fresh = db_manager.get_pooled_connection()
+
+    assert fresh is not stale
+    stale.close.assert_called_once()
+    assert db_manager.get_pool_stats()['discarded'] == 1
+    assert 'Discarding broken pooled connection: Communication link failure' in caplog.text
+
+
+def test_connections_past_lifetime_are_not_reused(db_manager):
+    with patch.object(db_manager, 'get_connection', side_effect=new_connection):
+        old = db_manager.get_pooled_connection()
+        db_manager._conn_created[id(old)] -= 3600
+        db_manager.release_connection(old)
+
+    old.close.assert_called_once()
+    assert db_manager.get_pool_stats()['idle'] == 0
+
+
+def test_release_rolls_back_open_transaction(db_manager):
+    with patch.object(db_manager, 'get_connection', side_effect=new_connection):
+        with db_manager.pooled_connection() as connection:
+            connection.autocommit = False
+
+    connection.rollback.assert_called_once()
+    assert connection.autocommit is True
+    assert db_manager.get_pool_stats()['idle'] == 1
+
+
+def test_failed_connect_frees_the_slot(db_manager):
+    with patch.object(db_manager, 'get_connection', side_effect=Exception('login failed')):
+        with pytest.raises(Exception, match='login failed'):
+            db_manager.get_pooled_connection()
+
+    assert db_manager._in_use == 0
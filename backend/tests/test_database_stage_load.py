@@ -0,0 +1,363 @@
+"""
+Tests for the table-valued parameter load objects created by DatabaseManager
+"""
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+
+# pyodbc needs the unixODBC driver manager; mock it when unavailable
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    sys.modules['pyodbc'] = MagicMock()
+
+
+@pytest.fixture
+def db_manager():
+    with patch.dict('os.environ', {
+        'db_user': 'test_user',
+        'db_password': 'test_pass'
+    }):
+        from utils.database import DatabaseManager
+        manager = DatabaseManager()
+    manager.data_schema = 'ref'
+    manager.validation_sp_schema = 'val'
+    return manager
+
+
+def test_stage_load_object_names(db_manager):
+    objects = db_manager.get_stage_load_objects('people_stage')
+    assert objects == {
+        'schema': 'val',
+        'type': 'tt_ref_load_people_stage',
+        'procedure': 'sp_ref_load_people_stage',
+    }
+
+
+def test_create_stage_load_procedure_recreates_type_and_procedure(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    columns = [
+        {'name': 'name', 'data_type': 'varchar(50)'},
+        {'name': 'notes', 'data_type': 'varchar(MAX)'},
+    ]
+
+    objects = db_manager.create_stage_load_procedure(connection, 'people_stage', columns)
+
+    assert objects['procedure'] == 'sp_ref_load_people_stage'
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    assert statements[0] == "DROP PROCEDURE IF EXISTS [val].[sp_ref_load_people_stage]"
+    assert statements[1] == "DROP TYPE IF EXISTS [val].[tt_ref_load_people_stage]"
+    assert statements[2] == (
+        "CREATE TYPE [val].[tt_ref_load_people_stage] AS TABLE ("
+        "[name] varchar(50), [notes] varchar(MAX), [ref_data_loadtime] datetime, [ref_data_loadtype] varchar(255))"
+    )
+    create_proc = statements[3]
+    assert "CREATE PROCEDURE [val].[sp_ref_load_people_stage]" in create_proc
+    assert "@rows [val].[tt_ref_load_people_stage] READONLY" in create_proc
+    assert ("INSERT INTO [ref].[people_stage] ([name], [notes], [ref_data_loadtime], [ref_data_loadtype])"
+            in create_proc)
+    assert "SELECT [name], [notes], [ref_data_loadtime], [ref_data_loadtype] FROM @rows" in create_proc
+
+
+def test_create_table_heap_has_no_default_constraint(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    columns = [{'name': 'name', 'data_type': 'varchar(50)'}]
+
+    db_manager.create_table(connection, 'people_stage', columns, heap=True)
+    heap_sql = cursor.execute.call_args.args[0]
+    db_manager.create_table(connection, 'people_stage', columns)
+    default_sql = cursor.execute.call_args.args[0]
+
+    assert "[ref_data_loadtime] datetime," in heap_sql
+    assert "DEFAULT" not in heap_sql
+    assert "[ref_data_loadtime] datetime DEFAULT GETDATE()" in default_sql
+
+
+def test_create_stage_load_procedure_tablock(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+
+    db_manager.create_stage_load_procedure(
+        connection, 'people_stage', [{'name': 'name', 'data_type': 'varchar(50)'}], tablock=True
+    )
+
+    create_proc = cursor.execute.call_args_list[3].args[0]
+    assert "INSERT INTO [ref].[people_stage] WITH (TABLOCK) ([name], [ref_data_loadtime], [ref_data_loadtype])" in create_proc
+
+
+def test_ingest_checkpoint_round_trip_sql(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (1500,)
+
+    db_manager.ensure_ingest_checkpoint_table(connection)
+    assert "CREATE TABLE [ref].[Ingest_Checkpoint]" in cursor.execute.call_args.args[0]
+
+    db_manager.save_ingest_checkpoint(connection, 'people_stage', 'abc', 1500)
+    sql, *params = cursor.execute.call_args.args
+    assert sql.strip().startswith("UPDATE [ref].[Ingest_Checkpoint]")
+    assert params == ['abc', 1500, 'people_stage', 'people_stage', 'abc', 1500]
+
+    assert db_manager.get_ingest_checkpoint(connection, 'people_stage', 'abc') == 1500
+    cursor.fetchone.return_value = None
+    assert db_manager.get_ingest_checkpoint(connection, 'people_stage', 'other') is None
+    connection.commit.assert_not_called()
+
+
+def test_count_failed_conversions_single_scan(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (2, None)
+
+    failed = db_manager.count_failed_conversions(
+        connection, 'prices_stage', {'price': 'decimal(4,2)', 'as_of': 'date'}
+    )
+
+    assert failed == {'price': 2, 'as_of': 0}
+    sql = cursor.execute.call_args.args[0]
+    assert sql.count('SELECT') == 1
+    assert "TRY_CONVERT(decimal(4,2), [price]) IS NULL" in sql
+    assert sql.endswith("FROM [ref].[prices_stage]")
+
+
+def test_create_table_identity_column(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+
+    db_manager.create_table(connection, 'people_stage', [{'name': 'name', 'data_type': 'varchar(50)'}],
+                            identity_column='ref_data_stage_row')
+    assert "[ref_data_stage_row] bigint IDENTITY(1,1) NOT NULL PRIMARY KEY CLUSTERED" in cursor.execute.call_args.args[0]
+
+    db_manager.create_table(connection, 'people_stage', [{'name': 'name', 'data_type': 'varchar(50)'}],
+                            heap=True, identity_column='ref_data_stage_row')
+    sql = cursor.execute.call_args.args[0]
+    assert "[ref_data_stage_row] bigint IDENTITY(1,1) NOT NULL" in sql
+    assert "PRIMARY KEY" not in sql
+
+
+def test_create_swap_table_copies_main_columns(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+
+    cursor.fetchall.return_value = []
+
+    assert db_manager.create_swap_table(connection, 'people') == 'people_swap'
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    assert statements[:2] == [
+        "DROP TABLE IF EXISTS [ref].[people_swap]",
+        "SELECT TOP 0 * INTO [ref].[people_swap] FROM [ref].[people]",
+    ]
+    # An unindexed main table gets no DDL beyond the two catalog lookups
+    assert len(statements) == 4
+
+
+def test_create_swap_table_mirrors_main_indexes_so_switch_is_taken(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchall.side_effect = [
+        [
+            (1, 'pk_people', 'CLUSTERED', True, True, False, None, 'id', False, False),
+            (2, 'ix_people_key', 'NONCLUSTERED', False, False, False, None, 'name', False, False),
+            (2, 'ix_people_key', 'NONCLUSTERED', False, False, False, None, 'region', True, False),
+            (3, 'ux_people_email', 'NONCLUSTERED', True, False, False, '([email] IS NOT NULL)', 'email', False, False),
+            (3, 'ux_people_email', 'NONCLUSTERED', True, False, False, '([email] IS NOT NULL)', 'name', False, True),
+        ],
+        [('ck_people_age', '([age]>=(0))')],
+    ]
+
+    db_manager.create_swap_table(connection, 'people')
+
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    assert statements[1] == "SELECT TOP 0 * INTO [ref].[people_swap] FROM [ref].[people]"
+    assert cursor.execute.call_args_list[2].args[1] == '[ref].[people]'
+    assert statements[4:] == [
+        "ALTER TABLE [ref].[people_swap] ADD CONSTRAINT [pk_people_swap] PRIMARY KEY CLUSTERED ([id])",
+        "CREATE NONCLUSTERED INDEX [ix_people_key] ON [ref].[people_swap] ([name], [region] DESC)",
+        "CREATE UNIQUE NONCLUSTERED INDEX [ux_people_email] ON [ref].[people_swap] ([email])"
+        " INCLUDE ([name]) WHERE ([email] IS NOT NULL)",
+        "ALTER TABLE [ref].[people_swap] WITH CHECK ADD CONSTRAINT [ck_people_age_swap] CHECK ([age]>=(0))",
+    ]
+
+    # With matching indexes the swap is the metadata switch, not the row copy
+    cursor.reset_mock()
+    cursor.execute.side_effect = None
+    assert db_manager.swap_in_table(connection, 'people') is True
+    assert "ALTER TABLE [ref].[people_swap] SWITCH TO [ref].[people]" in [
+        c.args[0] for c in cursor.execute.call_args_list
+    ]
+
+
+def test_swap_in_table_uses_metadata_switch(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+
+    assert db_manager.swap_in_table(connection, 'people') is True
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    assert statements == [
+        "TRUNCATE TABLE [ref].[people]",
+        "ALTER TABLE [ref].[people_swap] SWITCH TO [ref].[people]",
+        "DROP TABLE IF EXISTS [ref].[people_swap]",
+    ]
+    connection.commit.assert_called_once()
+    assert connection.autocommit is True
+
+
+def test_swap_in_table_falls_back_to_copy(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+
+    def execute(sql, *args):
+        if 'SWITCH' in sql:
+            raise Exception("ALTER TABLE SWITCH statement failed: index mismatch")
+    cursor.execute.side_effect = execute
+
+    with patch.object(db_manager, 'get_table_columns', return_value=[{'name': 'name'}, {'name': 'age'}]):
+        assert db_manager.swap_in_table(connection, 'people') is False
+
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    assert statements[2:] == [
+        "TRUNCATE TABLE [ref].[people]",
+        "INSERT INTO [ref].[people] WITH (TABLOCK) ([name], [age]) SELECT [name], [age] FROM [ref].[people_swap]",
+        "DROP TABLE IF EXISTS [ref].[people_swap]",
+    ]
+    connection.rollback.assert_called_once()
+    connection.commit.assert_called_once()
+    assert connection.autocommit is True
+
+
+def test_ensure_row_hash_column_adds_column_and_index(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+
+    with patch.object(db_manager, 'get_table_columns', return_value=[{'name': 'name'}]):
+        assert db_manager.ensure_row_hash_column(connection, 'people', index=True) is True
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    assert statements[0] == "ALTER TABLE [ref].[people] ADD [ref_data_row_hash] bigint NULL"
+    assert "CREATE NONCLUSTERED INDEX [ix_people_row_hash] ON [ref].[people] ([ref_data_row_hash])" in statements[1]
+
+    cursor.reset_mock()
+    with patch.object(db_manager, 'get_table_columns', return_value=[{'name': 'ref_data_row_hash'}]):
+        assert db_manager.ensure_row_hash_column(connection, 'people_stage') is False
+    cursor.execute.assert_not_called()
+
+
+def test_apply_row_hash_delta_deletes_then_inserts_in_one_transaction(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    counts = iter([3, 4])
+
+    def execute(sql, *args):
+        cursor.rowcount = next(counts)
+    cursor.execute.side_effect = execute
+
+    result = db_manager.apply_row_hash_delta(
+        connection, 'people', 'people_stage', '[name], [ref_data_row_hash]', '[name], [ref_data_row_hash]'
+    )
+
+    assert result == {'deleted': 3, 'inserted': 4}
+    delete_sql, insert_sql = [c.args[0] for c in cursor.execute.call_args_list]
+    assert "DELETE FROM [target]" in delete_sql
+    assert "PARTITION BY [ref_data_row_hash]" in delete_sql
+    assert "FROM [ref].[people_stage] AS s WHERE s.[ref_data_row_hash] = [target].[ref_data_row_hash]" in delete_sql
+    assert insert_sql.strip().startswith("INSERT INTO [ref].[people] ([name], [ref_data_row_hash])")
+    assert "[src].[delta_rn] > (" in insert_sql
+    connection.commit.assert_called_once()
+    assert connection.autocommit is True
+
+
+def test_stage_row_hash_is_computed_by_the_server(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+
+    with patch.object(db_manager, 'get_table_columns', return_value=[{'name': 'name'}, {'name': 'age'}]):
+        assert db_manager.ensure_row_hash_column(connection, 'people_stage', hash_columns=['name', 'age']) is True
+
+    # Persisted computed column: hashed on insert, columns in name order, lengths and NULL markers included
+    sql = cursor.execute.call_args.args[0]
+    assert sql == (
+        "ALTER TABLE [ref].[people_stage] ADD [ref_data_row_hash] AS CAST(SUBSTRING(HASHBYTES('SHA2_256', "
+        "CAST('' AS varchar(max)) + "
+        "ISNULL('v' + CAST(DATALENGTH([age]) AS varchar(10)) + ':' + [age], 'n') + "
+        "ISNULL('v' + CAST(DATALENGTH([name]) AS varchar(10)) + ':' + [name], 'n')), 1, 8) AS bigint) PERSISTED"
+    )
+
+
+def test_determine_load_type_upsert(db_manager):
+    connection = MagicMock()
+
+    assert db_manager.determine_load_type(connection, 'people', 'full', 'upsert') == 'U'
+    with patch.object(db_manager, 'table_exists', return_value=True):
+        assert db_manager.determine_load_type(connection, 'people', 'upsert') == 'U'
+    connection.cursor.return_value.execute.assert_not_called()
+
+
+def test_ensure_key_index_creates_and_rebuilds(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+
+    cursor.fetchall.return_value = [('Name',), ('Region',)]
+    assert db_manager.ensure_key_index(connection, 'people', ['name', 'region']) is False
+    assert cursor.execute.call_count == 1
+
+    cursor.reset_mock()
+    cursor.fetchall.return_value = [('name',)]
+    assert db_manager.ensure_key_index(connection, 'people', ['name', 'region']) is True
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    assert statements[1] == "DROP INDEX [ix_people_key] ON [ref].[people]"
+    assert statements[2] == "CREATE NONCLUSTERED INDEX [ix_people_key] ON [ref].[people] ([name], [region])"
+
+
+def test_merge_stage_into_main_sql_and_counts(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchall.return_value = [('UPDATE', 4), ('INSERT', 7)]
+
+    result = db_manager.merge_stage_into_main(
+        connection, 'people', 'people_stage', ['id'],
+        ['[id]', '[name]', '[age]', '[ref_data_loadtime]'],
+        ['TRY_CONVERT(int, [id])', '[name]', 'TRY_CONVERT(int, [age])', '[ref_data_loadtime]']
+    )
+
+    assert result == {'updated': 4, 'inserted': 7}
+    sql = cursor.execute.call_args.args[0]
+    assert "MERGE INTO [ref].[people] WITH (HOLDLOCK) AS [target]" in sql
+    assert "SELECT TRY_CONVERT(int, [id]) AS [id], [name] AS [name], TRY_CONVERT(int, [age]) AS [age]" in sql
+    assert "PARTITION BY s.[id]" in sql
+    assert "ON ([target].[id] = [src].[id] OR ([target].[id] IS NULL AND [src].[id] IS NULL))" in sql
+    # Only changed data columns trigger an update; the key is never updated, the load time always is
+    assert ("WHEN MATCHED AND EXISTS (SELECT [src].[name], [src].[age] EXCEPT SELECT [target].[name], [target].[age])"
+            " THEN UPDATE SET [target].[name] = [src].[name], [target].[age] = [src].[age],"
+            " [target].[ref_data_loadtime] = [src].[ref_data_loadtime]") in sql
+    assert "INSERT ([id], [name], [age], [ref_data_loadtime]) VALUES ([src].[id], [src].[name]" in sql
+    assert "WHEN NOT MATCHED BY SOURCE" not in sql
+    connection.commit.assert_called_once()
+    assert connection.autocommit is True
+
+
+def test_merge_stage_into_main_key_only_table_inserts_new_keys(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchall.return_value = [('INSERT', 2)]
+
+    result = db_manager.merge_stage_into_main(connection, 'codes', 'codes_stage', ['code'], ['[code]'], ['[code]'])
+
+    assert result == {'updated': 0, 'inserted': 2}
+    assert "WHEN MATCHED" not in cursor.execute.call_args.args[0]
+
+
+def test_merge_stage_into_main_matches_null_keys(db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchall.return_value = [('UPDATE', 1)]
+
+    db_manager.merge_stage_into_main(
+        connection, 'people', 'people_stage', ['id', 'region'], ['[id]', '[region]', '[name]'],
+        ['[id]', '[region]', '[name]']
+    )
+
+    # A key with a NULL part updates its earlier row instead of inserting a duplicate on every run
+    sql = cursor.execute.call_args.args[0]
+    assert ("ON ([target].[id] = [src].[id] OR ([target].[id] IS NULL AND [src].[id] IS NULL))"
+            " AND ([target].[region] = [src].[region] OR ([target].[region] IS NULL AND [src].[region] IS NULL))") in sql
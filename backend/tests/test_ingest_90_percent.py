@@ -37,6 +37,12 @@ class MockDatabaseManager:
             raise Exception("Database connection failed")
         return MockConnection()
     
+    def begin_metadata_cache(self, connection):
+        pass
+    
+    def end_metadata_cache(self, connection):
+        pass
+    
     def ensure_schemas_exist(self, connection):
         if self.simulate_error:
             raise Exception("Schema creation failed")
@@ -0,0 +1,100 @@
+"""
+Tests for the pyarrow CSV reader engine in DataIngester._read_csv_file
+"""
+import sys
+import pytest
+import pandas as pd
+from unittest.mock import MagicMock, AsyncMock, patch
+
+# pyodbc needs the unixODBC driver manager; mock it when unavailable
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    sys.modules['pyodbc'] = MagicMock()
+
+import utils.ingest as ingest_module
+from utils.ingest import DataIngester
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def mock_logger():
+    logger = AsyncMock()
+    logger.log_info = AsyncMock()
+    logger.log_warning = AsyncMock()
+    logger.log_error = AsyncMock()
+    return logger
+
+
+@pytest.fixture
+def ingester(mock_logger):
+    ing = DataIngester(MagicMock(), mock_logger)
+    ing.csv_engine = 'pyarrow'
+    return ing
+
+
+async def read_both(ingester, path, csv_format):
+    arrow_df = await ingester._read_csv_file(path, csv_format)
+    ingester.csv_engine = 'pandas'
+    pandas_df = await ingester._read_csv_file(path, csv_format)
+    ingester.csv_engine = 'pyarrow'
+    return arrow_df, pandas_df
+
+
+@pytest.mark.asyncio
+async def test_arrow_reader_matches_pandas(ingester, tmp_path):
+    path = tmp_path / "people.csv"
+    path.write_text(
+        "exported 2024-01-01\n"
+        "name|age|notes\n"
+        "'Alice'|030|'a|b'\n"
+        "Bob||\n"
+        "'Carol\nSmith'|41|NULL\n"
+        "TRAILER|3|\n",
+        encoding='utf-8'
+    )
+    csv_format = {'column_delimiter': '|', 'text_qualifier': "'", 'skip_lines': 1, 'has_trailer': True}
+
+    arrow_df, pandas_df = await read_both(ingester, str(path), csv_format)
+
+    assert isinstance(arrow_df['name'].dtype, pd.StringDtype)
+    assert arrow_df['name'].dtype.storage == 'pyarrow'
+    assert list(arrow_df.columns) == ['name', 'age', 'notes']
+    # Leading zeros kept, empty strings not turned into NaN, trailer dropped, quoted newline kept
+    assert arrow_df.astype(object).values.tolist() == pandas_df.astype(object).values.tolist()
+    assert arrow_df.astype(object).values.tolist() == [
+        ['Alice', '030', 'a|b'],
+        ['Bob', '', ''],
+        ['Carol\nSmith', '41', 'NULL'],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_arrow_reader_crlf_and_duplicate_headers(ingester, tmp_path):
+    path = tmp_path / "dupes.csv"
+    path.write_bytes(b'id,name,name\r\n1,"a","b"\r\n2,c,d\r\n')
+
+    df = await ingester._read_csv_file(str(path), {'column_delimiter': ',', 'text_qualifier': '"'})
+
+    # Same '.N' suffixes pandas gives duplicate headers; no stray carriage returns
+    assert list(df.columns) == ['id', 'name', 'name.1']
+    assert df.values.tolist() == [['1', 'a', 'b'], ['2', 'c', 'd']]
+
+
+@pytest.mark.asyncio
+async def test_arrow_reader_falls_back_to_pandas(ingester, mock_logger, tmp_path):
+    path = tmp_path / "people.csv"
+    path.write_text("name::age\nAlice::30\n", encoding='utf-8')
+
+    # Multi-character delimiters are beyond the Arrow parser
+    with patch.object(ingester, '_read_csv_arrow') as arrow_read:
+        df = await ingester._read_csv_file(str(path), {'column_delimiter': '::', 'text_qualifier': '"'})
+    arrow_read.assert_not_called()
+    assert df.values.tolist() == [['Alice', '30']]
+
+    # pyarrow not installed
+    with patch.object(ingest_module, 'pa_csv', None):
+        df = await ingester._read_csv_file(str(path), {'column_delimiter': '::', 'text_qualifier': '"'})
+    assert df.values.tolist() == [['Alice', '30']]
+    assert mock_logger.log_warning.await_count == 2
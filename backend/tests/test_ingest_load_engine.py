@@ -0,0 +1,479 @@
+"""
+Tests for the stage load engines in DataIngester._load_dataframe_to_table
+"""
+import sys
+import pytest
+import pandas as pd
+from datetime import datetime
+from unittest.mock import MagicMock, AsyncMock, patch
+
+# pyodbc needs the unixODBC driver manager; mock it when unavailable
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    sys.modules['pyodbc'] = MagicMock()
+
+import utils.ingest as ingest_module
+from utils.ingest import DataIngester
+
+
+@pytest.fixture
+def mock_logger():
+    logger = AsyncMock()
+    logger.log_info = AsyncMock()
+    logger.log_warning = AsyncMock()
+    logger.log_error = AsyncMock()
+    return logger
+
+
+@pytest.fixture
+def mock_db_manager():
+    db = MagicMock()
+    db.data_schema = "ref"
+    db.get_table_columns.return_value = [
+        {'name': 'name', 'data_type': 'varchar', 'max_length': 50},
+        {'name': 'notes', 'data_type': 'varchar', 'max_length': -1},
+        {'name': 'ref_data_loadtime', 'data_type': 'datetime', 'max_length': None},
+        {'name': 'ref_data_loadtype', 'data_type': 'varchar', 'max_length': 255},
+    ]
+    return db
+
+
+@pytest.fixture
+def ingester(mock_db_manager, mock_logger):
+    ing = DataIngester(mock_db_manager, mock_logger)
+    ing.batch_size = 2
+    ing.slow_progress_demo = False
+    return ing
+
+
+@pytest.fixture
+def sample_df():
+    return pd.DataFrame({
+        'name': ['Alice', ' Bob ', 'null'],
+        'notes': ['x', '', 'NaN'],
+    })
+
+
+@pytest.mark.asyncio
+async def test_executemany_engine_binds_batches(ingester, sample_df):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    load_ts = datetime(2024, 1, 1)
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress'):
+        await ingester._load_dataframe_to_table(
+            connection, sample_df, 'people_stage', 'ref', 3, 'key', 'F', load_ts, 'executemany'
+        )
+
+    # 3 rows with batch_size 2 -> two array-bound round trips
+    assert cursor.executemany.call_count == 2
+    sql, rows = cursor.executemany.call_args_list[0].args
+    assert sql.startswith("INSERT INTO [ref].[people_stage] ([name], [notes], [ref_data_loadtime], [ref_data_loadtype])")
+    assert rows == [('Alice', 'x', load_ts, 'F'), ('Bob', None, load_ts, 'F')]
+    _, last_rows = cursor.executemany.call_args_list[1].args
+    assert last_rows == [(None, None, load_ts, 'F')]
+    assert cursor.fast_executemany is True
+
+    # Only the TRUNCATE goes through execute()
+    assert cursor.execute.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_executemany_input_sizes_follow_stage_widths(ingester, sample_df):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress'):
+        await ingester._load_dataframe_to_table(
+            connection, sample_df, 'people_stage', 'ref', 3, 'key', 'F', datetime.utcnow(), 'executemany'
+        )
+
+    sizes = cursor.setinputsizes.call_args.args[0]
+    odbc = ingest_module.pyodbc
+    assert sizes == [
+        (odbc.SQL_VARCHAR, 50, 0),
+        (odbc.SQL_VARCHAR, 0, 0),
+        (odbc.SQL_TYPE_TIMESTAMP, 23, 3),
+        (odbc.SQL_VARCHAR, 255, 0),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_executemany_failure_falls_back_to_row_inserts(ingester, sample_df, mock_logger):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.executemany.side_effect = Exception("driver does not support array binding")
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress'):
+        await ingester._load_dataframe_to_table(
+            connection, sample_df, 'people_stage', 'ref', 3, 'key', 'F', datetime.utcnow(), 'executemany'
+        )
+
+    # First batch attempted once with arrays, then every row goes through execute()
+    assert cursor.executemany.call_count == 1
+    assert cursor.execute.call_count == 1 + 3
+    connection.rollback.assert_called()
+    mock_logger.log_warning.assert_awaited()
+
+
+@pytest.mark.asyncio
+async def test_row_engine_executes_each_row(ingester, sample_df):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress'):
+        await ingester._load_dataframe_to_table(
+            connection, sample_df, 'people_stage', 'ref', 3, 'key', 'F', datetime.utcnow(), 'row'
+        )
+
+    cursor.executemany.assert_not_called()
+    assert cursor.execute.call_count == 1 + 3
+
+
+@pytest.mark.asyncio
+async def test_row_engine_failure_logs_offending_row(ingester, sample_df, mock_logger):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+
+    def execute(sql, *args):
+        if args and args[0][0] == 'Bob':
+            raise Exception("string data, right truncation")
+    cursor.execute.side_effect = execute
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress'), \
+         patch.object(ingester, '_execute_batch', wraps=ingester._execute_batch) as execute_batch:
+        with pytest.raises(Exception, match="right truncation"):
+            await ingester._load_dataframe_to_table(
+                connection, sample_df, 'people_stage', 'ref', 3, 'key', 'F', datetime.utcnow(), 'row'
+            )
+
+    # The sequential loop sends its batches through the same dispatch as the parallel workers
+    execute_batch.assert_called_once()
+    details = mock_logger.log_error.await_args_list[0].args[1]
+    assert details.startswith("Error at row 1: string data, right truncation")
+    assert "'name': 'Bob'" in details
+    connection.rollback.assert_called()
+
+
+@pytest.mark.asyncio
+async def test_unknown_engine_is_rejected(ingester, sample_df):
+    connection = MagicMock()
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress'), \
+         patch('utils.progress.request_cancel'):
+        with pytest.raises(Exception, match="Unsupported load engine: bogus"):
+            await ingester._load_dataframe_to_table(
+                connection, sample_df, 'people_stage', 'ref', 3, 'key', 'F', datetime.utcnow(), 'bogus'
+            )
+
+
+def test_load_engine_defaults_to_executemany(ingester):
+    assert ingester.load_engine == 'executemany'
+
+
+@pytest.mark.asyncio
+async def test_tvp_engine_sends_one_parameter_per_batch(ingester, sample_df, mock_db_manager):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    mock_db_manager.get_stage_load_objects.return_value = {
+        'schema': 'ref', 'type': 'tt_ref_load_people_stage', 'procedure': 'sp_ref_load_people_stage'
+    }
+    ingester.tvp_batch_size = 5000
+    load_ts = datetime(2024, 1, 1)
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress'):
+        await ingester._load_dataframe_to_table(
+            connection, sample_df, 'people_stage', 'ref', 3, 'key', 'F', load_ts, 'tvp'
+        )
+
+    # TRUNCATE + a single procedure call; tvp batches ignore the row batch_size of 2
+    assert cursor.execute.call_count == 2
+    sql, params = cursor.execute.call_args_list[1].args
+    assert sql == "{CALL [ref].[sp_ref_load_people_stage] (?)}"
+    tvp = params[0]
+    assert tvp[:2] == ['tt_ref_load_people_stage', 'ref']
+    assert tvp[2:] == [
+        ('Alice', 'x', load_ts, 'F'),
+        ('Bob', None, load_ts, 'F'),
+        (None, None, load_ts, 'F'),
+    ]
+    cursor.executemany.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_tvp_failure_falls_back_to_executemany(ingester, sample_df, mock_db_manager, mock_logger):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    mock_db_manager.get_stage_load_objects.return_value = {
+        'schema': 'ref', 'type': 'tt_ref_load_people_stage', 'procedure': 'sp_ref_load_people_stage'
+    }
+
+    def execute(sql, *args):
+        if sql.startswith("{CALL"):
+            raise Exception("type not found")
+    cursor.execute.side_effect = execute
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress'):
+        await ingester._load_dataframe_to_table(
+            connection, sample_df, 'people_stage', 'ref', 3, 'key', 'F', datetime.utcnow(), 'tvp'
+        )
+
+    assert cursor.executemany.call_count == 1
+    _, rows = cursor.executemany.call_args.args
+    assert len(rows) == 3
+    connection.rollback.assert_called()
+    mock_logger.log_warning.assert_awaited()
+
+
+def test_tvp_batch_size_not_capped(mock_db_manager, mock_logger):
+    with patch('utils.config_loader.config.get_ingest_config', return_value={
+        'batch_size': 50000, 'progress_interval': 5, 'type_inference': False,
+        'type_sample_rows': 5000, 'date_threshold': 0.8, 'tvp_batch_size': 50000,
+    }):
+        ing = DataIngester(mock_db_manager, mock_logger)
+    assert ing.batch_size == 990
+    assert ing.tvp_batch_size == 50000
+
+
+def test_prepare_rows_normalizes_columns(ingester):
+    load_ts = datetime(2024, 1, 1)
+    df = pd.DataFrame({
+        'a': [' x ', 'NULL', 'None', '', 'nAn', 'null value'],
+        'b': ['1', '2', '3', '4', '5', ' 6'],
+    })
+
+    rows = ingester._prepare_rows(df, load_ts, 'A')
+
+    assert rows == [
+        ('x', '1', load_ts, 'A'),
+        (None, '2', load_ts, 'A'),
+        (None, '3', load_ts, 'A'),
+        (None, '4', load_ts, 'A'),
+        (None, '5', load_ts, 'A'),
+        ('null value', '6', load_ts, 'A'),
+    ]
+
+
+def test_prepare_rows_handles_missing_values(ingester):
+    load_ts = datetime(2024, 1, 1)
+    df = pd.DataFrame({'a': ['v', None, float('nan')]}, dtype=object)
+
+    assert ingester._prepare_rows(df, load_ts, 'F') == [
+        ('v', load_ts, 'F'),
+        (None, load_ts, 'F'),
+        (None, load_ts, 'F'),
+    ]
+    assert ingester._prepare_rows(df.iloc[0:0], load_ts, 'F') == []
+
+
+@pytest.mark.asyncio
+async def test_parallel_load_splits_rows_over_pooled_connections(ingester, mock_db_manager):
+    ingester.parallel_workers = 3
+    connections = [MagicMock(name=f"conn{i}") for i in range(3)]
+    mock_db_manager.get_pooled_connection.side_effect = connections
+    df = pd.DataFrame({'name': [f"n{i}" for i in range(10)], 'notes': ['x'] * 10})
+    main_connection = MagicMock()
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress') as update:
+        await ingester._load_dataframe_to_table(
+            main_connection, df, 'people_stage', 'ref', 10, 'key', 'F', datetime(2024, 1, 1), 'executemany'
+        )
+
+    # Main connection only truncates; the data goes through the pooled connections
+    main_connection.cursor.return_value.executemany.assert_not_called()
+    inserted_names = sorted(
+        row[0]
+        for conn in connections
+        for call in conn.cursor.return_value.executemany.call_args_list
+        for row in call.args[1]
+    )
+    assert inserted_names == sorted(f"n{i}" for i in range(10))
+    # Contiguous ranges 0-2, 3-5, 6-9 in batches of 2
+    assert [conn.cursor.return_value.executemany.call_count for conn in connections] == [2, 2, 2]
+    assert mock_db_manager.release_connection.call_count == 3
+    final = max(update.call_args_list, key=lambda c: c.kwargs.get('inserted', 0))
+    assert final.kwargs['inserted'] == 10
+    assert sum(final.kwargs['worker_inserted']) == 10
+
+
+@pytest.mark.asyncio
+async def test_parallel_load_worker_failure_stops_and_releases(ingester, mock_db_manager):
+    ingester.parallel_workers = 2
+    good, bad = MagicMock(name="good"), MagicMock(name="bad")
+    bad.cursor.return_value.executemany.side_effect = Exception("deadlock victim")
+    mock_db_manager.get_pooled_connection.side_effect = [good, bad]
+    df = pd.DataFrame({'name': [f"n{i}" for i in range(8)], 'notes': ['x'] * 8})
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress'), \
+         patch('utils.progress.request_cancel'):
+        with pytest.raises(Exception, match="deadlock victim"):
+            await ingester._load_dataframe_to_table(
+                MagicMock(), df, 'people_stage', 'ref', 8, 'key', 'F', datetime(2024, 1, 1), 'executemany'
+            )
+
+    bad.rollback.assert_called()
+    assert mock_db_manager.release_connection.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_parallel_load_honours_cancel(ingester, mock_db_manager):
+    ingester.parallel_workers = 2
+    canceled = {'value': False}
+    connections = [MagicMock(name="conn0"), MagicMock(name="conn1")]
+    for conn in connections:
+        # Cancel arrives while the first batches are being sent
+        conn.cursor.return_value.executemany.side_effect = lambda *args: canceled.update(value=True)
+    mock_db_manager.get_pooled_connection.side_effect = connections
+    df = pd.DataFrame({'name': ['a'] * 8, 'notes': ['x'] * 8})
+
+    with patch('utils.progress.is_canceled', side_effect=lambda key: canceled['value']), \
+         patch('utils.progress.update_progress'), \
+         patch('utils.progress.request_cancel'):
+        with pytest.raises(Exception, match="canceled"):
+            await ingester._load_dataframe_to_table(
+                MagicMock(), df, 'people_stage', 'ref', 8, 'key', 'F', datetime(2024, 1, 1), 'executemany'
+            )
+
+    # Each worker stops after at most the batch it had in flight (2 batches of 2 rows per range)
+    sent = sum(conn.cursor.return_value.executemany.call_count for conn in connections)
+    assert 1 <= sent <= 2
+    assert mock_db_manager.release_connection.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_heap_mode_uses_tablock_and_large_transactions(ingester, sample_df):
+    ingester.heap_commit_rows = 4
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    big_df = pd.concat([sample_df] * 3, ignore_index=True)  # 9 rows -> 5 batches of 2
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress'):
+        await ingester._load_dataframe_to_table(
+            connection, big_df, 'people_stage', 'ref', 9, 'key', 'F', datetime.utcnow(), 'executemany', heap=True
+        )
+
+    sql = cursor.executemany.call_args.args[0]
+    assert sql.startswith("INSERT INTO [ref].[people_stage] WITH (TABLOCK) ([name]")
+    assert cursor.executemany.call_count == 5
+    # TRUNCATE, then a commit every 4 rows (after batches 2 and 4), then the final commit
+    assert connection.commit.call_count == 1 + 2 + 1
+    assert connection.autocommit is True
+
+
+@pytest.mark.asyncio
+async def test_heap_mode_loads_on_one_connection_despite_parallel_workers(ingester, mock_db_manager, sample_df):
+    ingester.parallel_workers = 3
+    ingester.heap_commit_rows = 4
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    big_df = pd.concat([sample_df] * 3, ignore_index=True)  # 9 rows -> 5 batches of 2
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress'):
+        await ingester._load_dataframe_to_table(
+            connection, big_df, 'people_stage', 'ref', 9, 'key', 'F', datetime.utcnow(), 'executemany', heap=True
+        )
+
+    mock_db_manager.get_pooled_connection.assert_not_called()
+    assert cursor.executemany.call_count == 5
+    # Large transactions are kept: TRUNCATE, a commit every 4 rows, then the final commit
+    assert connection.commit.call_count == 1 + 2 + 1
+
+
+@pytest.mark.asyncio
+async def test_heap_mode_failure_with_open_transaction_does_not_fall_back(ingester, sample_df):
+    ingester.heap_commit_rows = 100
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.executemany.side_effect = [None, Exception("log full")]
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress'), \
+         patch('utils.progress.request_cancel'):
+        with pytest.raises(Exception, match="log full"):
+            await ingester._load_dataframe_to_table(
+                connection, sample_df, 'people_stage', 'ref', 3, 'key', 'F', datetime.utcnow(), 'executemany', heap=True
+            )
+
+    # No row-by-row retry of a batch whose predecessors were rolled back with it
+    assert cursor.execute.call_count == 1
+    connection.rollback.assert_called()
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_saved_with_each_commit(ingester, mock_db_manager, sample_df):
+    connection = MagicMock()
+    order = []
+    connection.commit.side_effect = lambda: order.append('commit')
+    mock_db_manager.save_ingest_checkpoint.side_effect = lambda *args: order.append(args[3])
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress'):
+        await ingester._load_dataframe_to_table(
+            connection, sample_df, 'people_stage', 'ref', 3, 'key', 'F', datetime.utcnow(), 'executemany',
+            truncate=False, row_offset=10, checkpoint='abc'
+        )
+
+    # Offsets include row_offset and are written before the commit that makes them durable
+    assert order == [12, 'commit', 13, 'commit', 'commit']
+    assert mock_db_manager.save_ingest_checkpoint.call_args.args[:3] == (connection, 'people_stage', 'abc')
+
+
+def test_batch_sizer_climbs_then_turns_around():
+    sizer = ingest_module._BatchSizer(100, 10, 1000, target_seconds=2.0)
+
+    assert sizer.record(100, 0.1) == 200   # 1000 rows/s, first sample: grow
+    assert sizer.record(200, 0.1) == 400   # 2000 rows/s: keep growing
+    # 1000 rows/s: past the optimum, so reverse with a smaller step
+    assert sizer.record(400, 0.4) == int(400 / 2 ** 0.5)
+    # A short final batch carries no information
+    assert sizer.record(5, 0.001) == sizer.size
+
+
+def test_batch_sizer_respects_bounds_and_latency_target():
+    sizer = ingest_module._BatchSizer(5000, 10, 800, target_seconds=1.0)
+    assert sizer.size == 800
+
+    # Too slow: shrink regardless of throughput, never below the lower bound
+    for _ in range(20):
+        sizer.record(sizer.size, 5.0)
+    assert sizer.size == 10
+
+    # Growth is limited to the size expected to meet the latency target
+    sizer = ingest_module._BatchSizer(100, 10, 800, target_seconds=1.0)
+    assert sizer.record(100, 0.8) == 125
+
+
+@pytest.mark.asyncio
+async def test_adaptive_batch_sizes_reported_in_progress(ingester):
+    ingester.adaptive_batch = True
+    ingester.adaptive_min_batch = 2
+    ingester.adaptive_max_params = 40  # 4 insert columns -> at most 10 rows per batch
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    df = pd.DataFrame({'name': [f"n{i}" for i in range(30)], 'notes': ['x'] * 30})
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress') as update:
+        await ingester._load_dataframe_to_table(
+            connection, df, 'people_stage', 'ref', 30, 'key', 'F', datetime(2024, 1, 1), 'executemany'
+        )
+
+    sizes = [len(c.args[1]) for c in cursor.executemany.call_args_list]
+    assert sizes[:2] == [2, 4]
+    assert sum(sizes) == 30
+    assert max(sizes) <= 10
+    reported = [c.kwargs['batch_size'] for c in update.call_args_list if 'batch_size' in c.kwargs]
+    assert reported[:2] == [2, 4]
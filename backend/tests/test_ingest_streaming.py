@@ -0,0 +1,300 @@
+"""
+Tests for streaming (chunked) CSV ingestion in DataIngester
+"""
+import os
+import sys
+import asyncio
+import pytest
+import pandas as pd
+from datetime import datetime
+from unittest.mock import MagicMock, AsyncMock, patch
+
+# pyodbc needs the unixODBC driver manager; mock it when unavailable
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    sys.modules['pyodbc'] = MagicMock()
+
+from utils.ingest import DataIngester
+
+
+CSV_FORMAT = {
+    'column_delimiter': ',',
+    'text_qualifier': '"',
+    'row_delimiter': '\n',
+    'has_trailer': False,
+}
+
+
+@pytest.fixture
+def mock_logger():
+    logger = AsyncMock()
+    logger.log_info = AsyncMock()
+    logger.log_warning = AsyncMock()
+    logger.log_error = AsyncMock()
+    return logger
+
+
+@pytest.fixture
+def mock_db_manager():
+    db = MagicMock()
+    db.data_schema = "ref"
+    db.get_table_columns.return_value = []
+    return db
+
+
+@pytest.fixture
+def ingester(mock_db_manager, mock_logger):
+    ing = DataIngester(mock_db_manager, mock_logger)
+    ing.slow_progress_demo = False
+    return ing
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "people.csv"
+    rows = "\n".join(f"name{i},{i}" for i in range(7))
+    path.write_text("name,age\n" + rows + "\n", encoding='utf-8')
+    return str(path)
+
+
+def test_iter_csv_chunks_without_trailer(ingester, csv_file):
+    chunks = list(ingester._iter_csv_chunks(csv_file, CSV_FORMAT, chunk_rows=3))
+
+    assert [len(c) for c in chunks] == [3, 3, 1]
+    assert list(chunks[0].columns) == ['name', 'age']
+    assert chunks[-1].iloc[-1]['name'] == 'name6'
+
+
+def test_iter_csv_chunks_drops_trailer_from_final_chunk(ingester, csv_file):
+    fmt = dict(CSV_FORMAT, has_trailer=True)
+    chunks = list(ingester._iter_csv_chunks(csv_file, fmt, chunk_rows=3))
+
+    # 7 rows, last one is the trailer; it was alone in the final chunk
+    assert [len(c) for c in chunks] == [3, 3]
+    assert chunks[-1].iloc[-1]['name'] == 'name5'
+
+
+def test_iter_csv_chunks_trailer_inside_final_chunk(ingester, csv_file):
+    fmt = dict(CSV_FORMAT, has_trailer=True)
+    chunks = list(ingester._iter_csv_chunks(csv_file, fmt, chunk_rows=4))
+
+    assert [len(c) for c in chunks] == [4, 2]
+    assert sum(len(c) for c in chunks) == 6
+
+
+def test_normalize_frame_renames_and_stringifies(ingester):
+    df = pd.DataFrame({'First Name': ['a', 'nan', 'None'], 'skip': ['x', 'y', 'z']})
+    result = ingester._normalize_frame(df, [('First Name', 'First_Name')])
+
+    assert list(result.columns) == ['First_Name']
+    assert list(result['First_Name']) == ['a', '', '']
+
+
+@pytest.mark.asyncio
+async def test_load_without_truncate_reports_offset_progress(ingester):
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    df = pd.DataFrame({'name': ['a', 'b']})
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress') as update:
+        await ingester._load_dataframe_to_table(
+            connection, df, 'people_stage', 'ref', 2, 'key', 'F', datetime.utcnow(),
+            'executemany', truncate=False, row_offset=10
+        )
+
+    assert not any('TRUNCATE' in str(c.args[0]) for c in cursor.execute.call_args_list)
+    assert update.call_args.kwargs['inserted'] == 12
+
+
+@pytest.mark.asyncio
+async def test_ingest_data_streaming_loads_each_chunk(ingester, mock_db_manager, csv_file):
+    ingester.chunk_rows = 3
+    ingester.file_handler = MagicMock()
+    ingester.file_handler.extract_table_base_name.return_value = 'people'
+    ingester.file_handler.read_format_file = AsyncMock(return_value={'csv_format': CSV_FORMAT})
+    ingester.file_handler.move_to_archive.return_value = csv_file + '.archived'
+    mock_db_manager.determine_load_type.return_value = 'F'
+    mock_db_manager.table_exists.return_value = False
+    mock_db_manager.execute_validation_procedure.return_value = {'validation_result': 0}
+    mock_db_manager.get_connection.return_value.cursor.return_value.rowcount = 0
+    mock_db_manager.get_table_columns.return_value = [{'name': 'name'}, {'name': 'age'}]
+
+    loaded = []
+
+    async def fake_load(connection, df, table_name, schema, total_rows, progress_key=None,
+                        load_type='F', static_load_timestamp=None, load_engine=None,
+                        truncate=True, row_offset=0, checkpoint=None):
+        loaded.append((len(df), truncate, row_offset, list(df.columns)))
+
+    with patch.object(ingester, '_load_dataframe_to_table', side_effect=fake_load), \
+         patch.object(ingester, '_read_csv_file', new=AsyncMock()) as full_read:
+        messages = [m async for m in ingester.ingest_data(
+            csv_file, 'people.fmt', 'full', 'people.csv', streaming=True
+        )]
+
+    full_read.assert_not_called()
+    assert loaded == [
+        (3, True, 0, ['name', 'age']),
+        (3, False, 3, ['name', 'age']),
+        (1, False, 6, ['name', 'age']),
+    ]
+    assert any('7 rows in 3 chunks' in m for m in messages)
+    assert not any(m.startswith('ERROR!') for m in messages)
+
+
+@pytest.mark.asyncio
+async def test_pipelined_chunks_match_sequential(ingester, csv_file):
+    headers = [('name', 'name'), ('age', 'age')]
+
+    async def collect(pipelined):
+        chunk_iter = ingester._iter_csv_chunks(csv_file, CSV_FORMAT, chunk_rows=3)
+        first = next(chunk_iter)
+        if pipelined:
+            frames = ingester._pipelined_chunks(first, chunk_iter, headers, 'key')
+        else:
+            frames = ingester._sequential_chunks(first, chunk_iter, headers)
+        return [f async for f in frames]
+
+    with patch('utils.progress.is_canceled', return_value=False), \
+         patch('utils.progress.update_progress') as update:
+        pipelined = await collect(True)
+    sequential = await collect(False)
+
+    assert [len(f) for f in pipelined] == [3, 3, 1]
+    for a, b in zip(pipelined, sequential):
+        pd.testing.assert_frame_equal(a, b)
+    assert update.call_args.kwargs == {'parsed': 7}
+
+
+@pytest.mark.asyncio
+async def test_pipelined_chunks_reraise_producer_errors(ingester):
+    def broken_chunks():
+        raise ValueError("bad quoting")
+        yield  # pragma: no cover
+
+    first = pd.DataFrame({'name': ['a']})
+    frames = ingester._pipelined_chunks(first, broken_chunks(), [('name', 'name')])
+    received = []
+    with pytest.raises(ValueError, match="bad quoting"):
+        async for frame in frames:
+            received.append(frame)
+    assert len(received) == 1
+
+
+@pytest.mark.asyncio
+async def test_pipelined_chunks_stop_producer_when_consumer_stops(ingester):
+    ingester.pipeline_queue_depth = 1
+    produced = []
+
+    def endless_chunks():
+        while True:
+            produced.append(1)
+            yield pd.DataFrame({'name': ['a']})
+
+    chunk_iter = endless_chunks()
+    frames = ingester._pipelined_chunks(next(chunk_iter), chunk_iter, [('name', 'name')])
+    async for _ in frames:
+        break
+    await frames.aclose()
+
+    # The producer stays at most queue depth (+ the chunk it is holding) ahead and exits on close
+    count = len(produced)
+    assert count <= 3
+    await asyncio.sleep(0.3)
+    assert len(produced) == count
+
+
+@pytest.mark.asyncio
+async def test_ingest_data_pipeline_uses_producer_thread(ingester, mock_db_manager, csv_file):
+    ingester.chunk_rows = 3
+    ingester.file_handler = MagicMock()
+    ingester.file_handler.extract_table_base_name.return_value = 'people'
+    ingester.file_handler.read_format_file = AsyncMock(return_value={'csv_format': CSV_FORMAT})
+    ingester.file_handler.move_to_archive.return_value = csv_file + '.archived'
+    mock_db_manager.determine_load_type.return_value = 'F'
+    mock_db_manager.table_exists.return_value = False
+    mock_db_manager.execute_validation_procedure.return_value = {'validation_result': 0}
+    mock_db_manager.get_connection.return_value.cursor.return_value.rowcount = 0
+    mock_db_manager.get_table_columns.return_value = [{'name': 'name'}, {'name': 'age'}]
+
+    loaded = []
+
+    async def fake_load(connection, df, *args, truncate=True, row_offset=0, checkpoint=None):
+        loaded.append((len(df), truncate, row_offset))
+
+    with patch.object(ingester, '_load_dataframe_to_table', side_effect=fake_load), \
+         patch.object(ingester, '_pipelined_chunks', wraps=ingester._pipelined_chunks) as pipelined:
+        messages = [m async for m in ingester.ingest_data(
+            csv_file, 'people.fmt', 'full', 'people.csv', pipeline=True
+        )]
+
+    pipelined.assert_called_once()
+    assert loaded == [(3, True, 0), (3, False, 3), (1, False, 6)]
+    assert any('7 rows in 3 chunks' in m for m in messages)
+    assert not any(m.startswith('ERROR!') for m in messages)
+
+
+@pytest.mark.asyncio
+async def test_ingest_data_resume_skips_committed_rows(ingester, mock_db_manager, csv_file):
+    ingester.chunk_rows = 3
+    ingester.checkpoints = True
+    ingester.file_handler = MagicMock()
+    ingester.file_handler.extract_table_base_name.return_value = 'people'
+    ingester.file_handler.read_format_file = AsyncMock(return_value={'csv_format': CSV_FORMAT})
+    ingester.file_handler.move_to_archive.return_value = csv_file + '.archived'
+    mock_db_manager.determine_load_type.return_value = 'F'
+    mock_db_manager.table_exists.side_effect = lambda conn, table, *args: table == 'people_stage'
+    mock_db_manager.get_ingest_checkpoint.return_value = 4
+    mock_db_manager.execute_validation_procedure.return_value = {'validation_result': 0}
+    mock_db_manager.get_connection.return_value.cursor.return_value.rowcount = 0
+    mock_db_manager.get_table_columns.return_value = [{'name': 'name'}, {'name': 'age'}]
+
+    loaded = []
+
+    async def fake_load(connection, df, *args, truncate=True, row_offset=0, checkpoint=None):
+        loaded.append((list(df['name']), truncate, row_offset, checkpoint))
+
+    with patch.object(ingester, '_load_dataframe_to_table', side_effect=fake_load):
+        messages = [m async for m in ingester.ingest_data(
+            csv_file, 'people.fmt', 'full', 'people.csv', streaming=True, resume=True
+        )]
+
+    file_hash = ingester._file_fingerprint(csv_file)
+    mock_db_manager.get_ingest_checkpoint.assert_called_once_with(
+        mock_db_manager.get_connection.return_value, 'people_stage', file_hash
+    )
+    # Rows 0-3 were committed before the interruption: the first chunk is skipped, the second sliced
+    assert loaded == [
+        (['name4', 'name5'], False, 4, file_hash),
+        (['name6'], False, 6, file_hash),
+    ]
+    mock_db_manager.drop_table_if_exists.assert_not_called()
+    mock_db_manager.clear_ingest_checkpoint.assert_called_once()
+    assert any('Resuming stage load: 4 rows' in m for m in messages)
+    assert not any(m.startswith('ERROR!') for m in messages)
+
+
+def test_checkpoints_are_off_by_default(ingester):
+    # No caller resumes loads yet, so the per-batch checkpoint write is opt-in
+    assert ingester.checkpoints is False
+
+def test_file_fingerprint_reads_only_head_and_tail(ingester, tmp_path, monkeypatch):
+    monkeypatch.setattr(DataIngester, '_FINGERPRINT_BLOCK', 4)
+    path = tmp_path / 'big.csv'
+
+    def write(body, mtime_ns=1_700_000_000_000_000_000):
+        path.write_bytes(body)
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+        return ingester._file_fingerprint(str(path))
+
+    fingerprint = write(b'aaaa' + b'x' * 100 + b'zzzz')
+
+    # The middle of the file is never read
+    assert write(b'aaaa' + b'y' * 100 + b'zzzz') == fingerprint
+    # A changed head, tail, size or modification time gives a new fingerprint
+    assert write(b'Qaaa' + b'x' * 100 + b'zzzz') != fingerprint
+    assert write(b'aaaa' + b'x' * 100 + b'zzzQ') != fingerprint
+    assert write(b'aaaa' + b'x' * 101 + b'zzzz') != fingerprint
+    assert write(b'aaaa' + b'x' * 100 + b'zzzz', mtime_ns=1_700_000_000_000_000_001) != fingerprint
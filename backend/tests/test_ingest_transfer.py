@@ -0,0 +1,319 @@
+"""
+Tests for the chunked stage-to-main transfer in DataIngester.ingest_data
+"""
+import sys
+import pytest
+from unittest.mock import MagicMock, AsyncMock, patch
+
+# pyodbc needs the unixODBC driver manager; mock it when unavailable
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    sys.modules['pyodbc'] = MagicMock()
+
+from utils.ingest import DataIngester
+
+
+CSV_FORMAT = {
+    'column_delimiter': ',',
+    'text_qualifier': '"',
+    'row_delimiter': '\n',
+    'has_trailer': False,
+}
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "people.csv"
+    path.write_text("name,age\n" + "\n".join(f"n{i},{i}" for i in range(5)) + "\n", encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def ingester(csv_file):
+    ing = DataIngester(MagicMock(), AsyncMock())
+    ing.slow_progress_demo = False
+    ing.typed_columns = False
+    ing.transfer_chunk_rows = 2
+    ing.progress_batch_interval = 1
+    db = ing.db_manager
+    db.data_schema = 'ref'
+    ing.file_handler = MagicMock()
+    ing.file_handler.extract_table_base_name.return_value = 'people'
+    ing.file_handler.read_format_file = AsyncMock(return_value={'csv_format': CSV_FORMAT})
+    ing.file_handler.move_to_archive.return_value = csv_file + '.archived'
+    db.determine_load_type.return_value = 'F'
+    db.table_exists.return_value = False
+    db.execute_validation_procedure.return_value = {'validation_result': 0}
+    db.get_row_count.return_value = 5
+    main = [{'name': 'name'}, {'name': 'age'}, {'name': 'ref_data_loadtime'}, {'name': 'ref_data_loadtype'}]
+    stage = main + [{'name': 'ref_data_stage_row'}]
+    db.get_table_columns.side_effect = lambda conn, table, *args: stage if table.endswith('_stage') else main
+    return ing
+
+
+async def run_ingest(ingester, csv_file):
+    with patch.object(ingester, '_load_dataframe_to_table', new=AsyncMock()), \
+         patch('utils.progress.mark_moving') as moving:
+        messages = [m async for m in ingester.ingest_data(csv_file, 'people.fmt', 'full', 'people.csv')]
+    return messages, moving
+
+
+@pytest.mark.asyncio
+async def test_chunked_transfer_moves_row_number_slices(ingester, csv_file):
+    connection = ingester.db_manager.get_connection.return_value
+    cursor = connection.cursor.return_value
+    cursor.fetchone.return_value = (1, 5)
+    cursor.rowcount = 2
+
+    messages, moving = await run_ingest(ingester, csv_file)
+
+    assert not any(m.startswith('ERROR!') for m in messages)
+    create_stage = ingester.db_manager.create_table.call_args_list[-1]
+    assert create_stage.kwargs['identity_column'] == 'ref_data_stage_row'
+
+    slices = [c for c in cursor.execute.call_args_list if str(c.args[0]).startswith('INSERT INTO [ref].[people]')]
+    assert [c.args[1:] for c in slices] == [(1, 2), (3, 4), (5, 6)]
+    sql = slices[0].args[0]
+    assert sql.endswith("FROM [ref].[people_stage] WHERE [ref_data_stage_row] BETWEEN ? AND ?")
+    # The row number itself is never copied to the main table
+    assert 'ref_data_stage_row]' not in sql.split(' WHERE ')[0]
+    assert connection.commit.call_count >= 3
+    assert [c.args[1:] for c in moving.call_args_list] == [(0, 5), (2, 5), (4, 5), (6, 5)]
+    assert any('Moved 4/5 rows to main table (2 slices)' in m for m in messages)
+
+
+@pytest.mark.asyncio
+async def test_transfer_without_row_number_uses_single_statement(ingester, csv_file):
+    ingester.transfer_chunk_rows = 0
+    cursor = ingester.db_manager.get_connection.return_value.cursor.return_value
+    cursor.rowcount = 5
+
+    messages, moving = await run_ingest(ingester, csv_file)
+
+    assert ingester.db_manager.create_table.call_args_list[-1].kwargs['identity_column'] is None
+    moves = [c for c in cursor.execute.call_args_list if str(c.args[0]).startswith('INSERT INTO [ref].[people]')]
+    assert len(moves) == 1 and 'WHERE' not in moves[0].args[0]
+    moving.assert_not_called()
+    assert any('loaded to main table: 5 rows' in m for m in messages)
+
+
+@pytest.mark.asyncio
+async def test_swap_full_load_keeps_main_rows_until_swap(ingester, csv_file):
+    ingester.transfer_chunk_rows = 0
+    ingester.swap_full_load = True
+    db = ingester.db_manager
+    db.table_exists.side_effect = lambda conn, table, *args: table == 'people'
+    db.get_row_count.return_value = 10
+    db.sync_main_table_columns.return_value = {'added': [], 'mismatched': []}
+    db.ensure_metadata_columns.return_value = {'added': []}
+    db.create_swap_table.return_value = 'people_swap'
+    db.swap_in_table.return_value = True
+    cursor = db.get_connection.return_value.cursor.return_value
+    cursor.rowcount = 5
+
+    messages, _ = await run_ingest(ingester, csv_file)
+
+    assert not any(m.startswith('ERROR!') for m in messages)
+    db.truncate_table.assert_not_called()
+    moves = [c.args[0] for c in cursor.execute.call_args_list if str(c.args[0]).startswith('INSERT INTO')]
+    assert moves[0].startswith("INSERT INTO [ref].[people_swap] WITH (TABLOCK) ([name], [age]")
+    db.swap_in_table.assert_called_once_with(db.get_connection.return_value, 'people')
+    assert any('swapped into people by metadata switch' in m for m in messages)
+
+
+@pytest.mark.asyncio
+async def test_delta_full_load_applies_only_changes(ingester, csv_file):
+    ingester.transfer_chunk_rows = 0
+    ingester.delta_full_load = True
+    ingester.swap_full_load = True
+    db = ingester.db_manager
+    db.table_exists.side_effect = lambda conn, table, *args: table == 'people'
+    db.get_row_count.return_value = 5
+    db.sync_main_table_columns.return_value = {'added': [], 'mismatched': []}
+    db.ensure_metadata_columns.return_value = {'added': []}
+    db.ensure_row_hash_column.return_value = False
+    db.apply_row_hash_delta.return_value = {'deleted': 1, 'inserted': 2}
+    main = [{'name': 'name'}, {'name': 'age'}, {'name': 'ref_data_loadtime'}, {'name': 'ref_data_loadtype'},
+            {'name': 'ref_data_row_hash'}]
+    db.get_table_columns.side_effect = lambda conn, table, *args: main
+
+    with patch.object(ingester, '_load_dataframe_to_table', new=AsyncMock()), \
+         patch('utils.progress.mark_moving'):
+        messages = [m async for m in ingester.ingest_data(csv_file, 'people.fmt', 'full', 'people.csv')]
+
+    assert not any(m.startswith('ERROR!') for m in messages)
+    # The stage hash is computed by the server from the file's columns
+    db.ensure_row_hash_column.assert_any_call(
+        db.get_connection.return_value, 'people_stage', hash_columns=['name', 'age']
+    )
+    db.truncate_table.assert_not_called()
+    db.create_swap_table.assert_not_called()
+    db.ensure_row_hash_column.assert_any_call(db.get_connection.return_value, 'people', index=True)
+    args = db.apply_row_hash_delta.call_args.args
+    assert args[1:3] == ('people', 'people_stage')
+    assert args[3].endswith('[ref_data_row_hash]')
+    assert any('Delta applied: 1 rows deleted, 2 rows inserted' in m for m in messages)
+
+
+def test_resolve_key_columns_maps_file_headers(ingester):
+    headers = [('Customer Id', 'Customer_Id'), ('region', 'region'), ('name', 'name')]
+
+    assert ingester._resolve_key_columns('customer id, REGION', headers) == ['Customer_Id', 'region']
+    assert ingester._resolve_key_columns(['Customer_Id', 'Customer Id'], headers) == ['Customer_Id']
+    with pytest.raises(ValueError, match="requires key columns"):
+        ingester._resolve_key_columns([], headers)
+    with pytest.raises(ValueError, match=r"not found in file: \['code'\]"):
+        ingester._resolve_key_columns(['name', 'code'], headers)
+
+
+@pytest.mark.asyncio
+async def test_upsert_merges_on_format_file_key(ingester, csv_file):
+    db = ingester.db_manager
+    db.table_exists.side_effect = lambda conn, table, *args: table == 'people'
+    db.determine_load_type.return_value = 'U'
+    db.sync_main_table_columns.return_value = {'added': [], 'mismatched': []}
+    db.ensure_metadata_columns.return_value = {'added': []}
+    db.ensure_key_index.return_value = True
+    db.merge_stage_into_main.return_value = {'updated': 1, 'inserted': 2}
+    ingester.file_handler.read_format_file = AsyncMock(return_value={
+        'csv_format': CSV_FORMAT, 'processing_options': {'key_columns': ['name']}
+    })
+    connection = db.get_connection.return_value
+
+    with patch.object(ingester, '_load_dataframe_to_table', new=AsyncMock()), \
+         patch('utils.progress.mark_moving'):
+        messages = [m async for m in ingester.ingest_data(csv_file, 'people.fmt', 'upsert', 'people.csv')]
+
+    assert not any(m.startswith('ERROR!') for m in messages)
+    db.truncate_table.assert_not_called()
+    db.ensure_key_index.assert_called_once_with(connection, 'people', ['name'])
+    args = db.merge_stage_into_main.call_args.args
+    assert args[1:4] == ('people', 'people_stage', ['name'])
+    assert args[4] == ['[name]', '[age]', '[ref_data_loadtime]', '[ref_data_loadtype]']
+    assert not any(str(c.args[0]).startswith('INSERT INTO [ref].[people]')
+                   for c in connection.cursor.return_value.execute.call_args_list)
+    assert any('Load type determined: upsert (code: U)' in m for m in messages)
+    assert any('Upsert applied: 1 rows updated, 2 rows inserted' in m for m in messages)
+
+
+@pytest.mark.asyncio
+async def test_upsert_without_key_fails_before_touching_tables(ingester, csv_file):
+    db = ingester.db_manager
+
+    with patch.object(ingester, '_load_dataframe_to_table', new=AsyncMock()) as load:
+        messages = [m async for m in ingester.ingest_data(
+            csv_file, 'people.fmt', 'upsert', 'people.csv', key_columns=['id']
+        )]
+
+    assert any("Key columns not found in file: ['id']" in m for m in messages if m.startswith('ERROR!'))
+    db.create_table.assert_not_called()
+    load.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_identical_content_skips_backup_version(ingester, csv_file):
+    ingester.transfer_chunk_rows = 0
+    ingester.skip_identical_backups = True
+    db = ingester.db_manager
+    db.backup_schema = 'bkp'
+    db.get_connection.return_value.cursor.return_value.rowcount = 5
+    db.table_exists.side_effect = lambda conn, table, *args: table == 'people_backup'
+    db.get_table_fingerprint.return_value = {'row_count': 5, 'content_hash': '42'}
+    db.get_latest_backup_version.return_value = {'version_id': 3, 'row_count': 5, 'content_hash': '42'}
+
+    messages, _ = await run_ingest(ingester, csv_file)
+
+    assert not any(m.startswith('ERROR!') for m in messages)
+    db.table_exists.assert_any_call(db.get_connection.return_value, 'people_backup', 'bkp')
+    db.backup_existing_data.assert_not_called()
+    assert any('identical to backup version 3 (5 rows) - skipping backup' in m for m in messages)
+
+    # Any difference writes a new version carrying the fingerprint
+    db.get_latest_backup_version.return_value = {'version_id': 3, 'row_count': 5, 'content_hash': '41'}
+    await run_ingest(ingester, csv_file)
+    db.backup_existing_data.assert_called_once_with(
+        db.get_connection.return_value, 'people', 'people', {'row_count': 5, 'content_hash': '42'},
+        snapshot_interval=ingester.backup_snapshot_interval
+    )
+
+
+@pytest.mark.asyncio
+async def test_backup_skip_check_hashes_main_only_when_row_count_matches(ingester, csv_file):
+    ingester.transfer_chunk_rows = 0
+    ingester.skip_identical_backups = True
+    db = ingester.db_manager
+    db.backup_schema = 'bkp'
+    db.get_connection.return_value.cursor.return_value.rowcount = 5
+    db.table_exists.side_effect = lambda conn, table, *args: table == 'people_backup'
+    db.get_latest_backup_version.return_value = {'version_id': 3, 'row_count': 4, 'content_hash': '42'}
+
+    messages, _ = await run_ingest(ingester, csv_file)
+
+    # 5 rows in main against 4 in the latest version: no full-table hash, a new version without one
+    assert not any(m.startswith('ERROR!') for m in messages)
+    db.get_table_fingerprint.assert_not_called()
+    db.backup_existing_data.assert_called_once_with(
+        db.get_connection.return_value, 'people', 'people', None,
+        snapshot_interval=ingester.backup_snapshot_interval
+    )
+
+
+def test_identical_backup_check_is_off_by_default(ingester):
+    assert DataIngester(MagicMock(), AsyncMock()).skip_identical_backups is False
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('load_type', ['fullload', 'full'])
+async def test_library_fullload_takes_delta_full_load_path(ingester, csv_file, load_type):
+    with patch('backend_lib.DatabaseManager'), patch('backend_lib.Logger'):
+        from backend_lib import ReferenceDataAPI
+        api = ReferenceDataAPI()
+    api.data_ingester = ingester
+    ingester.transfer_chunk_rows = 0
+    ingester.delta_full_load = True
+    db = ingester.db_manager
+    db.table_exists.side_effect = lambda conn, table, *args: table == 'people'
+    db.sync_main_table_columns.return_value = {'added': [], 'mismatched': []}
+    db.ensure_metadata_columns.return_value = {'added': []}
+    db.ensure_row_hash_column.return_value = False
+    db.apply_row_hash_delta.return_value = {'deleted': 0, 'inserted': 1}
+    main = [{'name': 'name'}, {'name': 'age'}, {'name': 'ref_data_loadtime'}, {'name': 'ref_data_loadtype'},
+            {'name': 'ref_data_row_hash'}]
+    db.get_table_columns.side_effect = lambda conn, table, *args: main
+
+    with patch.object(ingester, '_load_dataframe_to_table', new=AsyncMock()), \
+         patch.object(api, 'detect_format', return_value={'detected_format': {'column_delimiter': ','}}), \
+         patch('utils.progress.mark_moving'):
+        result = await api.process_file_async(csv_file, load_type=load_type, table_name='people')
+
+    assert result['success'], result
+    db.apply_row_hash_delta.assert_called_once()
+    db.truncate_table.assert_not_called()
+    assert any('Delta applied: 0 rows deleted, 1 rows inserted' in m for m in result['result'])
+
+
+@pytest.mark.asyncio
+async def test_library_fullload_takes_swap_full_load_path(ingester, csv_file):
+    with patch('backend_lib.DatabaseManager'), patch('backend_lib.Logger'):
+        from backend_lib import ReferenceDataAPI
+        api = ReferenceDataAPI()
+    api.data_ingester = ingester
+    ingester.transfer_chunk_rows = 0
+    ingester.swap_full_load = True
+    db = ingester.db_manager
+    db.table_exists.side_effect = lambda conn, table, *args: table == 'people'
+    db.sync_main_table_columns.return_value = {'added': [], 'mismatched': []}
+    db.ensure_metadata_columns.return_value = {'added': []}
+    db.create_swap_table.return_value = 'people_swap'
+    db.swap_in_table.return_value = True
+    db.get_connection.return_value.cursor.return_value.rowcount = 5
+
+    with patch.object(ingester, '_load_dataframe_to_table', new=AsyncMock()), \
+         patch.object(api, 'detect_format', return_value={'detected_format': {'column_delimiter': ','}}), \
+         patch('utils.progress.mark_moving'):
+        result = await api.process_file_async(csv_file, load_type='fullload', table_name='people')
+
+    assert result['success'], result
+    db.truncate_table.assert_not_called()
+    db.swap_in_table.assert_called_once_with(db.get_connection.return_value, 'people')
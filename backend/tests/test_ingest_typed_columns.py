@@ -0,0 +1,120 @@
+"""
+Tests for typed column detection and typed stage-to-main transfer in DataIngester
+"""
+import sys
+import pytest
+import pandas as pd
+from unittest.mock import MagicMock, AsyncMock, patch
+
+# pyodbc needs the unixODBC driver manager; mock it when unavailable
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    sys.modules['pyodbc'] = MagicMock()
+
+from utils.ingest import DataIngester
+
+
+CSV_FORMAT = {
+    'column_delimiter': ',',
+    'text_qualifier': '"',
+    'row_delimiter': '\n',
+    'has_trailer': False,
+}
+
+
+@pytest.fixture
+def ingester():
+    ing = DataIngester(MagicMock(), AsyncMock())
+    ing.date_parse_threshold = 0.8
+    ing.slow_progress_demo = False
+    return ing
+
+
+def test_detect_numeric_types(ingester):
+    df = pd.DataFrame({
+        'small': ['1', '-20', '+300', '', 'NULL'],
+        'large': ['1', '3000000000', '-5', '7', '8'],
+        'huge': ['1', '12345678901234567890', '0', '2', '3'],
+        'amount': ['1.5', '-20.25', '300', '.125', ''],
+        'zip': ['00501', '10001', '90210', '60601', '73301'],
+        'sci': ['1e5', '2', '3', '4', '5'],
+        'text': ['a', '1', '2', '3', '4'],
+    })
+    typed = ingester._detect_column_types(df, list(df.columns))
+
+    assert typed == {
+        'small': 'int',
+        'large': 'bigint',
+        'huge': 'decimal(20,0)',
+        'amount': 'decimal(6,3)',
+    }
+
+
+def test_detect_date_types_honours_threshold(ingester):
+    df = pd.DataFrame({
+        'day': ['2024-01-31', '2024-02-29', '9999-12-31', None, 'null'],
+        'stamp': ['2024-01-31 10:15', '2024-02-01T23:59:59.1234567', '2024-03-01', '2024-03-02', ''],
+        'mostly': ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04', 'unknown'],
+        'bad_days': ['2023-02-29', '2024-04-31', '2024-13-01', '2024-01-01', '2024-01-02'],
+        'bad_time': ['2024-01-01 24:00', '2024-01-01 10:60', '2024-01-01', '2024-01-02', '2024-01-03'],
+    })
+    typed = ingester._detect_column_types(df, list(df.columns))
+
+    # 4/5 valid meets the 0.8 threshold; 2/5 and 3/5 do not
+    assert typed == {'day': 'date', 'stamp': 'datetime2', 'mostly': 'date'}
+
+    ingester.date_parse_threshold = 1.0
+    assert 'mostly' not in ingester._detect_column_types(df, ['mostly'])
+
+
+@pytest.mark.asyncio
+async def test_ingest_typed_main_table_with_varchar_stage(ingester, tmp_path):
+    csv_file = tmp_path / "prices.csv"
+    csv_file.write_text("sku,price,as_of\n007,1.25,2024-01-01\n008,12.5,2024-01-02\n", encoding='utf-8')
+    ingester.typed_columns = True
+    ingester.enable_type_inference = False
+    db = ingester.db_manager
+    db.data_schema = 'ref'
+    ingester.file_handler = MagicMock()
+    ingester.file_handler.extract_table_base_name.return_value = 'prices'
+    ingester.file_handler.read_format_file = AsyncMock(return_value={'csv_format': CSV_FORMAT})
+    ingester.file_handler.move_to_archive.return_value = str(csv_file) + '.archived'
+    db.determine_load_type.return_value = 'F'
+    db.table_exists.return_value = False
+    db.execute_validation_procedure.return_value = {'validation_result': 0}
+    db.count_failed_conversions.return_value = {'price': 0, 'as_of': 3}
+    db._normalize_data_type.side_effect = lambda t, length, p, s: f'decimal({p},{s})' if t == 'decimal' else t
+    cursor = db.get_connection.return_value.cursor.return_value
+    cursor.rowcount = 0
+
+    main = [
+        {'name': 'sku', 'data_type': 'varchar'},
+        {'name': 'price', 'data_type': 'decimal', 'numeric_precision': 4, 'numeric_scale': 2},
+        {'name': 'as_of', 'data_type': 'date'},
+    ]
+    stage = [{'name': c['name'], 'data_type': 'varchar'} for c in main]
+    db.get_table_columns.side_effect = lambda conn, table, *args: stage if table.endswith('_stage') else main
+
+    with patch.object(ingester, '_load_dataframe_to_table', new=AsyncMock()):
+        messages = [m async for m in ingester.ingest_data(str(csv_file), 'prices.fmt', 'full', 'prices.csv')]
+
+    assert not any(m.startswith('ERROR!') for m in messages)
+    main_create, stage_create = db.create_table.call_args_list
+    assert main_create.args[2] == [
+        {'name': 'sku', 'data_type': 'varchar(4000)'},
+        {'name': 'price', 'data_type': 'decimal(4,2)'},
+        {'name': 'as_of', 'data_type': 'date'},
+    ]
+    assert all(col['data_type'] == 'varchar(4000)' for col in stage_create.args[2])
+
+    transfer_sql = next(c.args[0] for c in cursor.execute.call_args_list if str(c.args[0]).startswith('INSERT INTO'))
+    # as_of has values TRY_CONVERT would null out: its main column goes back to varchar and loads the text
+    assert "SELECT [sku], TRY_CONVERT(decimal(4,2), [price]), [as_of] FROM" in transfer_sql
+    db.count_failed_conversions.assert_called_once()
+    assert db.count_failed_conversions.call_args.args[2] == {'price': 'decimal(4,2)', 'as_of': 'date'}
+    db.sync_table_schema.assert_called_once_with(
+        db.get_connection.return_value, 'prices', [{'name': 'as_of', 'data_type': 'varchar'}]
+    )
+    assert any('3 values in column [as_of] are not valid date - converting the main table column to varchar' in m
+               for m in messages)
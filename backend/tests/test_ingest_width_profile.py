@@ -0,0 +1,130 @@
+"""
+Tests for full-file varchar width profiling in DataIngester
+"""
+import sys
+import json
+import pytest
+import pandas as pd
+from unittest.mock import MagicMock, AsyncMock, patch
+
+# pyodbc needs the unixODBC driver manager; mock it when unavailable
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    sys.modules['pyodbc'] = MagicMock()
+
+from utils.ingest import DataIngester
+
+
+CSV_FORMAT = {
+    'column_delimiter': ',',
+    'text_qualifier': '"',
+    'row_delimiter': '\n',
+    'has_trailer': False,
+}
+
+
+@pytest.fixture
+def ingester():
+    ing = DataIngester(MagicMock(), AsyncMock())
+    ing.width_headroom = 0.25
+    ing.width_min = 5
+    return ing
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "cities.csv"
+    path.write_text(
+        "city,code,empty\n"
+        "Paris,  FR  ,\n"
+        "São Paulo,BR,null\n"
+        "Zürich,CH,NaN\n"
+        "Amsterdam-Noord,NL,\n",
+        encoding='utf-8'
+    )
+    return str(path)
+
+
+def test_profile_columns_measures_loaded_bytes(ingester):
+    df = pd.DataFrame({
+        'City Name': ['Paris', 'São Paulo', ' Zürich ', None],
+        'code': ['  FR  ', 'null', '', 'NONE'],
+    })
+    profile = ingester._profile_columns(df, [('City Name', 'City_Name'), ('code', 'code')])
+
+    # 'São Paulo' is 9 characters but 10 UTF-8 bytes; surrounding spaces are not loaded
+    assert profile['City_Name'] == {'rows': 4, 'nulls': 1, 'max_bytes': 10}
+    assert profile['code'] == {'rows': 4, 'nulls': 3, 'max_bytes': 2}
+
+
+def test_size_columns_applies_headroom_and_limits(ingester):
+    profile = {
+        'short': {'rows': 1, 'nulls': 0, 'max_bytes': 2},
+        'medium': {'rows': 1, 'nulls': 0, 'max_bytes': 101},
+        'empty': {'rows': 1, 'nulls': 1, 'max_bytes': 0},
+        'huge': {'rows': 1, 'nulls': 0, 'max_bytes': 7000},
+    }
+    assert ingester._size_columns(profile) == {
+        'short': 'varchar(5)',
+        'medium': 'varchar(127)',
+        'empty': 'varchar(5)',
+        'huge': 'varchar(MAX)',
+    }
+
+
+def test_profile_file_matches_full_frame(ingester, csv_file):
+    headers = [('city', 'city'), ('code', 'code'), ('empty', 'empty')]
+    full_df = next(ingester._iter_csv_chunks(csv_file, CSV_FORMAT, chunk_rows=100))
+    full = ingester._profile_columns(full_df, headers)
+    ingester.chunk_rows = 1
+    chunked = ingester._profile_file(csv_file, CSV_FORMAT, headers)
+
+    assert chunked == full
+    assert chunked['city'] == {'rows': 4, 'nulls': 0, 'max_bytes': 15}
+    assert chunked['empty']['nulls'] == 4
+
+
+def test_persist_inferred_schema_records_null_ratios(ingester, tmp_path):
+    fmt = tmp_path / "cities.fmt"
+    fmt.write_text(json.dumps({'csv_format': CSV_FORMAT}), encoding='utf-8')
+    profile = {'code': {'rows': 4, 'nulls': 1, 'max_bytes': 2}}
+
+    ingester._persist_inferred_schema(str(fmt), {'code': 'varchar(5)'}, profile)
+
+    data = json.loads(fmt.read_text(encoding='utf-8'))
+    assert data['inferred_schema'] == {'code': 'varchar(5)'}
+    assert data['column_profile'] == {'code': {'max_bytes': 2, 'null_ratio': 0.25}}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('streaming', [False, True])
+async def test_ingest_data_creates_tight_columns(ingester, csv_file, streaming):
+    ingester.width_profiling = True
+    ingester.chunk_rows = 2
+    ingester.slow_progress_demo = False
+    db = ingester.db_manager
+    db.data_schema = 'ref'
+    ingester.file_handler = MagicMock()
+    ingester.file_handler.extract_table_base_name.return_value = 'cities'
+    ingester.file_handler.read_format_file = AsyncMock(return_value={'csv_format': CSV_FORMAT})
+    ingester.file_handler.move_to_archive.return_value = csv_file + '.archived'
+    db.determine_load_type.return_value = 'F'
+    db.table_exists.return_value = False
+    db.execute_validation_procedure.return_value = {'validation_result': 0}
+    db.get_connection.return_value.cursor.return_value.rowcount = 0
+    db.get_table_columns.return_value = [{'name': 'city'}, {'name': 'code'}, {'name': 'empty'}]
+
+    with patch.object(ingester, '_load_dataframe_to_table', new=AsyncMock()):
+        messages = [m async for m in ingester.ingest_data(
+            csv_file, 'cities.fmt', 'full', 'cities.csv', streaming=streaming
+        )]
+
+    assert not any(m.startswith('ERROR!') for m in messages)
+    assert any('profiled over 4 rows' in m for m in messages)
+    columns = db.create_table.call_args_list[0].args[2]
+    assert columns == [
+        {'name': 'city', 'data_type': 'varchar(19)'},
+        {'name': 'code', 'data_type': 'varchar(5)'},
+        {'name': 'empty', 'data_type': 'varchar(5)'},
+    ]
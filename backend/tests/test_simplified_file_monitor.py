@@ -0,0 +1,84 @@
+"""Tests for SimplifiedFileMonitor's per-cycle workflow reconciliation"""
+
+import sys
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+# pyodbc needs the unixODBC driver manager; mock it when unavailable
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    sys.modules['pyodbc'] = MagicMock()
+
+from simplified_file_monitor import SimplifiedFileMonitor
+
+
+@pytest.fixture
+def monitor():
+    # Skip __init__: it sets up logging, directories and the backend API
+    monitor = SimplifiedFileMonitor.__new__(SimplifiedFileMonitor)
+    monitor.logger = MagicMock()
+    monitor.workflow_manager = MagicMock()
+    monitor.workflow_manager.STATES = {'EXCEL_GENERATED': 'excel_generated', 'ERROR': 'error'}
+    monitor.workflow_manager.get_active_file_paths.return_value = {'/drop/a.csv'}
+    monitor.file_tracking = {}
+    monitor.active_file_paths = None
+    monitor.cycle_db_round_trips = 0
+    monitor.last_cycle_db_round_trips = None
+    return monitor
+
+
+def test_processing_checks_use_one_query(monitor):
+    monitor.refresh_active_workflows()
+
+    assert monitor.is_file_being_processed('/drop/a.csv')
+    assert not monitor.is_file_being_processed('/drop/b.csv')
+    monitor.workflow_manager.get_active_file_paths.assert_called_once()
+    assert monitor.cycle_db_round_trips == 1
+
+
+def test_first_check_loads_active_paths(monitor):
+    assert monitor.is_file_being_processed('/drop/a.csv')
+    monitor.workflow_manager.get_active_file_paths.assert_called_once()
+
+
+def test_failed_refresh_keeps_last_known_paths(monitor):
+    monitor.refresh_active_workflows()
+    monitor.workflow_manager.get_active_file_paths.return_value = None
+
+    monitor.refresh_active_workflows()
+
+    assert monitor.active_file_paths == {'/drop/a.csv'}
+
+
+def test_cleanup_tracking_drops_files_with_workflows(monitor, tmp_path):
+    tracked = tmp_path / 'a.csv'
+    tracked.write_text('id\n1\n')
+    waiting = tmp_path / 'b.csv'
+    waiting.write_text('id\n2\n')
+    monitor.workflow_manager.get_active_file_paths.return_value = {str(tracked)}
+    monitor.refresh_active_workflows()
+    for path in (tracked, waiting):
+        monitor.file_tracking[str(path)] = {'size': 5, 'mtime': 0, 'stable_count': 1, 'last_check': datetime.now()}
+
+    monitor.cleanup_tracking()
+
+    assert list(monitor.file_tracking) == [str(waiting)]
+    monitor.workflow_manager.get_active_file_paths.assert_called_once()
+
+
+def test_new_workflow_is_added_to_active_paths(monitor):
+    monitor.refresh_active_workflows()
+    monitor.csv_detector = MagicMock()
+    monitor.csv_detector.detect_format.return_value = {}
+    monitor.excel_generator = MagicMock()
+    monitor.workflow_manager.create_workflow.return_value = 'wf-1'
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr('simplified_file_monitor.os.path.getsize', lambda path: 1024)
+        assert monitor.handle_new_file('/drop/c.csv') == 'wf-1'
+
+    assert monitor.is_file_being_processed('/drop/c.csv')
+    assert monitor.cycle_db_round_trips == 3
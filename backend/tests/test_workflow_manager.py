@@ -0,0 +1,213 @@
+"""Tests for WorkflowManager's pooled connection, statement reuse and batch status updates"""
+
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+# pyodbc needs the unixODBC driver manager; mock it when unavailable
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    sys.modules['pyodbc'] = MagicMock()
+
+from utils.workflow_manager import WorkflowManager
+
+
+@pytest.fixture
+def db_manager():
+    manager = MagicMock()
+    connection = MagicMock()
+    connection.cursor.side_effect = lambda: MagicMock(rowcount=1, description=[('workflow_id',)])
+    manager.get_pooled_connection.return_value = connection
+    return manager
+
+
+@pytest.fixture
+def workflow_manager(db_manager):
+    return WorkflowManager(db_manager, MagicMock())
+
+
+def test_calls_share_one_pooled_connection(workflow_manager, db_manager):
+    workflow_id = workflow_manager.create_workflow('/data/a.csv')
+    assert workflow_manager.update_status(workflow_id, 'approved')
+    workflow_manager.get_pending_workflows()
+    workflow_manager.get_approved_workflows()
+
+    db_manager.get_pooled_connection.assert_called_once()
+    db_manager.get_connection.assert_not_called()
+
+
+def test_statement_cursor_is_reused(workflow_manager, db_manager):
+    connection = db_manager.get_pooled_connection.return_value
+    connection.cursor.side_effect = None
+    connection.cursor.return_value.fetchall.return_value = [('wf-1',)]
+    connection.cursor.return_value.description = [('workflow_id',)]
+    cursors_before = connection.cursor.call_count
+
+    workflow_manager.get_pending_workflows()
+    workflow_manager.get_pending_workflows()
+
+    # One new cursor for the pending query, reused on the second call
+    assert connection.cursor.call_count == cursors_before + 1
+
+
+def test_update_statuses_uses_one_batch(workflow_manager, db_manager):
+    connection = db_manager.get_pooled_connection.return_value
+    cursor = MagicMock()
+    connection.cursor.side_effect = None
+    connection.cursor.return_value = cursor
+
+    assert workflow_manager.update_statuses(['wf-1', 'wf-2', 'wf-1'], 'excel_generated')
+
+    cursor.executemany.assert_called_once()
+    sql, params = cursor.executemany.call_args[0]
+    assert 'excel_generated_at = ?' in sql
+    assert [row[-1] for row in params] == ['wf-1', 'wf-2']
+    assert cursor.fast_executemany is True
+    connection.commit.assert_called_once()
+    assert connection.autocommit is True
+
+
+def test_update_statuses_rejects_invalid_status(workflow_manager, db_manager):
+    assert workflow_manager.update_statuses(['wf-1'], 'not_a_status') is False
+
+
+def test_stale_connection_is_replaced_once(workflow_manager, db_manager):
+    stale = db_manager.get_pooled_connection.return_value
+    stale.cursor.side_effect = Exception('Communication link failure')
+    fresh = MagicMock()
+    fresh.cursor.return_value.rowcount = 1
+    db_manager.get_pooled_connection.return_value = fresh
+
+    assert workflow_manager.update_status('wf-1', 'completed')
+
+    db_manager.release_connection.assert_called_once_with(stale)
+    fresh.cursor.return_value.execute.assert_called_once()
+
+
+def test_close_releases_connection(workflow_manager, db_manager):
+    connection = db_manager.get_pooled_connection.return_value
+
+    workflow_manager.close()
+
+    db_manager.release_connection.assert_called_once_with(connection)
+    workflow_manager.get_pending_workflows()
+    assert db_manager.get_pooled_connection.call_count == 2
+
+
+def test_get_active_file_paths(workflow_manager, db_manager):
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [('/data/a.csv',), ('/data/b.csv',)]
+    cursor.description = [('csv_file_path',)]
+    connection = db_manager.get_pooled_connection.return_value
+    connection.cursor.side_effect = None
+    connection.cursor.return_value = cursor
+
+    assert workflow_manager.get_active_file_paths() == {'/data/a.csv', '/data/b.csv'}
+    assert cursor.execute.call_args[0][1] == ('completed', 'error')
+
+
+def test_get_active_file_paths_returns_none_on_failure(workflow_manager, db_manager):
+    db_manager.get_pooled_connection.side_effect = Exception('login failed')
+    workflow_manager.close()
+
+    assert workflow_manager.get_active_file_paths() is None
+
+
+class _SingleResultConnection:
+    """Fake connection without MARS: executing while another cursor has unread rows fails"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.cursors = []
+        self.autocommit = True
+
+    def cursor(self):
+        connection = self
+
+        class _Cursor:
+            description = [('workflow_id',), ('status',)]
+            rowcount = 1
+            pending = None
+
+            def execute(self, sql, params=None):
+                if any(other.pending is not None for other in connection.cursors):
+                    raise Exception('Connection is busy with results for another command')
+                self.pending = list(connection.rows) if sql.lstrip().startswith('SELECT') else None
+
+            def fetchone(self):
+                # The result set stays open until a fetch finds it exhausted
+                if not self.pending:
+                    self.pending = None
+                    return None
+                return self.pending.pop(0)
+
+            def fetchall(self):
+                rows, self.pending = self.pending or [], None
+                return rows
+
+            def close(self):
+                pass
+
+        cursor = _Cursor()
+        self.cursors.append(cursor)
+        return cursor
+
+
+def test_get_workflow_status_leaves_connection_free_for_next_statement(db_manager):
+    connection = _SingleResultConnection([('wf-1', 'pending')])
+    db_manager.get_pooled_connection.return_value = connection
+    manager = WorkflowManager(db_manager, MagicMock())
+
+    assert manager.get_workflow_status('wf-1') == {'workflow_id': 'wf-1', 'status': 'pending'}
+    assert manager.update_status('wf-1', 'approved')
+
+    # Both statements ran on the first connection, without a reconnect
+    db_manager.get_pooled_connection.assert_called_once()
+    db_manager.release_connection.assert_not_called()
+
+
+def test_failed_write_on_reused_connection_is_not_rerun(workflow_manager, db_manager):
+    stale = db_manager.get_pooled_connection.return_value
+    stale.cursor.side_effect = None
+    stale.cursor.return_value.execute.side_effect = Exception('Communication link failure')
+    fresh = MagicMock()
+    db_manager.get_pooled_connection.return_value = fresh
+
+    # The UPDATE may have been applied before the error, so it is not sent again
+    assert workflow_manager.update_status('wf-1', 'completed') is False
+    stale.cursor.return_value.execute.assert_called_once()
+    fresh.cursor.assert_not_called()
+    db_manager.release_connection.assert_called_once_with(stale)
+
+
+def test_failed_select_on_reused_connection_is_retried(workflow_manager, db_manager):
+    stale = db_manager.get_pooled_connection.return_value
+    stale.cursor.side_effect = None
+    stale.cursor.return_value.execute.side_effect = Exception('Communication link failure')
+    fresh = MagicMock()
+    fresh.cursor.return_value.fetchall.return_value = [('/data/a.csv',)]
+    fresh.cursor.return_value.description = [('csv_file_path',)]
+    db_manager.get_pooled_connection.return_value = fresh
+
+    assert workflow_manager.get_active_file_paths() == {'/data/a.csv'}
+    db_manager.release_connection.assert_called_once_with(stale)
+
+
+def test_statement_cache_closes_least_recently_used_cursor(workflow_manager, db_manager):
+    connection = db_manager.get_pooled_connection.return_value
+    cursors = []
+    connection.cursor.side_effect = lambda: cursors.append(MagicMock()) or cursors[-1]
+    limit = WorkflowManager.MAX_CACHED_STATEMENTS
+
+    workflow_manager._execute('SELECT 0')
+    for i in range(1, limit + 1):
+        workflow_manager._execute(f'SELECT {i}')
+        workflow_manager._execute('SELECT 0')  # keep the first statement recently used
+
+    assert len(workflow_manager._statements) == limit
+    assert 'SELECT 0' in workflow_manager._statements
+    assert 'SELECT 1' not in workflow_manager._statements
+    cursors[1].close.assert_called_once()
+    cursors[0].close.assert_not_called()
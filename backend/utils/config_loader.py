@@ -104,6 +104,9 @@ class ConfigLoader:
             'password': self.get('password', None, 'database'),
             'odbc_driver': self.get('odbc_driver', 'ODBC Driver 17 for SQL Server', 'database'),
             'pool_size': self.get('pool_size', 5, 'database'),
+            'pool_timeout': self.get('pool_timeout', 30, 'database'),
+            'pool_max_lifetime': self.get('pool_max_lifetime', 1800, 'database'),
+            'pool_validate_idle': self.get('pool_validate_idle', 30, 'database'),
             'max_retries': self.get('max_retries', 3, 'database'),
             'retry_backoff': self.get('retry_backoff', 0.5, 'database'),
         }
@@ -129,9 +132,33 @@ class ConfigLoader:
             'type_inference': self.get('type_inference', False, 'ingest'),
             'type_sample_rows': self.get('type_sample_rows', 5000, 'ingest'),
             'date_threshold': self.get('date_threshold', 0.8, 'ingest'),
+            'typed_columns': self.get('typed_columns', False, 'ingest'),
+            'width_profiling': self.get('width_profiling', False, 'ingest'),
+            'width_headroom': self.get('width_headroom', 0.25, 'ingest'),
+            'width_min': self.get('width_min', 50, 'ingest'),
             'batch_size': self.get('batch_size', 500, 'ingest'),
             'slow_progress_demo': self.get('slow_progress_demo', False, 'ingest'),
             'persist_schema': self.get('persist_schema', False, 'ingest'),
+            'load_engine': self.get('load_engine', 'executemany', 'ingest'),
+            'csv_engine': self.get('csv_engine', 'pandas', 'ingest'),
+            'tvp_batch_size': self.get('tvp_batch_size', 50000, 'ingest'),
+            'adaptive_batch': self.get('adaptive_batch', False, 'ingest'),
+            'adaptive_min_batch': self.get('adaptive_min_batch', 100, 'ingest'),
+            'adaptive_max_params': self.get('adaptive_max_params', 1000000, 'ingest'),
+            'adaptive_target_seconds': self.get('adaptive_target_seconds', 2.0, 'ingest'),
+            'streaming': self.get('streaming', False, 'ingest'),
+            'chunk_rows': self.get('chunk_rows', 100000, 'ingest'),
+            'pipeline': self.get('pipeline', False, 'ingest'),
+            'parallel_workers': self.get('parallel_workers', 1, 'ingest'),
+            'checkpoints': self.get('checkpoints', False, 'ingest'),
+            'transfer_chunk_rows': self.get('transfer_chunk_rows', 0, 'ingest'),
+            'swap_full_load': self.get('swap_full_load', False, 'ingest'),
+            'delta_full_load': self.get('delta_full_load', False, 'ingest'),
+            'skip_identical_backups': self.get('skip_identical_backups', False, 'ingest'),
+            'backup_snapshot_interval': self.get('backup_snapshot_interval', 0, 'ingest'),
+            'heap_stage': self.get('heap_stage', False, 'ingest'),
+            'heap_commit_rows': self.get('heap_commit_rows', 500000, 'ingest'),
+            'pipeline_queue_depth': self.get('pipeline_queue_depth', 2, 'ingest'),
         }
         return config
     
@@ -3,6 +3,9 @@ Database management utilities for SQL Server connection and operations
 """
 
 import os
+import base64
+import json
+import logging
 import pyodbc
 import traceback
 import re
@@ -10,7 +13,21 @@ from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 import threading
 import time
+from contextlib import contextmanager
 from .config_loader import config
+
+logger = logging.getLogger(__name__)
+
+# Per-row content hash (computed on the stage table, copied to main) when delta full loads are enabled
+ROW_HASH_COLUMN = 'ref_data_row_hash'
+# Marks rows of delta backup versions as added ('+') or removed ('-') relative to the previous version
+BACKUP_OP_COLUMN = 'ref_data_backup_op'
+# Identity row id of backup tables; with ref_data_version_id it forms the clustered key used for keyset paging
+BACKUP_ROW_ID_COLUMN = 'ref_data_backup_row_id'
+# Upper bounds (ms) of the pool wait-time and checkout-duration histogram buckets in get_pool_stats
+POOL_HISTOGRAM_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 30000)
+
+
 class DatabaseManager:
     """Handles all database operations for the Reference Data Auto Ingest System"""
 
@@ -37,13 +54,29 @@ class DatabaseManager:
         # Dynamic stored procedure name based on database name
         self.postload_sp_name = f"usp_reference_data_{self.database}"
 
-        # Simple connection pool
+        # Connection pool: idle connections in _pool, checked-out count in _in_use; waiters block on _pool_available
         self.pool_size = db_config['pool_size']
+        self.pool_timeout = db_config.get('pool_timeout', 30)
+        self.pool_max_lifetime = db_config.get('pool_max_lifetime', 1800)
+        self.pool_validate_idle = db_config.get('pool_validate_idle', 30)
         self._pool: List[pyodbc.Connection] = []
         self._pool_lock = threading.Lock()
+        self._pool_available = threading.Condition(self._pool_lock)
         self._in_use = 0
+        # Per connection (by id): creation time, time it went idle, checkout start - all time.monotonic()
+        self._conn_created: Dict[int, float] = {}
+        self._conn_idle_since: Dict[int, float] = {}
+        self._conn_checked_out: Dict[int, float] = {}
+        self._pool_counters = {'checkouts': 0, 'created': 0, 'discarded': 0, 'timeouts': 0}
+        self._pool_wait_histogram = [0] * (len(POOL_HISTOGRAM_BUCKETS_MS) + 1)
+        self._pool_checkout_histogram = [0] * (len(POOL_HISTOGRAM_BUCKETS_MS) + 1)
         self.max_retries = db_config['max_retries']
         self.retry_backoff = db_config['retry_backoff']
+        # Backup base names whose pre-catalog versions were already registered in Backup_Version
+        self._backup_catalog_backfilled = set()
+        # Table metadata (existence, schema, columns) cached per connection between
+        # begin_metadata_cache and end_metadata_cache; DDL issued through this manager invalidates it
+        self._metadata_cache: Dict[int, Dict[Tuple[str, Optional[str], str], Any]] = {}
 
     def _build_connection_string(self) -> str:
         """Build SQL Server connection string from configuration"""
@@ -86,42 +119,152 @@ class DatabaseManager:
         except Exception as e:
             raise Exception(f"Database connection failed: {str(e)}")
 
-    def get_pooled_connection(self) -> pyodbc.Connection:
-        """Acquire a pooled connection (creates new if under pool size)."""
-        with self._pool_lock:
-            if self._pool:
-                conn = self._pool.pop()
-                self._in_use += 1
-                return conn
-            if (self._in_use) < self.pool_size:
-                conn = self.get_connection()
+    def get_pooled_connection(self, timeout: float = None) -> pyodbc.Connection:
+        """Check out a pooled connection, reusing an idle one or opening a new one while fewer than
+        pool_size are checked out. When the pool is exhausted, waits up to timeout seconds (default
+        database.pool_timeout) for a release and raises TimeoutError after that.
+        Idle connections past pool_max_lifetime are replaced; ones idle longer than pool_validate_idle
+        seconds are checked with SELECT 1 first. Return it with release_connection (or use pooled_connection)."""
+        if timeout is None:
+            timeout = self.pool_timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        while True:
+            connection = None
+            with self._pool_available:
+                while not self._pool and self._in_use >= self.pool_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._pool_counters['timeouts'] += 1
+                        raise TimeoutError(
+                            f"No pooled database connection available within {timeout}s "
+                            f"(pool_size={self.pool_size}, in use={self._in_use})"
+                        )
+                    self._pool_available.wait(remaining)
+                if self._pool:
+                    connection = self._pool.pop()
                 self._in_use += 1
-                return conn
-        # Wait / retry outside lock
-        time.sleep(0.05)
-        return self.get_pooled_connection()
+
+            if connection is None:
+                try:
+                    connection = self.get_connection()
+                except Exception:
+                    self._free_pool_slot()
+                    raise
+                with self._pool_lock:
+                    self._conn_created[id(connection)] = time.monotonic()
+                    self._pool_counters['created'] += 1
+            elif not self._is_reusable(connection):
+                self._discard_connection(connection)
+                self._free_pool_slot()
+                continue
+
+            now = time.monotonic()
+            with self._pool_lock:
+                self._pool_counters['checkouts'] += 1
+                self._observe_pool_histogram(self._pool_wait_histogram, now - started)
+                self._conn_checked_out[id(connection)] = now
+            return connection
 
     def release_connection(self, connection: pyodbc.Connection):
-        """Return connection to pool or close if pool full."""
+        """Return connection to pool or close if pool full (or the connection is past its lifetime or broken)."""
         if connection is None:
             return
-        with self._pool_lock:
+        keep = True
+        try:
+            # Leave no open transaction behind for the next caller
+            if not connection.autocommit:
+                connection.rollback()
+                connection.autocommit = True
+        except Exception:
+            keep = False
+
+        with self._pool_available:
+            created = self._conn_created.get(id(connection))
+            if created is not None and self.pool_max_lifetime and time.monotonic() - created > self.pool_max_lifetime:
+                keep = False
             self._in_use -= 1
-            if len(self._pool) < self.pool_size:
+            checked_out = self._conn_checked_out.pop(id(connection), None)
+            if checked_out is not None:
+                self._observe_pool_histogram(self._pool_checkout_histogram, time.monotonic() - checked_out)
+            if keep and len(self._pool) < self.pool_size:
                 self._pool.append(connection)
+                self._conn_idle_since[id(connection)] = time.monotonic()
+                self._pool_available.notify()
                 return
+            self._pool_available.notify()
+        self._discard_connection(connection)
+
+    @contextmanager
+    def pooled_connection(self, timeout: float = None):
+        """Context manager checking out a pooled connection for the with-block and releasing it afterwards"""
+        connection = self.get_pooled_connection(timeout)
+        try:
+            yield connection
+        finally:
+            self.release_connection(connection)
+
+    def _is_reusable(self, connection: pyodbc.Connection) -> bool:
+        """Whether an idle pooled connection may be handed out: within its lifetime and, after a long idle
+        period, still answering queries"""
+        now = time.monotonic()
+        with self._pool_lock:
+            created = self._conn_created.get(id(connection))
+            idle_since = self._conn_idle_since.pop(id(connection), None)
+        if created is not None and self.pool_max_lifetime and now - created > self.pool_max_lifetime:
+            return False
+        if idle_since is not None and now - idle_since >= self.pool_validate_idle:
+            # The round trip runs outside the lock so other checkouts are not held up
+            try:
+                cursor = connection.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            except Exception as e:
+                logger.warning("Discarding broken pooled connection: %s", e)
+                return False
+        return True
+
+    def _free_pool_slot(self):
+        """Give back a checkout slot that did not end up holding a connection"""
+        with self._pool_available:
+            self._in_use -= 1
+            self._pool_available.notify()
+
+    def _discard_connection(self, connection: pyodbc.Connection):
+        """Close a connection that leaves the pool for good (call without holding _pool_lock)"""
+        with self._pool_lock:
+            for tracked in (self._conn_created, self._conn_idle_since, self._conn_checked_out):
+                tracked.pop(id(connection), None)
+            self._pool_counters['discarded'] += 1
         try:
             connection.close()
         except:
             pass
 
+    @staticmethod
+    def _observe_pool_histogram(histogram: List[int], seconds: float):
+        elapsed_ms = seconds * 1000
+        for i, bound in enumerate(POOL_HISTOGRAM_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                histogram[i] += 1
+                return
+        histogram[-1] += 1
+
+    @staticmethod
+    def _pool_histogram_dict(histogram: List[int]) -> Dict[str, int]:
+        labels = [f"<={bound}ms" for bound in POOL_HISTOGRAM_BUCKETS_MS] + [f">{POOL_HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        return dict(zip(labels, histogram))
+
     def get_pool_stats(self) -> Dict[str, Any]:
         with self._pool_lock:
             return {
                 "pool_size_config": self.pool_size,
                 "idle": len(self._pool),
                 "in_use": self._in_use,
-                "available_capacity": max(self.pool_size - (self._in_use + len(self._pool)), 0)
+                "available_capacity": max(self.pool_size - (self._in_use + len(self._pool)), 0),
+                **self._pool_counters,
+                "wait_ms_histogram": self._pool_histogram_dict(self._pool_wait_histogram),
+                "checkout_ms_histogram": self._pool_histogram_dict(self._pool_checkout_histogram)
             }
 
     def close_pool(self):
@@ -132,6 +275,8 @@ class DatabaseManager:
                     conn.close()
                 except:
                     pass
+                for tracked in (self._conn_created, self._conn_idle_since):
+                    tracked.pop(id(conn), None)
 
     def test_connection(self) -> Dict[str, Any]:
         """Test database connectivity"""
@@ -177,11 +322,45 @@ class DatabaseManager:
             except Exception as e:
                 raise Exception(f"Failed to create schema {schema}: {str(e)}")
 
+    def begin_metadata_cache(self, connection: pyodbc.Connection) -> None:
+        """Cache table_exists, get_table_schema and get_table_columns results for connection until
+        end_metadata_cache. Tables altered through this manager are invalidated automatically; DDL issued
+        elsewhere needs invalidate_table_metadata."""
+        self._metadata_cache.setdefault(id(connection), {})
+
+    def end_metadata_cache(self, connection: pyodbc.Connection) -> None:
+        """Stop caching table metadata for connection and drop what was cached"""
+        self._metadata_cache.pop(id(connection), None)
+
+    def invalidate_table_metadata(self, table_name: str, schema: str = None) -> None:
+        """Forget cached metadata of table_name in every connection's cache (the table may have changed)"""
+        if schema is None:
+            schema = self.data_schema
+        table_key = table_name.lower()
+        for cache in list(self._metadata_cache.values()):
+            for key in [k for k in cache if k[2] == table_key and k[1] in (schema.lower(), None)]:
+                cache.pop(key, None)
+
+    def _cached_metadata(self, connection: pyodbc.Connection, key: Tuple[str, Optional[str], str], load):
+        """Cached result of load() for key when connection has a metadata cache, else load()"""
+        cache = self._metadata_cache.get(id(connection))
+        if cache is None:
+            return load()
+        if key not in cache:
+            cache[key] = load()
+        return cache[key]
+
     def table_exists(self, connection: pyodbc.Connection, table_name: str, schema: str = None) -> bool:
         """Check if a table exists"""
         if schema is None:
             schema = self.data_schema
 
+        return self._cached_metadata(
+            connection, ('exists', schema.lower(), table_name.lower()),
+            lambda: self._query_table_exists(connection, table_name, schema)
+        )
+
+    def _query_table_exists(self, connection: pyodbc.Connection, table_name: str, schema: str) -> bool:
         cursor = connection.cursor()
         cursor.execute("""
             SELECT COUNT(*)
@@ -194,6 +373,12 @@ class DatabaseManager:
 
     def get_table_schema(self, connection: pyodbc.Connection, table_name: str) -> str:
         """Get the schema for a table if it exists, returns None if table doesn't exist"""
+        return self._cached_metadata(
+            connection, ('schema', None, table_name.lower()),
+            lambda: self._query_table_schema(connection, table_name)
+        )
+
+    def _query_table_schema(self, connection: pyodbc.Connection, table_name: str) -> str:
         cursor = connection.cursor()
         cursor.execute("""
             SELECT TABLE_SCHEMA
@@ -222,6 +407,14 @@ class DatabaseManager:
         if schema is None:
             schema = self.data_schema
 
+        columns = self._cached_metadata(
+            connection, ('columns', schema.lower(), table_name.lower()),
+            lambda: self._query_table_columns(connection, table_name, schema)
+        )
+        # Callers may modify the column dicts; keep the cached list intact
+        return [dict(col) for col in columns]
+
+    def _query_table_columns(self, connection: pyodbc.Connection, table_name: str, schema: str) -> List[Dict[str, Any]]:
         cursor = connection.cursor()
         cursor.execute("""
             SELECT
@@ -254,8 +447,12 @@ class DatabaseManager:
         return columns
 
     def create_table(self, connection: pyodbc.Connection, table_name: str, columns: List[Dict[str, str]],
-                    schema: str = None, add_metadata_columns: bool = True) -> None:
-        """Create a table with the specified columns"""
+                    schema: str = None, add_metadata_columns: bool = True, heap: bool = False,
+                    identity_column: str = None) -> None:
+        """Create a table with the specified columns.
+        heap=True creates a bare heap with no constraints (no ref_data_loadtime default) for bulk staging.
+        identity_column adds a bigint IDENTITY row number (clustered primary key unless heap) so the
+        table can be read in key ranges."""
         if schema is None:
             schema = self.data_schema
 
@@ -264,6 +461,7 @@ class DatabaseManager:
         # Drop table if it exists - use dynamic SQL with proper quoting
         drop_sql = "DROP TABLE IF EXISTS [" + schema + "].[" + table_name + "]"
         cursor.execute(drop_sql)
+        self.invalidate_table_metadata(table_name, schema)
 
         # Build column definitions
         column_defs = []
@@ -273,9 +471,17 @@ class DatabaseManager:
 
         # Add metadata columns if requested
         if add_metadata_columns:
-            column_defs.append("[ref_data_loadtime] datetime DEFAULT GETDATE()")
+            if heap:
+                # The loader always supplies ref_data_loadtime, so the heap needs no default constraint
+                column_defs.append("[ref_data_loadtime] datetime")
+            else:
+                column_defs.append("[ref_data_loadtime] datetime DEFAULT GETDATE()")
             column_defs.append("[ref_data_loadtype] varchar(255)")
 
+        if identity_column:
+            key = "" if heap else " PRIMARY KEY CLUSTERED"
+            column_defs.append(f"[{identity_column}] bigint IDENTITY(1,1) NOT NULL{key}")
+
         # Create the table
         create_sql = f"""
             CREATE TABLE [{schema}].[{table_name}] (
@@ -284,6 +490,7 @@ class DatabaseManager:
         """
 
         cursor.execute(create_sql)
+        self.invalidate_table_metadata(table_name, schema)
 
     def drop_table_if_exists(self, connection: pyodbc.Connection, table_name: str, schema: str = None) -> bool:
         """Drop table if it exists. Returns True if table was dropped, False if it didn't exist."""
@@ -305,6 +512,7 @@ class DatabaseManager:
             # Drop the table
             drop_sql = f"DROP TABLE [{schema}].[{table_name}]"
             cursor.execute(drop_sql)
+            self.invalidate_table_metadata(table_name, schema)
             print(f"INFO: Dropped table [{schema}].[{table_name}]")
             return True
         else:
@@ -347,11 +555,28 @@ class DatabaseManager:
                     timestamp_suffix = self._get_timestamp_suffix()
                     old_backup_name = f"{backup_table_name}_{timestamp_suffix}"
 
-                    # Rename existing backup table to preserve historical data
+                    # Rename existing backup table to preserve historical data. Its Backup_Version rows move
+                    # with it in the same transaction, so the recreated table's versions start from an empty
+                    # catalog instead of colliding with (or being skipped as identical to) the renamed ones.
                     rename_sql = (
                         "EXEC sp_rename '[" + self.backup_schema + "].[" + backup_table_name + "]', '" + old_backup_name + "'"
                     )
-                    cursor.execute(rename_sql)
+                    self.ensure_backup_catalog_table(connection)
+                    connection.autocommit = False
+                    try:
+                        cursor.execute(rename_sql)
+                        cursor.execute(
+                            f"UPDATE [{self.backup_schema}].[Backup_Version] SET [base_name] = ? WHERE [base_name] = ?",
+                            old_backup_name, table_name
+                        )
+                        connection.commit()
+                    except Exception:
+                        connection.rollback()
+                        raise
+                    finally:
+                        connection.autocommit = True
+                    self.invalidate_table_metadata(backup_table_name, self.backup_schema)
+                    self._backup_catalog_backfilled.discard(table_name)
                     print(f"INFO: Preserved historical backup data by renaming to {old_backup_name}")
 
         # Build column definitions (same as main table)
@@ -367,7 +592,8 @@ class DatabaseManager:
         column_defs.extend([
             "[ref_data_loadtime] datetime",
             "[ref_data_loadtype] varchar(255)",
-            "[ref_data_version_id] int NOT NULL"
+            "[ref_data_version_id] int NOT NULL",
+            f"[{BACKUP_ROW_ID_COLUMN}] bigint IDENTITY(1,1) NOT NULL"
         ])
 
         # Create the backup table with proper schema quoting
@@ -376,6 +602,8 @@ class DatabaseManager:
             ', '.join(column_defs) + ")"
         )
         cursor.execute(create_sql)
+        self.invalidate_table_metadata(backup_table_name, self.backup_schema)
+        self.ensure_backup_row_index(connection, backup_table_name)
 
     def _backup_schema_matches(self, connection: pyodbc.Connection, backup_table_name: str, expected_columns: List[Dict[str, str]]) -> bool:
         """Check if existing backup table schema matches expected columns including data types"""
@@ -387,7 +615,7 @@ class DatabaseManager:
 
             # Filter out backup-specific metadata columns
             data_columns = [col for col in existing_columns
-                           if col['name'] not in ['ref_data_loadtime', 'ref_data_loadtype', 'ref_data_version_id']]
+                           if col['name'] not in ['ref_data_loadtime', 'ref_data_loadtype', 'ref_data_version_id', BACKUP_OP_COLUMN, BACKUP_ROW_ID_COLUMN]]
 
             print(f"DEBUG: Found {len(data_columns)} data columns in existing backup table")
             print(f"DEBUG: Expected {len(expected_columns)} columns from main table")
@@ -426,8 +654,11 @@ class DatabaseManager:
             print(f"WARNING: Could not validate backup table schema: {str(e)}")
             return False
 
-    def _sync_backup_table_schema(self, connection: pyodbc.Connection, backup_table_name: str, expected_columns: List[Dict[str, str]]) -> dict:
-        """Attempt to sync backup table schema with expected columns by adding/modifying columns including data types"""
+    def _sync_backup_table_schema(self, connection: pyodbc.Connection, backup_table_name: str, expected_columns: List[Dict[str, str]],
+                                  dry_run: bool = False) -> dict:
+        """Attempt to sync backup table schema with expected columns by adding/modifying columns including data types.
+        Missing columns are added in one ALTER TABLE; the statements are returned in changes['ddl'] and only
+        planned with dry_run."""
         print(f"DEBUG: Starting backup table schema sync for {backup_table_name}")
         try:
             cursor = connection.cursor()
@@ -437,14 +668,16 @@ class DatabaseManager:
 
             # Filter out backup-specific metadata columns for comparison
             data_columns = {col['name'].lower(): col for col in existing_columns
-                           if col['name'] not in ['ref_data_loadtime', 'ref_data_loadtype', 'ref_data_version_id']}
+                           if col['name'] not in ['ref_data_loadtime', 'ref_data_loadtype', 'ref_data_version_id', BACKUP_OP_COLUMN, BACKUP_ROW_ID_COLUMN]}
 
             # Track changes made
             changes = {
                 'added': [],
                 'modified': [],
-                'errors': []
+                'errors': [],
+                'ddl': []
             }
+            to_add = []
 
             # Process each expected column
             for expected_col in expected_columns:
@@ -453,17 +686,9 @@ class DatabaseManager:
                 expected_type = expected_col['data_type']
 
                 if col_name_lower not in data_columns:
-                    # Column doesn't exist, add it
-                    try:
-                        expected_type_norm = self._normalize_data_type(expected_col['data_type'], expected_col.get('max_length'), expected_col.get('numeric_precision'), expected_col.get('numeric_scale'))
-                        alter_sql = f"ALTER TABLE [{self.backup_schema}].[{backup_table_name}] ADD [{col_name}] {expected_type_norm}"
-                        cursor.execute(alter_sql)
-                        changes['added'].append({'column': col_name, 'type': expected_type_norm})
-                        print(f"INFO: Added column [{col_name}] {expected_type_norm} to backup table")
-                    except Exception as e:
-                        error_msg = f"Failed to add column {col_name}: {str(e)}"
-                        changes['errors'].append(error_msg)
-                        print(f"WARNING: {error_msg}")
+                    # Column doesn't exist, add it (batched below)
+                    expected_type_norm = self._normalize_data_type(expected_col['data_type'], expected_col.get('max_length'), expected_col.get('numeric_precision'), expected_col.get('numeric_scale'))
+                    to_add.append((col_name, expected_type_norm))
                 else:
                     # Column exists, check if type needs modification
                     existing_col = data_columns[col_name_lower]
@@ -475,7 +700,10 @@ class DatabaseManager:
                         if self._is_safe_column_modification(existing_col, expected_col):
                             try:
                                 alter_sql = f"ALTER TABLE [{self.backup_schema}].[{backup_table_name}] ALTER COLUMN [{col_name}] {expected_type_norm}"
-                                cursor.execute(alter_sql)
+                                changes['ddl'].append(alter_sql)
+                                if not dry_run:
+                                    self.invalidate_table_metadata(backup_table_name, self.backup_schema)
+                                    cursor.execute(alter_sql)
                                 changes['modified'].append({
                                     'column': col_name,
                                     'from': existing_type,
@@ -500,6 +728,27 @@ class DatabaseManager:
             if extra_columns:
                 print(f"INFO: Backup table has extra columns that will be preserved: {extra_columns}")
 
+            # Add all missing columns in one statement
+            add_result = self._add_columns(connection, backup_table_name, self.backup_schema, to_add,
+                                           dry_run=dry_run, tolerate_errors=True)
+            changes['ddl'].extend(add_result['sql'])
+            for col_name, expected_type_norm in to_add:
+                if col_name in add_result['errors']:
+                    error_msg = f"Failed to add column {col_name}: {add_result['errors'][col_name]}"
+                    changes['errors'].append(error_msg)
+                    print(f"WARNING: {error_msg}")
+                else:
+                    changes['added'].append({'column': col_name, 'type': expected_type_norm})
+                    if not dry_run:
+                        print(f"INFO: Added column [{col_name}] {expected_type_norm} to backup table")
+
+            if dry_run:
+                return {
+                    'success': not changes['errors'],
+                    'summary': f"planned {len(changes['ddl'])} statements",
+                    'changes': changes
+                }
+
             # Commit changes if no errors
             if changes['errors']:
                 connection.rollback()
@@ -716,12 +965,101 @@ class DatabaseManager:
                 ]
             }
 
-    def ensure_backup_table_metadata_columns(self, connection: pyodbc.Connection, backup_table_name: str) -> Dict[str, Any]:
-        """Ensure backup table has all required metadata columns"""
+    def get_stage_load_objects(self, table_name: str) -> Dict[str, str]:
+        """Names of the table type and procedure used for table-valued parameter loads into table_name"""
+        return {
+            "schema": self.validation_sp_schema,
+            "type": f"tt_ref_load_{table_name}",
+            "procedure": f"sp_ref_load_{table_name}",
+        }
+
+    def create_stage_load_procedure(self, connection: pyodbc.Connection, table_name: str,
+                                    columns: List[Dict[str, str]], schema: str = None,
+                                    tablock: bool = False) -> Dict[str, str]:
+        """Create the table type and INSERT ... SELECT FROM @rows procedure for TVP loads.
+        Both are dropped and recreated on every call because the stage table follows the input file.
+        The type's column order is the data columns followed by ref_data_loadtime, ref_data_loadtype.
+        tablock=True adds WITH (TABLOCK) so inserts into a heap stage table can be minimally logged."""
+        if schema is None:
+            schema = self.data_schema
+        objects = self.get_stage_load_objects(table_name)
+        type_ref = "[" + objects["schema"] + "].[" + objects["type"] + "]"
+        proc_ref = "[" + objects["schema"] + "].[" + objects["procedure"] + "]"
+
         cursor = connection.cursor()
+        # The procedure references the type, so it has to go first
+        cursor.execute("DROP PROCEDURE IF EXISTS " + proc_ref)
+        cursor.execute("DROP TYPE IF EXISTS " + type_ref)
+
+        column_defs = [f"[{col['name']}] {col['data_type']}" for col in columns]
+        column_defs.append("[ref_data_loadtime] datetime")
+        column_defs.append("[ref_data_loadtype] varchar(255)")
+        metadata_columns = ['[ref_data_loadtime]', '[ref_data_loadtype]']
+        cursor.execute(f"CREATE TYPE {type_ref} AS TABLE ({', '.join(column_defs)})")
+
+        column_list = ', '.join([f"[{col['name']}]" for col in columns] + metadata_columns)
+        cursor.execute(f"""
+            CREATE PROCEDURE {proc_ref}
+                @rows {type_ref} READONLY
+            AS
+            BEGIN
+                SET NOCOUNT ON;
+                INSERT INTO [{schema}].[{table_name}]{" WITH (TABLOCK)" if tablock else ""} ({column_list})
+                SELECT {column_list} FROM @rows;
+            END
+        """)
+        return objects
+
+    def _add_columns(self, connection: pyodbc.Connection, table_name: str, schema: str,
+                     column_defs: List[Tuple[str, str]], dry_run: bool = False,
+                     tolerate_errors: bool = False) -> Dict[str, Any]:
+        """Add column_defs ([(name, type definition)]) to a table in one ALTER TABLE ... ADD statement, so
+        the table takes one schema-modification lock however many columns are missing.
+        dry_run only builds the statement. With tolerate_errors a failed statement is retried column by
+        column and the failures are reported instead of raised.
+        Returns {'sql': [statements], 'added': [column names], 'errors': {column name: error}}."""
+        result = {'sql': [], 'added': [], 'errors': {}}
+        if not column_defs:
+            return result
+        add_sql = f"ALTER TABLE [{schema}].[{table_name}] ADD " + ", ".join(f"[{name}] {definition}" for name, definition in column_defs)
+        result['sql'].append(add_sql)
+        if dry_run:
+            return result
+
+        cursor = connection.cursor()
+        self.invalidate_table_metadata(table_name, schema)
+        try:
+            cursor.execute(add_sql)
+            result['added'] = [name for name, _ in column_defs]
+            return result
+        except Exception as e:
+            if not tolerate_errors:
+                raise
+            if len(column_defs) == 1:
+                result['errors'][column_defs[0][0]] = str(e)
+                return result
+            print(f"WARNING: Adding {len(column_defs)} columns to [{schema}].[{table_name}] in one statement failed ({str(e)}); adding them one at a time")
+
+        for name, definition in column_defs:
+            single_sql = f"ALTER TABLE [{schema}].[{table_name}] ADD [{name}] {definition}"
+            result['sql'].append(single_sql)
+            try:
+                cursor.execute(single_sql)
+                result['added'].append(name)
+            except Exception as e:
+                result['errors'][name] = str(e)
+        return result
+
+    def ensure_backup_table_metadata_columns(self, connection: pyodbc.Connection, backup_table_name: str,
+                                             dry_run: bool = False) -> Dict[str, Any]:
+        """Ensure backup table has all required metadata columns (added in one ALTER TABLE).
+        dry_run returns the planned statements in 'ddl' without executing them.
+        The keyset row id column and its clustered index are not retrofitted here: on a large existing backup
+        table both rebuild the table under a schema lock. New backup tables get them in create_backup_table;
+        existing ones are migrated once with sql/migrate_backup_row_ids.sql."""
         existing_cols_list = self.get_table_columns(connection, backup_table_name, self.backup_schema)
         existing_cols = {c['name'].lower(): c for c in existing_cols_list}
-        actions = {"added": [], "skipped": []}
+        actions = {"added": [], "skipped": [], "ddl": [], "dry_run": dry_run}
 
         # Define required backup metadata columns
         backup_metadata_columns = [
@@ -730,21 +1068,196 @@ class DatabaseManager:
             {"name": "ref_data_version_id", "data_type": "int NOT NULL", "default": ""}
         ]
 
+        missing = []
         for meta_col in backup_metadata_columns:
             col_name_lower = meta_col["name"].lower()
             if col_name_lower not in existing_cols:
-                # Add missing metadata column
-                add_col_sql = f"ALTER TABLE [{self.backup_schema}].[{backup_table_name}] ADD [{meta_col['name']}] {meta_col['data_type']}"
-                cursor.execute(add_col_sql)
-                actions["added"].append({"column": meta_col["name"], "data_type": meta_col["data_type"]})
-                print(f"Added metadata column {meta_col['name']} to backup table {backup_table_name}")
+                missing.append(meta_col)
             else:
                 actions["skipped"].append({"column": meta_col["name"], "reason": "already exists"})
 
+        # Add all missing metadata columns in one statement
+        added = self._add_columns(connection, backup_table_name, self.backup_schema,
+                                  [(c["name"], c["data_type"]) for c in missing], dry_run=dry_run)
+        actions["ddl"] = added['sql']
+        for meta_col in missing:
+            actions["added"].append({"column": meta_col["name"], "data_type": meta_col["data_type"]})
+            if not dry_run:
+                print(f"Added metadata column {meta_col['name']} to backup table {backup_table_name}")
+
         return actions
 
-    def backup_existing_data(self, connection: pyodbc.Connection, source_table: str, backup_table: str) -> int:
-        """Backup existing data to backup table with version increment, filtering out trailer rows"""
+    def ensure_backup_row_index(self, connection: pyodbc.Connection, backup_table_name: str) -> None:
+        """Cluster a backup table on (ref_data_version_id, row id) so one version's rows are read in row id
+        order by seeking, unless the table already has a clustered index."""
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            IF NOT EXISTS (
+                SELECT 1 FROM sys.indexes
+                WHERE object_id = OBJECT_ID(N'[{self.backup_schema}].[{backup_table_name}]') AND type = 1
+            )
+            CREATE CLUSTERED INDEX [cx_{backup_table_name}_version_row]
+            ON [{self.backup_schema}].[{backup_table_name}] ([ref_data_version_id], [{BACKUP_ROW_ID_COLUMN}])
+        """)
+
+    def ensure_backup_catalog_table(self, connection: pyodbc.Connection) -> None:
+        """Ensure the Backup_Version catalog (one row per backup version written) exists in the backup schema"""
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            IF OBJECT_ID(N'[{self.backup_schema}].[Backup_Version]', N'U') IS NULL
+            CREATE TABLE [{self.backup_schema}].[Backup_Version] (
+                [base_name] varchar(255) NOT NULL,
+                [version_id] int NOT NULL,
+                [row_count] bigint NOT NULL,
+                [content_hash] varchar(40) NULL,
+                [is_delta] bit NOT NULL DEFAULT 0,
+                [created_at] datetime NOT NULL DEFAULT GETDATE(),
+                PRIMARY KEY ([base_name], [version_id])
+            )
+        """)
+
+    def get_table_fingerprint(self, connection: pyodbc.Connection, table_name: str, schema: str = None) -> Dict[str, Any]:
+        """Order-independent content fingerprint of table_name's data columns (metadata columns excluded).
+        Each row is hashed (SHA2_256 over its values, columns in name order) and the hashes are summed,
+        so the same rows in any order - or the same columns in another order - give the same result.
+        Returns {'row_count': int, 'content_hash': str}."""
+        if schema is None:
+            schema = self.data_schema
+
+        metadata = {'ref_data_loadtime', 'ref_data_loadtype', 'ref_data_version_id', ROW_HASH_COLUMN}
+        columns = sorted(
+            (c for c in self.get_table_columns(connection, table_name, schema) if c['name'].lower() not in metadata),
+            key=lambda c: c['name'].lower()
+        )
+        if not columns:
+            return {'row_count': self.get_row_count(connection, table_name, schema), 'content_hash': None}
+
+        values = []
+        for col in columns:
+            data_type = str(col.get('data_type') or '').lower()
+            if data_type in ('date', 'time', 'datetime', 'datetime2', 'smalldatetime', 'datetimeoffset'):
+                text = f"CONVERT(nvarchar(max), [{col['name']}], 126)"
+            elif data_type in ('float', 'real'):
+                text = f"CONVERT(nvarchar(max), [{col['name']}], 3)"
+            else:
+                text = f"CONVERT(nvarchar(max), [{col['name']}])"
+            values.append(f"COALESCE({text}, N'~NULL~')")
+        row_text = " + NCHAR(31) + ".join(values)
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            SELECT COUNT_BIG(*),
+                   SUM(CAST(CAST(SUBSTRING(HASHBYTES('SHA2_256', {row_text}), 1, 6) AS bigint) AS decimal(38, 0)))
+            FROM [{schema}].[{table_name}]
+        """)
+        row_count, hash_sum = cursor.fetchone()
+        return {'row_count': int(row_count or 0), 'content_hash': str(int(hash_sum or 0))}
+
+    # Catalog rows of base_name written since its live backup table was created; rows from before (a table
+    # renamed away or dropped and recreated) describe versions that are no longer in the backup table.
+    # Parameters: backup table name, backup schema.
+    _LIVE_CATALOG_FILTER = (
+        "[created_at] >= (SELECT [create_date] FROM sys.tables WHERE [name] = ? AND [schema_id] = SCHEMA_ID(?))"
+    )
+
+    def _purge_stale_backup_catalog(self, connection: pyodbc.Connection, base_name: str) -> int:
+        """Delete base_name's catalog rows written before its live backup table was created; returns the count.
+        The caller commits."""
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            DELETE FROM [{self.backup_schema}].[Backup_Version]
+            WHERE [base_name] = ? AND NOT ({self._LIVE_CATALOG_FILTER})
+              AND OBJECT_ID(?, N'U') IS NOT NULL
+        """, base_name, f"{base_name}_backup", self.backup_schema,
+            f"[{self.backup_schema}].[{base_name}_backup]")
+        purged = cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 else 0
+        if purged:
+            print(f"INFO: Removed {purged} catalogued backup versions of {base_name} that predate its backup table")
+        return purged
+
+    def get_latest_backup_version(self, connection: pyodbc.Connection, base_name: str) -> Optional[Dict[str, Any]]:
+        """Latest catalogued backup version of base_name ({'version_id', 'row_count', 'content_hash'}), or None"""
+        self.ensure_backup_catalog_table(connection)
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            SELECT TOP 1 [version_id], [row_count], [content_hash]
+            FROM [{self.backup_schema}].[Backup_Version]
+            WHERE [base_name] = ? AND {self._LIVE_CATALOG_FILTER}
+            ORDER BY [version_id] DESC
+        """, base_name, f"{base_name}_backup", self.backup_schema)
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return {'version_id': row[0], 'row_count': row[1], 'content_hash': row[2]}
+
+    def _backup_snapshot_version(self, connection: pyodbc.Connection, base_name: str, version_id: int) -> int:
+        """Version of the full snapshot that backup version_id is rebuilt from (version_id itself for a full copy).
+        Delta versions are catalogued with is_delta = 1; versions outside the catalog are full copies."""
+        self.ensure_backup_catalog_table(connection)
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            SELECT [version_id] FROM [{self.backup_schema}].[Backup_Version]
+            WHERE [base_name] = ? AND [version_id] <= ? AND [is_delta] = 1
+            ORDER BY [version_id] DESC
+        """, base_name, version_id)
+        snapshot = version_id
+        for row in cursor.fetchall():
+            if row[0] != snapshot:
+                break
+            snapshot -= 1
+        return snapshot
+
+    @staticmethod
+    def _copies_apply(count_expression: str) -> str:
+        """CROSS APPLY source yielding count_expression rows, to expand grouped rows back into duplicates"""
+        return (
+            f"CROSS APPLY (SELECT TOP ({count_expression}) 1 AS [copy] "
+            "FROM sys.all_columns AS a CROSS JOIN sys.all_columns AS b) AS [copies]"
+        )
+
+    def _delta_backup_source(self, connection: pyodbc.Connection, base_name: str, version_id: int) -> Optional[str]:
+        """FROM-clause source with the rows of a delta backup version, in the backup table's column order:
+        the nearest snapshot plus the following deltas folded together (duplicate rows preserved).
+        Returns None when version_id is a full copy, which is read directly."""
+        snapshot = self._backup_snapshot_version(connection, base_name, version_id)
+        if snapshot == version_id:
+            return None
+
+        metadata = {'ref_data_loadtime', 'ref_data_loadtype', 'ref_data_version_id', BACKUP_OP_COLUMN, BACKUP_ROW_ID_COLUMN}
+        columns = [c['name'] for c in self.get_table_columns(connection, f"{base_name}_backup", self.backup_schema)]
+        data_list = ", ".join(f"[{c}]" for c in columns if c.lower() not in metadata)
+        output = []
+        for col in columns:
+            col_lower = col.lower()
+            if col_lower == 'ref_data_loadtype':
+                output.append("'backup' AS [ref_data_loadtype]")
+            elif col_lower == 'ref_data_version_id':
+                output.append(f"{int(version_id)} AS [ref_data_version_id]")
+            elif col_lower == BACKUP_OP_COLUMN:
+                output.append(f"CAST(NULL AS char(1)) AS [{col}]")
+            elif col_lower == BACKUP_ROW_ID_COLUMN:
+                # Rebuilt rows get a deterministic row id (identical rows are interchangeable)
+                output.append(f"ROW_NUMBER() OVER (ORDER BY {', '.join(f'[g].[{c}]' for c in columns if c.lower() not in metadata)}) AS [{col}]")
+            else:
+                output.append(f"[g].[{col}]")
+        weight = f"CASE WHEN [{BACKUP_OP_COLUMN}] = '-' THEN -1 ELSE 1 END"
+        return f"""(
+            SELECT {", ".join(output)} FROM (
+                SELECT {data_list}, MAX([ref_data_loadtime]) AS [ref_data_loadtime], SUM({weight}) AS [ref_data_copies]
+                FROM [{self.backup_schema}].[{base_name}_backup]
+                WHERE [ref_data_version_id] BETWEEN {int(snapshot)} AND {int(version_id)}
+                GROUP BY {data_list}
+                HAVING SUM({weight}) > 0
+            ) AS [g]
+            {self._copies_apply('[g].[ref_data_copies]')}
+        ) AS [version_rows]"""
+
+    def backup_existing_data(self, connection: pyodbc.Connection, source_table: str, backup_table: str,
+                             fingerprint: Optional[Dict[str, Any]] = None, snapshot_interval: int = 0) -> int:
+        """Backup existing data to backup table with version increment, filtering out trailer rows.
+        The new version is recorded in the Backup_Version catalog together with fingerprint['content_hash']
+        (from get_table_fingerprint) when given.
+        snapshot_interval > 0 stores the version as a delta - only the rows added/removed relative to the
+        previous version - with a full snapshot every snapshot_interval versions. Returns the version's row count."""
         cursor = connection.cursor()
 
         print(f"DEBUG: Starting backup - source_table: {source_table}, backup_table: {backup_table}")
@@ -771,7 +1284,7 @@ class DatabaseManager:
                 backup_col_lower = backup_col_name.lower()
 
                 # Skip backup-specific metadata columns for now
-                if backup_col_lower in ['ref_data_loadtime', 'ref_data_loadtype', 'ref_data_version_id']:
+                if backup_col_lower in ['ref_data_loadtime', 'ref_data_loadtype', 'ref_data_version_id', BACKUP_OP_COLUMN, BACKUP_ROW_ID_COLUMN]:
                     continue
 
                 # Find matching source column
@@ -780,6 +1293,61 @@ class DatabaseManager:
                     insert_columns.append(f"[{backup_col_name}]")
                     select_columns.append(f"[{matching_source_col['name']}]")
 
+            self.ensure_backup_catalog_table(connection)
+            connection.autocommit = False
+            if next_version == 1:
+                # A fresh backup table: catalog rows left over from an earlier table would collide with version 1
+                self._purge_stale_backup_catalog(connection, backup_table)
+            # A delta needs a previous version to diff against and every backup data column fed from the main table
+            use_delta = False
+            previous_snapshot = None
+            if snapshot_interval and snapshot_interval > 1 and next_version > 1 and insert_columns:
+                backup_data_columns = [c for c in backup_columns if c['name'].lower() not in
+                                       ['ref_data_loadtime', 'ref_data_loadtype', 'ref_data_version_id', BACKUP_OP_COLUMN, BACKUP_ROW_ID_COLUMN]]
+                previous_snapshot = self._backup_snapshot_version(connection, backup_table, next_version - 1)
+                use_delta = (
+                    len(backup_data_columns) == len(insert_columns)
+                    and next_version - 1 - previous_snapshot < snapshot_interval - 1
+                )
+            if use_delta:
+                if not any(c['name'].lower() == BACKUP_OP_COLUMN for c in backup_columns):
+                    self.invalidate_table_metadata(f"{backup_table}_backup", self.backup_schema)
+                    cursor.execute(
+                        f"ALTER TABLE [{self.backup_schema}].[{backup_table}_backup] ADD [{BACKUP_OP_COLUMN}] char(1) NULL"
+                    )
+                data_list = ", ".join(insert_columns)
+                source_list = ", ".join(f"{src} AS {dst}" for dst, src in zip(insert_columns, select_columns))
+                weight = f"CASE WHEN [{BACKUP_OP_COLUMN}] = '-' THEN -1 ELSE 1 END"
+                # Current rows count +1 and the previous version's rows -1 per distinct row: the non-zero
+                # sums are the rows added (> 0) or removed (< 0), expanded back to one backup row each
+                delta_sql = f"""
+                    INSERT INTO [{self.backup_schema}].[{backup_table}_backup]
+                        ({data_list}, [ref_data_loadtime], [ref_data_loadtype], [ref_data_version_id], [{BACKUP_OP_COLUMN}])
+                    SELECT {data_list}, GETDATE(), 'backup', ?, CASE WHEN [diff].[ref_data_copies] > 0 THEN '+' ELSE '-' END
+                    FROM (
+                        SELECT {data_list}, SUM([w]) AS [ref_data_copies] FROM (
+                            SELECT {source_list}, 1 AS [w] FROM [{self.data_schema}].[{source_table}]
+                            UNION ALL
+                            SELECT {data_list}, -({weight}) FROM [{self.backup_schema}].[{backup_table}_backup]
+                            WHERE [ref_data_version_id] BETWEEN ? AND ?
+                        ) AS [u]
+                        GROUP BY {data_list}
+                        HAVING SUM([w]) <> 0
+                    ) AS [diff]
+                    {self._copies_apply('ABS([diff].[ref_data_copies])')}
+                """
+                content_rows = fingerprint['row_count'] if fingerprint else self.get_row_count(connection, source_table)
+                cursor.execute(delta_sql, next_version, previous_snapshot, next_version - 1)
+                delta_rows = cursor.rowcount
+                cursor.execute(
+                    f"INSERT INTO [{self.backup_schema}].[Backup_Version] ([base_name], [version_id], [row_count], [content_hash], [is_delta]) "
+                    "VALUES (?, ?, ?, ?, 1)",
+                    backup_table, next_version, content_rows, (fingerprint or {}).get('content_hash')
+                )
+                connection.commit()
+                print(f"DEBUG: Delta backup completed - {delta_rows} changed rows stored for version {next_version} ({content_rows} rows)")
+                return content_rows
+
             # Add backup metadata columns
             insert_columns.extend(["[ref_data_loadtime]", "[ref_data_loadtype]", "[ref_data_version_id]"])
             select_columns.extend(["GETDATE()", "'backup'", "?"])
@@ -793,8 +1361,13 @@ class DatabaseManager:
                 f"SELECT {select_column_list} FROM [{self.data_schema}].[{source_table}]"
             )
             cursor.execute(backup_sql, next_version)
-            connection.commit()
             backup_count = cursor.rowcount
+            cursor.execute(
+                f"INSERT INTO [{self.backup_schema}].[Backup_Version] ([base_name], [version_id], [row_count], [content_hash]) "
+                "VALUES (?, ?, ?, ?)",
+                backup_table, next_version, backup_count, (fingerprint or {}).get('content_hash')
+            )
+            connection.commit()
             print(f"DEBUG: Backup completed successfully - {backup_count} rows backed up to version {next_version}")
             return backup_count
 
@@ -811,6 +1384,8 @@ class DatabaseManager:
                 return 0  # Continue without backup
             else:
                 raise Exception(f"Failed to backup existing data from {source_table}: {str(e)}")
+        finally:
+            connection.autocommit = True
 
     def truncate_table(self, connection: pyodbc.Connection, table_name: str, schema: str = None) -> None:
         """Truncate a table"""
@@ -822,6 +1397,303 @@ class DatabaseManager:
         truncate_sql = "TRUNCATE TABLE [" + schema + "].[" + table_name + "]"
         cursor.execute(truncate_sql)
 
+    def ensure_row_hash_column(self, connection: pyodbc.Connection, table_name: str, schema: str = None,
+                               index: bool = False, hash_columns: List[str] = None) -> bool:
+        """Add the bigint row hash column to table_name if it is missing (existing rows get NULL).
+        hash_columns makes it a persisted computed column holding the content hash of those columns, so
+        the server hashes each row as it is inserted (used on stage tables; main tables store the hash
+        copied from the stage). index=True also makes sure a nonclustered index on it exists, for delta
+        comparisons. Returns True when the column was added."""
+        if schema is None:
+            schema = self.data_schema
+
+        existing = {c['name'].lower() for c in self.get_table_columns(connection, table_name, schema)}
+        cursor = connection.cursor()
+        added = False
+        if ROW_HASH_COLUMN not in existing:
+            self.invalidate_table_metadata(table_name, schema)
+            definition = f"AS {self._row_hash_expression(hash_columns)} PERSISTED" if hash_columns else "bigint NULL"
+            cursor.execute(f"ALTER TABLE [{schema}].[{table_name}] ADD [{ROW_HASH_COLUMN}] {definition}")
+            print(f"INFO: Added [{ROW_HASH_COLUMN}] to [{schema}].[{table_name}]")
+            added = True
+        if index:
+            cursor.execute(f"""
+                IF NOT EXISTS (
+                    SELECT 1 FROM sys.indexes
+                    WHERE object_id = OBJECT_ID(N'[{schema}].[{table_name}]') AND name = N'ix_{table_name}_row_hash'
+                )
+                CREATE NONCLUSTERED INDEX [ix_{table_name}_row_hash] ON [{schema}].[{table_name}] ([{ROW_HASH_COLUMN}])
+            """)
+        return added
+
+    @staticmethod
+    def _row_hash_expression(columns: List[str]) -> str:
+        """Signed 64-bit content hash of a row: the first 8 bytes of SHA2_256 over the columns in name
+        order (so a reordered file hashes the same), each as its length and value, or a marker when NULL
+        (so NULL, '' and shifted values never collide)."""
+        parts = " + ".join(
+            f"ISNULL('v' + CAST(DATALENGTH([{col}]) AS varchar(10)) + ':' + [{col}], 'n')"
+            for col in sorted(columns)
+        )
+        return f"CAST(SUBSTRING(HASHBYTES('SHA2_256', CAST('' AS varchar(max)) + {parts}), 1, 8) AS bigint)"
+
+    def apply_row_hash_delta(self, connection: pyodbc.Connection, table_name: str, stage_table_name: str,
+                             insert_column_list: str, select_column_list: str, schema: str = None) -> Dict[str, int]:
+        """Make table_name hold exactly the rows of stage_table_name by row hash, touching only the differences.
+        Rows are compared as a multiset of hashes: for each hash, surplus main rows are deleted and
+        missing stage rows inserted (a changed row is one delete plus one insert). Main rows without
+        a hash never match and are replaced. Runs in one transaction; returns deleted/inserted counts.
+        insert_column_list/select_column_list are the explicit lists used for the stage-to-main move."""
+        if schema is None:
+            schema = self.data_schema
+
+        main_ref = f"[{schema}].[{table_name}]"
+        stage_ref = f"[{schema}].[{stage_table_name}]"
+        cursor = connection.cursor()
+        connection.autocommit = False
+        try:
+            cursor.execute(f"""
+                WITH [target] AS (
+                    SELECT [{ROW_HASH_COLUMN}],
+                           ROW_NUMBER() OVER (PARTITION BY [{ROW_HASH_COLUMN}] ORDER BY (SELECT NULL)) AS [delta_rn]
+                    FROM {main_ref}
+                )
+                DELETE FROM [target]
+                WHERE [delta_rn] > (
+                    SELECT COUNT(*) FROM {stage_ref} AS s WHERE s.[{ROW_HASH_COLUMN}] = [target].[{ROW_HASH_COLUMN}]
+                )
+            """)
+            deleted = max(cursor.rowcount, 0)
+            cursor.execute(f"""
+                INSERT INTO {main_ref} ({insert_column_list})
+                SELECT {select_column_list} FROM (
+                    SELECT s.*, ROW_NUMBER() OVER (PARTITION BY s.[{ROW_HASH_COLUMN}] ORDER BY (SELECT NULL)) AS [delta_rn]
+                    FROM {stage_ref} AS s
+                ) AS [src]
+                WHERE [src].[delta_rn] > (
+                    SELECT COUNT(*) FROM {main_ref} AS m WHERE m.[{ROW_HASH_COLUMN}] = [src].[{ROW_HASH_COLUMN}]
+                )
+            """)
+            inserted = max(cursor.rowcount, 0)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.autocommit = True
+        return {'deleted': deleted, 'inserted': inserted}
+
+    def ensure_key_index(self, connection: pyodbc.Connection, table_name: str, key_columns: List[str],
+                         schema: str = None) -> bool:
+        """Make sure a nonclustered index ix_<table>_key exists on exactly key_columns (in order), so upsert
+        loads can seek the main table by business key. An index of that name on other columns is rebuilt.
+        Returns True when the index was (re)created."""
+        if schema is None:
+            schema = self.data_schema
+
+        index_name = f"ix_{table_name}_key"
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT c.name
+            FROM sys.indexes i
+            JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+            JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+            WHERE i.object_id = OBJECT_ID(?) AND i.name = ? AND ic.key_ordinal > 0
+            ORDER BY ic.key_ordinal
+        """, f"[{schema}].[{table_name}]", index_name)
+        existing = [row[0].lower() for row in cursor.fetchall()]
+        if existing == [col.lower() for col in key_columns]:
+            return False
+        if existing:
+            cursor.execute(f"DROP INDEX [{index_name}] ON [{schema}].[{table_name}]")
+        key_list = ", ".join(f"[{col}]" for col in key_columns)
+        cursor.execute(f"CREATE NONCLUSTERED INDEX [{index_name}] ON [{schema}].[{table_name}] ({key_list})")
+        print(f"INFO: Created key index [{index_name}] on [{schema}].[{table_name}] ({key_list})")
+        return True
+
+    def merge_stage_into_main(self, connection: pyodbc.Connection, table_name: str, stage_table_name: str,
+                              key_columns: List[str], insert_columns: List[str], select_columns: List[str],
+                              schema: str = None) -> Dict[str, int]:
+        """Upsert stage_table_name into table_name on key_columns with a single MERGE.
+        Main rows whose key is in the stage are updated (only when a data column actually differs),
+        stage rows with a new key are inserted, and main rows missing from the stage are kept.
+        When the stage holds several rows for one key, one of them is applied. A NULL key part matches NULL.
+        insert_columns/select_columns are the paired bracketed main columns and stage expressions used for
+        the stage-to-main move. Runs in one transaction; returns updated/inserted counts."""
+        if schema is None:
+            schema = self.data_schema
+
+        keys = {col.lower() for col in key_columns}
+        metadata = {'ref_data_loadtime', 'ref_data_loadtype', ROW_HASH_COLUMN}
+        source_list = ", ".join(f"{expr} AS {col}" for col, expr in zip(insert_columns, select_columns))
+        partition = ", ".join(f"s.[{col}]" for col in key_columns)
+        # NULL keys match NULL keys (as in the ROW_NUMBER partition); '=' alone would re-insert them every run
+        on_clause = " AND ".join(
+            f"([target].[{col}] = [src].[{col}] OR ([target].[{col}] IS NULL AND [src].[{col}] IS NULL))"
+            for col in key_columns
+        )
+        updatable = [col for col in insert_columns if col.strip('[]').lower() not in keys]
+        compared = [col for col in updatable if col.strip('[]').lower() not in metadata]
+
+        matched_clause = ""
+        if updatable:
+            set_list = ", ".join(f"[target].{col} = [src].{col}" for col in updatable)
+            # EXCEPT compares NULLs as equal, so unchanged rows are not rewritten
+            changed = (
+                f" AND EXISTS (SELECT {', '.join(f'[src].{col}' for col in compared)}"
+                f" EXCEPT SELECT {', '.join(f'[target].{col}' for col in compared)})"
+            ) if compared else ""
+            matched_clause = f"WHEN MATCHED{changed} THEN UPDATE SET {set_list}"
+        cursor = connection.cursor()
+        connection.autocommit = False
+        try:
+            cursor.execute(f"""
+                SET NOCOUNT ON;
+                DECLARE @merge_actions TABLE ([action] nvarchar(10));
+                MERGE INTO [{schema}].[{table_name}] WITH (HOLDLOCK) AS [target]
+                USING (
+                    SELECT {source_list} FROM (
+                        SELECT s.*, ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY (SELECT NULL)) AS [merge_rn]
+                        FROM [{schema}].[{stage_table_name}] AS s
+                    ) AS s
+                    WHERE [merge_rn] = 1
+                ) AS [src]
+                ON {on_clause}
+                {matched_clause}
+                WHEN NOT MATCHED BY TARGET THEN
+                    INSERT ({", ".join(insert_columns)}) VALUES ({", ".join(f"[src].{col}" for col in insert_columns)})
+                OUTPUT $action INTO @merge_actions;
+                SELECT [action], COUNT(*) FROM @merge_actions GROUP BY [action];
+            """)
+            counts = {str(action).upper(): count for action, count in cursor.fetchall()}
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.autocommit = True
+        return {'updated': counts.get('UPDATE', 0), 'inserted': counts.get('INSERT', 0)}
+
+    def get_swap_table_name(self, table_name: str) -> str:
+        """Name of the shadow table a swap-based full load of table_name is built in"""
+        return f"{table_name}_swap"
+
+    def create_swap_table(self, connection: pyodbc.Connection, table_name: str, schema: str = None) -> str:
+        """(Re)create an empty shadow copy of table_name for a swap-based full load: its columns plus its
+        rowstore indexes, primary key, unique and check constraints, which ALTER TABLE ... SWITCH needs
+        to match. Returns the shadow table name."""
+        if schema is None:
+            schema = self.data_schema
+
+        swap_table = self.get_swap_table_name(table_name)
+        cursor = connection.cursor()
+        self.invalidate_table_metadata(swap_table, schema)
+        cursor.execute("DROP TABLE IF EXISTS [" + schema + "].[" + swap_table + "]")
+        # SELECT TOP 0 ... INTO copies column names, types and nullability, which SWITCH requires
+        cursor.execute(
+            "SELECT TOP 0 * INTO [" + schema + "].[" + swap_table + "] FROM [" + schema + "].[" + table_name + "]"
+        )
+        # Create the indexes before the load so the shadow is switch-compatible once filled
+        for statement in self._script_swap_indexes(connection, table_name, swap_table, schema):
+            cursor.execute(statement)
+        return swap_table
+
+    def _script_swap_indexes(self, connection: pyodbc.Connection, table_name: str, swap_table: str,
+                             schema: str) -> List[str]:
+        """DDL recreating table_name's rowstore indexes, primary key, unique and check constraints on
+        swap_table (clustered index first). Constraint names are schema-wide, so the shadow's get a
+        _swap suffix; index names are per table and are kept."""
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT i.index_id, i.name, i.type_desc, i.is_unique, i.is_primary_key, i.is_unique_constraint,
+                   i.filter_definition, c.name, ic.is_descending_key, ic.is_included_column
+            FROM sys.indexes i
+            JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+            JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+            WHERE i.object_id = OBJECT_ID(?) AND i.type IN (1, 2) AND i.is_hypothetical = 0
+            ORDER BY i.index_id, ic.is_included_column, ic.key_ordinal, ic.index_column_id
+        """, f"[{schema}].[{table_name}]")
+        indexes = {}
+        for index_id, name, type_desc, is_unique, is_pk, is_uq, filter_def, column, descending, included in cursor.fetchall():
+            index = indexes.setdefault(index_id, {
+                'name': name, 'kind': type_desc, 'unique': is_unique, 'pk': is_pk, 'uq': is_uq,
+                'filter': filter_def, 'keys': [], 'include': []
+            })
+            if included:
+                index['include'].append(f"[{column}]")
+            else:
+                index['keys'].append(f"[{column}]{' DESC' if descending else ''}")
+
+        swap_ref = f"[{schema}].[{swap_table}]"
+        statements = []
+        for index in indexes.values():
+            keys = ", ".join(index['keys'])
+            if index['pk'] or index['uq']:
+                constraint = 'PRIMARY KEY' if index['pk'] else 'UNIQUE'
+                statements.append(
+                    f"ALTER TABLE {swap_ref} ADD CONSTRAINT [{index['name']}_swap] {constraint} {index['kind']} ({keys})"
+                )
+                continue
+            statement = (
+                f"CREATE {'UNIQUE ' if index['unique'] else ''}{index['kind']} INDEX [{index['name']}] ON {swap_ref} ({keys})"
+            )
+            if index['include']:
+                statement += f" INCLUDE ({', '.join(index['include'])})"
+            if index['filter']:
+                statement += f" WHERE {index['filter']}"
+            statements.append(statement)
+
+        cursor.execute("""
+            SELECT name, definition FROM sys.check_constraints
+            WHERE parent_object_id = OBJECT_ID(?) AND is_disabled = 0
+            ORDER BY name
+        """, f"[{schema}].[{table_name}]")
+        for name, definition in cursor.fetchall():
+            statements.append(f"ALTER TABLE {swap_ref} WITH CHECK ADD CONSTRAINT [{name}_swap] CHECK {definition}")
+        return statements
+
+    def swap_in_table(self, connection: pyodbc.Connection, table_name: str, schema: str = None) -> bool:
+        """Replace the rows of table_name with those of its shadow table in one short transaction.
+        Uses a metadata-only ALTER TABLE ... SWITCH, keeping the main table's indexes, constraints and
+        permissions (create_swap_table gives the shadow the same indexes). If SWITCH is still rejected
+        (e.g. a columnstore index or a foreign key on main), copies the rows inside the same kind of
+        transaction instead. Returns True when SWITCH was used.
+        The shadow table is dropped afterwards."""
+        if schema is None:
+            schema = self.data_schema
+
+        swap_table = self.get_swap_table_name(table_name)
+        main_ref = "[" + schema + "].[" + table_name + "]"
+        swap_ref = "[" + schema + "].[" + swap_table + "]"
+        cursor = connection.cursor()
+        switched = True
+        connection.autocommit = False
+        try:
+            try:
+                cursor.execute("TRUNCATE TABLE " + main_ref)
+                cursor.execute("ALTER TABLE " + swap_ref + " SWITCH TO " + main_ref)
+                connection.commit()
+            except Exception as e:
+                connection.rollback()
+                print(f"WARNING: Metadata switch into {main_ref} failed ({str(e)}); copying rows instead")
+                switched = False
+                columns = ", ".join(f"[{c['name']}]" for c in self.get_table_columns(connection, swap_table, schema))
+                cursor.execute("TRUNCATE TABLE " + main_ref)
+                cursor.execute(
+                    "INSERT INTO " + main_ref + " WITH (TABLOCK) (" + columns + ") SELECT " + columns + " FROM " + swap_ref
+                )
+                connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.autocommit = True
+
+        cursor.execute("DROP TABLE IF EXISTS " + swap_ref)
+        self.invalidate_table_metadata(swap_table, schema)
+        print(f"INFO: Swapped new data into {main_ref} ({'switch' if switched else 'copy'})")
+        return switched
+
     def get_row_count(self, connection: pyodbc.Connection, table_name: str, schema: str = None) -> int:
         """Get row count for a table"""
         if schema is None:
@@ -835,15 +1707,106 @@ class DatabaseManager:
         result = cursor.fetchone()
         return result[0] if result else 0
 
-    def ensure_metadata_columns(self, connection: pyodbc.Connection, table_name: str, schema: str = None) -> Dict[str, Any]:
-        """Ensure metadata columns (ref_data_loadtime, ref_data_loadtype) exist in the table"""
+    def ensure_clustered_index(self, connection: pyodbc.Connection, table_name: str, column: str,
+                               schema: str = None) -> None:
+        """Create a clustered index on column unless the table already has one (e.g. a heap stage
+        table about to be read in key ranges)."""
+        if schema is None:
+            schema = self.data_schema
+
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            IF NOT EXISTS (
+                SELECT 1 FROM sys.indexes
+                WHERE object_id = OBJECT_ID(N'[{schema}].[{table_name}]') AND type = 1
+            )
+            CREATE CLUSTERED INDEX [cx_{table_name}_{column}] ON [{schema}].[{table_name}] ([{column}])
+        """)
+
+    def count_failed_conversions(self, connection: pyodbc.Connection, table_name: str,
+                                 conversions: Dict[str, str], schema: str = None) -> Dict[str, int]:
+        """Count non-NULL values per column that TRY_CONVERT cannot turn into the given type
+        (conversions maps column name to target type). One scan of the table for all columns."""
+        if schema is None:
+            schema = self.data_schema
+        if not conversions:
+            return {}
+
+        names = list(conversions)
+        sums = ", ".join(
+            f"SUM(CASE WHEN [{name}] IS NOT NULL AND TRY_CONVERT({conversions[name]}, [{name}]) IS NULL THEN 1 ELSE 0 END)"
+            for name in names
+        )
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT {sums} FROM [{schema}].[{table_name}]")
+        row = cursor.fetchone()
+        return {name: int(row[i] or 0) for i, name in enumerate(names)}
+
+    def ensure_ingest_checkpoint_table(self, connection: pyodbc.Connection, schema: str = None) -> None:
+        """Ensure the Ingest_Checkpoint table (one row per stage table being loaded) exists"""
+        if schema is None:
+            schema = self.data_schema
+
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            IF OBJECT_ID(N'[{schema}].[Ingest_Checkpoint]', N'U') IS NULL
+            CREATE TABLE [{schema}].[Ingest_Checkpoint] (
+                [stage_table] varchar(255) NOT NULL PRIMARY KEY,
+                [file_hash] char(64) NOT NULL,
+                [last_row_offset] bigint NOT NULL,
+                [updated_at] datetime NOT NULL DEFAULT GETDATE()
+            )
+        """)
+
+    def save_ingest_checkpoint(self, connection: pyodbc.Connection, stage_table: str, file_hash: str,
+                               row_offset: int, schema: str = None) -> None:
+        """Record the number of rows committed to stage_table for the file identified by file_hash.
+        Does not commit: call it inside the batch transaction so the offset commits with the rows."""
+        if schema is None:
+            schema = self.data_schema
+
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            UPDATE [{schema}].[Ingest_Checkpoint]
+            SET [file_hash] = ?, [last_row_offset] = ?, [updated_at] = GETDATE()
+            WHERE [stage_table] = ?;
+            IF @@ROWCOUNT = 0
+                INSERT INTO [{schema}].[Ingest_Checkpoint] ([stage_table], [file_hash], [last_row_offset])
+                VALUES (?, ?, ?);
+        """, file_hash, row_offset, stage_table, stage_table, file_hash, row_offset)
+
+    def get_ingest_checkpoint(self, connection: pyodbc.Connection, stage_table: str, file_hash: str,
+                              schema: str = None) -> Optional[int]:
+        """Return the committed row offset for stage_table, or None if there is no checkpoint for this file"""
+        if schema is None:
+            schema = self.data_schema
+
+        cursor = connection.cursor()
+        cursor.execute(
+            f"SELECT [last_row_offset] FROM [{schema}].[Ingest_Checkpoint] WHERE [stage_table] = ? AND [file_hash] = ?",
+            stage_table, file_hash
+        )
+        result = cursor.fetchone()
+        return int(result[0]) if result else None
+
+    def clear_ingest_checkpoint(self, connection: pyodbc.Connection, stage_table: str, schema: str = None) -> None:
+        """Remove the checkpoint for stage_table (load finished or stage table rebuilt)"""
         if schema is None:
             schema = self.data_schema
 
         cursor = connection.cursor()
+        cursor.execute(f"DELETE FROM [{schema}].[Ingest_Checkpoint] WHERE [stage_table] = ?", stage_table)
+
+    def ensure_metadata_columns(self, connection: pyodbc.Connection, table_name: str, schema: str = None,
+                                dry_run: bool = False) -> Dict[str, Any]:
+        """Ensure metadata columns (ref_data_loadtime, ref_data_loadtype) exist in the table (added in one ALTER TABLE).
+        dry_run returns the planned statements in 'ddl' without executing them."""
+        if schema is None:
+            schema = self.data_schema
+
         existing_cols_list = self.get_table_columns(connection, table_name, schema)
         existing_cols = {c['name'].lower(): c for c in existing_cols_list}
-        actions = {"added": [], "skipped": []}
+        actions = {"added": [], "skipped": [], "ddl": [], "dry_run": dry_run}
 
         # Define required metadata columns
         metadata_columns = [
@@ -851,39 +1814,45 @@ class DatabaseManager:
             {"name": "ref_data_loadtype", "data_type": "varchar(255)", "default": ""}
         ]
 
+        missing = []
         for meta_col in metadata_columns:
             col_name_lower = meta_col["name"].lower()
             if col_name_lower not in existing_cols:
-                # Add missing metadata column
-                default_clause = meta_col["default"] if meta_col["default"] else ""
-                add_col_sql = f"ALTER TABLE [{schema}].[{table_name}] ADD [{meta_col['name']}] {meta_col['data_type']} {default_clause}"
-                cursor.execute(add_col_sql)
-                actions["added"].append({"column": meta_col["name"], "data_type": meta_col["data_type"]})
-                print(f"Added metadata column {meta_col['name']} to {schema}.{table_name}")
+                missing.append(meta_col)
             else:
                 actions["skipped"].append({"column": meta_col["name"], "reason": "already exists"})
 
+        # Add all missing metadata columns in one statement
+        column_defs = [(c["name"], f"{c['data_type']} {c['default']}".strip()) for c in missing]
+        added = self._add_columns(connection, table_name, schema, column_defs, dry_run=dry_run)
+        actions["ddl"] = added['sql']
+        for meta_col in missing:
+            actions["added"].append({"column": meta_col["name"], "data_type": meta_col["data_type"]})
+            if not dry_run:
+                print(f"Added metadata column {meta_col['name']} to {schema}.{table_name}")
+
         return actions
 
-    def sync_main_table_columns(self, connection: pyodbc.Connection, table_name: str, file_columns: List[Dict[str, str]], schema: str = None) -> Dict[str, Any]:
+    def sync_main_table_columns(self, connection: pyodbc.Connection, table_name: str, file_columns: List[Dict[str, str]],
+                                schema: str = None, dry_run: bool = False) -> Dict[str, Any]:
         """Safely synchronize main table columns with input file columns.
         ONLY ADDS missing columns - NEVER modifies existing column data types.
         This preserves data integrity and existing table structure.
+        All missing columns are added in one ALTER TABLE statement.
 
         Args:
             connection: Database connection
             table_name: Name of the main table
             file_columns: List of columns from input file [{'name': ..., 'data_type': ...}]
             schema: Table schema (defaults to data_schema)
+            dry_run: Only plan - return the statements in 'ddl' without executing them
 
         Returns:
-            Dict with 'added', 'skipped', 'mismatched' lists
+            Dict with 'added', 'skipped', 'mismatched' lists and the 'ddl' statements
         """
         if schema is None:
             schema = self.data_schema
 
-        cursor = connection.cursor()
-
         # Get existing table columns (excluding metadata columns for comparison)
         existing_cols_list = self.get_table_columns(connection, table_name, schema)
         existing_cols = {c['name'].lower(): c for c in existing_cols_list
@@ -892,8 +1861,11 @@ class DatabaseManager:
         actions = {
             "added": [],           # Columns successfully added
             "skipped": [],         # Columns that already exist (no change)
-            "mismatched": []       # Columns that exist but with different data types (no change)
+            "mismatched": [],      # Columns that exist but with different data types (no change)
+            "ddl": [],             # ALTER statements executed (or planned, with dry_run)
+            "dry_run": dry_run
         }
+        to_add = []
 
         print(f"INFO: Synchronizing main table [{schema}].[{table_name}] columns with input file")
         existing_cols_display = [f"{c['name']}({c['data_type']})" for c in existing_cols_list if c['name'].lower() not in ['ref_data_loadtime', 'ref_data_loadtype']]
@@ -907,19 +1879,8 @@ class DatabaseManager:
             file_data_type = file_col['data_type']
 
             if col_name_lower not in existing_cols:
-                # Column doesn't exist in table - ADD it
-                try:
-                    add_col_sql = f"ALTER TABLE [{schema}].[{table_name}] ADD [{col_name}] {file_data_type}"
-                    cursor.execute(add_col_sql)
-                    actions["added"].append({
-                        "column": col_name,
-                        "data_type": file_data_type
-                    })
-                    print(f"INFO: Added column [{col_name}] {file_data_type} to main table")
-                except Exception as e:
-                    print(f"WARNING: Failed to add column [{col_name}]: {str(e)}")
-                    # Don't fail the entire process for one column addition failure
-                    continue
+                # Column doesn't exist in table - ADD it (batched below)
+                to_add.append((col_name, file_data_type))
             else:
                 # Column exists - check if types match
                 existing_col = existing_cols[col_name_lower]
@@ -955,6 +1916,24 @@ class DatabaseManager:
         if extra_table_cols:
             print(f"INFO: Table has {len(extra_table_cols)} extra columns not in input file (preserved): {list(extra_table_cols)}")
 
+        # Add all missing columns in one statement; don't fail the entire process for one column addition failure
+        add_result = self._add_columns(connection, table_name, schema, to_add, dry_run=dry_run, tolerate_errors=True)
+        actions["ddl"] = add_result['sql']
+        for col_name, file_data_type in to_add:
+            if col_name in add_result['errors']:
+                print(f"WARNING: Failed to add column [{col_name}]: {add_result['errors'][col_name]}")
+                continue
+            actions["added"].append({
+                "column": col_name,
+                "data_type": file_data_type
+            })
+            if not dry_run:
+                print(f"INFO: Added column [{col_name}] {file_data_type} to main table")
+
+        if dry_run:
+            print(f"INFO: Dry run - planned DDL: {actions['ddl']}")
+            return actions
+
         # Commit changes
         connection.commit()
 
@@ -972,10 +1951,12 @@ class DatabaseManager:
 
         return actions
 
-    def sync_table_schema(self, connection: pyodbc.Connection, table_name: str, columns: List[Dict[str, str]], schema: str = None) -> Dict[str, Any]:
+    def sync_table_schema(self, connection: pyodbc.Connection, table_name: str, columns: List[Dict[str, str]],
+                          schema: str = None, dry_run: bool = False) -> Dict[str, Any]:
         """Synchronize existing table schema with target columns.
-        Adds missing columns, widens varchar lengths, and converts any non-varchar columns to varchar.
-        Returns summary dict.
+        Adds missing columns (all in one ALTER TABLE), widens varchar lengths, and converts any non-varchar
+        columns to varchar (one ALTER COLUMN each). Returns summary dict with the statements in 'ddl';
+        dry_run plans them without executing.
         columns: list of dicts [{'name':..., 'data_type': ...}]
         Supported conversions: varchar(N) -> larger varchar(M), datetime/numeric/other -> varchar(N).
         """
@@ -984,7 +1965,8 @@ class DatabaseManager:
         cursor = connection.cursor()
         existing_cols_list = self.get_table_columns(connection, table_name, schema)
         existing_cols = {c['name'].lower(): c for c in existing_cols_list}
-        actions = {"added": [], "widened": [], "skipped": []}
+        actions = {"added": [], "widened": [], "skipped": [], "ddl": [], "dry_run": dry_run}
+        to_add = []
 
         # Debug: log existing column types
         print(f"DEBUG: Existing columns in {table_name}: {[(c['name'], c['data_type'], c.get('max_length')) for c in existing_cols_list]}")
@@ -994,10 +1976,8 @@ class DatabaseManager:
             target_type = col['data_type']
             lower = name.lower()
             if lower not in existing_cols:
-                # Add new column - use dynamic SQL with proper quoting
-                add_col_sql = "ALTER TABLE [" + schema + "].[" + table_name + "] ADD [" + name + "] " + target_type
-                cursor.execute(add_col_sql)
-                actions["added"].append({"column": name, "data_type": target_type})
+                # Add new column (batched below)
+                to_add.append((name, target_type))
                 continue
             # Existing column: consider widening
             existing = existing_cols[lower]
@@ -1055,14 +2035,20 @@ class DatabaseManager:
                 if change_type == "convert_to_varchar":
                     # Convert non-varchar column to varchar - use dynamic SQL with proper quoting
                     alter_sql = "ALTER TABLE [" + schema + "].[" + table_name + "] ALTER COLUMN [" + name + "] " + target_type
-                    cursor.execute(alter_sql)
+                    actions["ddl"].append(alter_sql)
+                    if not dry_run:
+                        self.invalidate_table_metadata(table_name, schema)
+                        cursor.execute(alter_sql)
                     conversion_type = "datetime_to_varchar" if is_datetime_column else "numeric_to_varchar" if is_numeric_column else "other_to_varchar"
                     actions["widened"].append({"column": name, "from": existing_type, "to": target_type, "conversion": conversion_type})
                 elif change_type == "varchar_widen":
                     # Widen varchar column - use dynamic SQL with proper quoting
                     new_type_sql = 'varchar(MAX)' if new_len == 'MAX' else f'varchar({new_len})'
                     alter_sql = "ALTER TABLE [" + schema + "].[" + table_name + "] ALTER COLUMN [" + name + "] " + new_type_sql
-                    cursor.execute(alter_sql)
+                    actions["ddl"].append(alter_sql)
+                    if not dry_run:
+                        self.invalidate_table_metadata(table_name, schema)
+                        cursor.execute(alter_sql)
                     actions["widened"].append({"column": name, "from": old_len, "to": new_len})
             else:
                 reason = "no changes needed"
@@ -1072,6 +2058,11 @@ class DatabaseManager:
                     if new_len == old_len or (isinstance(new_len, int) and isinstance(old_len, int) and new_len <= old_len):
                         reason = "no widening needed"
                 actions["skipped"].append({"column": name, "reason": reason})
+
+        # Add all new columns in one statement
+        added = self._add_columns(connection, table_name, schema, to_add, dry_run=dry_run)
+        actions["ddl"].extend(added['sql'])
+        actions["added"].extend({"column": name, "data_type": target_type} for name, target_type in to_add)
         return actions
     def ensure_reference_data_cfg_table(self, connection: pyodbc.Connection) -> None:
         """Ensure Reference_Data_Cfg table exists in staff database dbo schema (configurable via staff_database env var)"""
@@ -1155,7 +2146,8 @@ class DatabaseManager:
         """
         Determine the ref_data_loadtype value based on existing data and current load mode.
         Rules:
-        - If override_load_type provided: Use override ('F' or 'A')
+        - If override_load_type provided: Use override ('F', 'A' or 'U')
+        - Upsert mode: Always 'U'
         - First time ingest: Use current load mode ('F' for full, 'A' for append)
         - Subsequent ingests: Check existing distinct ref_data_loadtype values
           - If only 'F' exists: Use 'F'
@@ -1166,8 +2158,13 @@ class DatabaseManager:
             # If user provided override, use it
             if override_load_type:
                 override_upper = override_load_type.strip().upper()
+                if override_upper in ['U', 'UPSERT']:
+                    return 'U'
                 if override_upper in ['F', 'A', 'FULL', 'append']:
                     return 'F' if override_upper in ['F', 'FULL'] else 'A'
+            if current_load_mode == 'upsert':
+                # Keyed loads update rows in place; mark what they wrote regardless of history
+                return 'U'
             cursor = connection.cursor()
 
             # Check if table exists and has data
@@ -1212,60 +2209,117 @@ class DatabaseManager:
             return 'F' if current_load_mode == 'full' else 'A'
 
     # ---------------- Rollback / Backup Introspection Helpers -----------------
+    def _backfill_backup_catalog(self, connection: pyodbc.Connection, base_name: str) -> int:
+        """Register versions present in base_name's backup table but missing from the Backup_Version catalog
+        (written before the catalog existed) as full copies, after dropping catalog rows that predate the live
+        backup table. Scans the backup table at most once per manager per base name; returns the number of
+        versions added."""
+        if base_name in self._backup_catalog_backfilled:
+            return 0
+        self.ensure_backup_catalog_table(connection)
+        self._purge_stale_backup_catalog(connection, base_name)
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            INSERT INTO [{self.backup_schema}].[Backup_Version] ([base_name], [version_id], [row_count], [created_at])
+            SELECT ?, [b].[ref_data_version_id], COUNT_BIG(*), COALESCE(MIN([b].[ref_data_loadtime]), GETDATE())
+            FROM [{self.backup_schema}].[{base_name}_backup] AS [b]
+            WHERE [b].[ref_data_version_id] IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM [{self.backup_schema}].[Backup_Version] AS [v]
+                  WHERE [v].[base_name] = ? AND [v].[version_id] = [b].[ref_data_version_id]
+              )
+            GROUP BY [b].[ref_data_version_id]
+        """, base_name, base_name)
+        added = cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 else 0
+        connection.commit()
+        self._backup_catalog_backfilled.add(base_name)
+        if added:
+            print(f"INFO: Registered {added} uncatalogued backup versions of {base_name}")
+        return added
+
     def list_backup_tables(self, connection: pyodbc.Connection) -> List[Dict[str, Any]]:
-        """Return metadata for all backup tables in backup schema with validation of related main & stage tables."""
+        """Return metadata for all backup tables in backup schema with validation of related main & stage tables.
+        Served in one query from the Backup_Version catalog, counting only rows written since each backup table
+        was created; tables whose catalogued versions have gaps (versions written before the catalog existed)
+        are backfilled once and re-read."""
+        self.ensure_backup_catalog_table(connection)
+        list_sql = f"""
+            SELECT [t].[TABLE_NAME], [v].[version_count], [v].[latest_version], [v].[last_backup_at],
+                   CASE WHEN [m].[TABLE_NAME] IS NULL THEN 0 ELSE 1 END,
+                   CASE WHEN [s].[TABLE_NAME] IS NULL THEN 0 ELSE 1 END
+            FROM INFORMATION_SCHEMA.TABLES AS [t]
+            LEFT JOIN (
+                SELECT [cv].[base_name], COUNT(*) AS [version_count], MAX([cv].[version_id]) AS [latest_version],
+                       MAX([cv].[created_at]) AS [last_backup_at]
+                FROM [{self.backup_schema}].[Backup_Version] AS [cv]
+                JOIN sys.tables AS [st]
+                  ON [st].[name] = [cv].[base_name] + '_backup' AND [st].[schema_id] = SCHEMA_ID(?)
+                WHERE [cv].[created_at] >= [st].[create_date]
+                GROUP BY [cv].[base_name]
+            ) AS [v] ON [v].[base_name] = LEFT([t].[TABLE_NAME], LEN([t].[TABLE_NAME]) - 7)
+            LEFT JOIN INFORMATION_SCHEMA.TABLES AS [m]
+              ON [m].[TABLE_SCHEMA] = ? AND [m].[TABLE_NAME] = LEFT([t].[TABLE_NAME], LEN([t].[TABLE_NAME]) - 7)
+            LEFT JOIN INFORMATION_SCHEMA.TABLES AS [s]
+              ON [s].[TABLE_SCHEMA] = ? AND [s].[TABLE_NAME] = LEFT([t].[TABLE_NAME], LEN([t].[TABLE_NAME]) - 7) + '_stage'
+            WHERE [t].[TABLE_SCHEMA] = ? AND [t].[TABLE_TYPE] = 'BASE TABLE'
+              AND [t].[TABLE_NAME] LIKE '%[_]backup'
+            ORDER BY [t].[TABLE_NAME]
+        """
         cursor = connection.cursor()
-        cursor.execute("""
-            SELECT TABLE_NAME
-            FROM INFORMATION_SCHEMA.TABLES
-            WHERE TABLE_SCHEMA = ? AND TABLE_TYPE = 'BASE TABLE'
-              AND TABLE_NAME LIKE '%[_]backup'
-        """, self.backup_schema)
+        cursor.execute(list_sql, self.backup_schema, self.data_schema, self.data_schema, self.backup_schema)
         rows = cursor.fetchall()
+
+        # Versions are numbered from 1 without gaps, so fewer catalogued versions than the latest
+        # version id (or none at all) means some predate the catalog
+        stale = [r[0][:-7] for r in rows if r[0].endswith('_backup') and (r[1] or 0) < (r[2] or 1)]
+        backfilled = 0
+        for base_name in stale:
+            try:
+                backfilled += self._backfill_backup_catalog(connection, base_name)
+            except Exception as e:
+                print(f"WARNING: Could not backfill backup catalog for {base_name}: {str(e)}")
+        if backfilled:
+            cursor.execute(list_sql, self.backup_schema, self.data_schema, self.data_schema, self.backup_schema)
+            rows = cursor.fetchall()
+
         results = []
         for r in rows:
             backup_table = r[0]
             if not backup_table.endswith('_backup'):
                 continue
-            base_name = backup_table[:-7]  # remove _backup
-            # Validate related main and stage
-            has_main = self.table_exists(connection, base_name, self.data_schema)
-            has_stage = self.table_exists(connection, f"{base_name}_stage", self.data_schema)
-            # Count versions
-            version_count = 0
-            latest_version = None
-            try:
-                v_cursor = connection.cursor()
-                v_cursor.execute(
-                    "SELECT COUNT(DISTINCT ref_data_version_id), MAX(ref_data_version_id) FROM [" + self.backup_schema + "].[" + backup_table + "]"
-                )
-                vrow = v_cursor.fetchone()
-                if vrow:
-                    version_count = vrow[0] or 0
-                    latest_version = vrow[1]
-            except Exception:
-                pass
             results.append({
                 'backup_table': backup_table,
-                'base_name': base_name,
-                'has_main': has_main,
-                'has_stage': has_stage,
-                'version_count': version_count,
-                'latest_version': latest_version
+                'base_name': backup_table[:-7],  # remove _backup
+                'has_main': bool(r[4]),
+                'has_stage': bool(r[5]),
+                'version_count': r[1] or 0,
+                'latest_version': r[2],
+                'last_backup_at': r[3]
             })
         return results
 
     def get_backup_versions(self, connection: pyodbc.Connection, base_name: str) -> List[int]:
-        """Return list of ref_data_version_ids for a given backup base name (descending)."""
+        """Return list of ref_data_version_ids for a given backup base name (descending), from the Backup_Version catalog
+        rows written since the live backup table was created."""
         if not base_name or not re.match(r'^[A-Za-z0-9_]+$', base_name):
             return []
-        backup_table = f"{base_name}_backup"
-        cursor = connection.cursor()
         try:
-            cursor.execute(
-                "SELECT DISTINCT ref_data_version_id FROM [" + self.backup_schema + "].[" + backup_table + "] ORDER BY ref_data_version_id DESC"
+            self.ensure_backup_catalog_table(connection)
+            versions_sql = (
+                "SELECT [version_id] FROM [" + self.backup_schema + "].[Backup_Version] "
+                "WHERE [base_name] = ? AND " + self._LIVE_CATALOG_FILTER + " ORDER BY [version_id] DESC"
             )
-            return [row[0] for row in cursor.fetchall() if row[0] is not None]
+            version_params = (base_name, f"{base_name}_backup", self.backup_schema)
+            cursor = connection.cursor()
+            cursor.execute(versions_sql, *version_params)
+            versions = [row[0] for row in cursor.fetchall() if row[0] is not None]
+            # Gaps mean versions written before the catalog existed (see list_backup_tables)
+            if len(versions) < (versions[0] if versions else 1) and base_name not in self._backup_catalog_backfilled:
+                if self.table_exists(connection, f"{base_name}_backup", self.backup_schema) \
+                        and self._backfill_backup_catalog(connection, base_name):
+                    cursor.execute(versions_sql, *version_params)
+                    versions = [row[0] for row in cursor.fetchall() if row[0] is not None]
+            return versions
         except Exception:
             return []
 
@@ -1300,15 +2354,25 @@ class DatabaseManager:
             cols = self.get_table_columns(connection, backup_table, self.backup_schema)
             col_names = [c['name'] for c in cols]
             result['columns'] = col_names
+            # Delta versions are rebuilt from their snapshot; full copies are read directly
+            delta_source = self._delta_backup_source(connection, base_name, ref_data_version_id)
+            if delta_source is None:
+                version_from = "[" + self.backup_schema + "].[" + backup_table + "] WHERE ref_data_version_id = ?"
+                version_params = [ref_data_version_id]
+            else:
+                version_from = delta_source
+                version_params = []
             # total rows for version
-            count_sql = "SELECT COUNT(*) FROM [" + self.backup_schema + "].[" + backup_table + "] WHERE ref_data_version_id = ?"
-            cursor.execute(count_sql, ref_data_version_id)
+            count_sql = "SELECT COUNT(*) FROM " + version_from
+            cursor.execute(count_sql, *version_params)
             result['total_rows'] = cursor.fetchone()[0]
-            # paged rows (order by first column for deterministic paging)
+            # paged rows in row id order when the table has one (the order get_backup_version_page seeks in),
+            # otherwise by first column for deterministic paging
+            order_by = f"[{BACKUP_ROW_ID_COLUMN}]" if any(c.lower() == BACKUP_ROW_ID_COLUMN for c in col_names) else "1"
             select_sql = (
-                "SELECT * FROM [" + self.backup_schema + "].[" + backup_table + "] WHERE ref_data_version_id = ? ORDER BY 1 OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
+                "SELECT * FROM " + version_from + " ORDER BY " + order_by + " OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
             )
-            cursor.execute(select_sql, ref_data_version_id, offset, limit)
+            cursor.execute(select_sql, *version_params, offset, limit)
             for row in cursor.fetchall():
                 # pyodbc row -> list
                 result['rows'].append([row[i] for i in range(len(row))])
@@ -1316,6 +2380,110 @@ class DatabaseManager:
             result['error'] = str(e)
         return result
 
+    @staticmethod
+    def _encode_backup_cursor(version_id: int, position: Dict[str, int]) -> str:
+        """Opaque page token for get_backup_version_page"""
+        payload = json.dumps({'v': int(version_id), **position}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def _decode_backup_cursor(token: str, version_id: int) -> Dict[str, int]:
+        """Position stored in a get_backup_version_page token ({'r': last row id} or {'o': offset})"""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8'))
+            position = {k: int(payload[k]) for k in ('r', 'o') if k in payload}
+            valid = int(payload['v']) == int(version_id) and len(position) == 1
+        except Exception:
+            valid = False
+        if not valid:
+            raise ValueError('Invalid cursor for this backup version')
+        return position
+
+    def get_backup_version_page(self, connection: pyodbc.Connection, base_name: str, ref_data_version_id: int,
+                                limit: int = 50, cursor: Optional[str] = None,
+                                approximate_count: bool = False) -> Dict[str, Any]:
+        """Keyset-paged rows of a backup version: each page seeks past the last row id of the previous one on the
+        (ref_data_version_id, row id) clustered index, so every page of a full-copy version costs the same.
+        Delta versions (see backup_existing_data's snapshot_interval) have no stored rows to seek: every page
+        rebuilds the version from its snapshot and deltas (_delta_backup_source), so their page cost grows with
+        the version size. Either way the pages hold the same rows, in the same order, as get_backup_version_rows.
+        Pass the returned next_cursor (None on the last page) to get the following page. total_rows is computed
+        on the first page only; approximate_count takes it from the Backup_Version catalog instead of counting.
+        Tables without the row id column yet page by offset behind the same token.
+        Enforces 1 <= limit <= 1000."""
+        result = {'rows': [], 'columns': [], 'total_rows': None, 'total_is_approximate': False,
+                  'limit': limit, 'next_cursor': None}
+        if not base_name or not re.match(r'^[A-Za-z0-9_]+$', base_name):
+            return result
+        backup_table = f"{base_name}_backup"
+        db_cursor = connection.cursor()
+        try:
+            try:
+                limit = int(limit)
+            except Exception:
+                limit = 50
+            limit = min(max(limit, 1), 1000)
+            result['limit'] = limit
+            position = self._decode_backup_cursor(cursor, ref_data_version_id) if cursor else {}
+
+            col_names = [c['name'] for c in self.get_table_columns(connection, backup_table, self.backup_schema)]
+            result['columns'] = col_names
+            row_id_index = next((i for i, c in enumerate(col_names) if c.lower() == BACKUP_ROW_ID_COLUMN), None)
+            # Delta versions are rebuilt from their snapshot; full copies are read directly
+            delta_source = self._delta_backup_source(connection, base_name, ref_data_version_id)
+
+            if not cursor:
+                if approximate_count:
+                    self.ensure_backup_catalog_table(connection)
+                    db_cursor.execute(
+                        f"SELECT [row_count] FROM [{self.backup_schema}].[Backup_Version] WHERE [base_name] = ? AND [version_id] = ?",
+                        base_name, ref_data_version_id
+                    )
+                    catalog_row = db_cursor.fetchone()
+                    if catalog_row:
+                        result['total_rows'] = catalog_row[0]
+                        result['total_is_approximate'] = True
+                if result['total_rows'] is None:
+                    if delta_source is None:
+                        db_cursor.execute(
+                            f"SELECT COUNT_BIG(*) FROM [{self.backup_schema}].[{backup_table}] WHERE [ref_data_version_id] = ?",
+                            ref_data_version_id
+                        )
+                    else:
+                        db_cursor.execute("SELECT COUNT_BIG(*) FROM " + delta_source)
+                    result['total_rows'] = db_cursor.fetchone()[0]
+
+            if row_id_index is None or 'o' in position:
+                offset = position.get('o', 0)
+                page = self.get_backup_version_rows(connection, base_name, ref_data_version_id, limit + 1, offset)
+                if page.get('error'):
+                    raise Exception(page['error'])
+                rows = page['rows']
+                next_position = {'o': offset + limit}
+            else:
+                after = position.get('r', 0)
+                if delta_source is None:
+                    db_cursor.execute(
+                        f"SELECT TOP (?) * FROM [{self.backup_schema}].[{backup_table}] "
+                        f"WHERE [ref_data_version_id] = ? AND [{BACKUP_ROW_ID_COLUMN}] > ? ORDER BY [{BACKUP_ROW_ID_COLUMN}]",
+                        limit + 1, ref_data_version_id, after
+                    )
+                else:
+                    db_cursor.execute(
+                        f"SELECT TOP (?) * FROM {delta_source} WHERE [{BACKUP_ROW_ID_COLUMN}] > ? ORDER BY [{BACKUP_ROW_ID_COLUMN}]",
+                        limit + 1, after
+                    )
+                rows = [[row[i] for i in range(len(row))] for row in db_cursor.fetchall()]
+                next_position = {'r': rows[limit - 1][row_id_index]} if len(rows) > limit else None
+
+            # One extra row was fetched to tell whether another page follows
+            result['rows'] = rows[:limit]
+            if len(rows) > limit:
+                result['next_cursor'] = self._encode_backup_cursor(ref_data_version_id, next_position)
+        except Exception as e:
+            result['error'] = str(e)
+        return result
+
     def rollback_to_version(self, connection: pyodbc.Connection, base_name: str, ref_data_version_id: int) -> Dict[str, Any]:
         """Rollback main (and stage if exists) table to data from specified backup version.
         Returns dict with counts and actions."""
@@ -1342,22 +2510,30 @@ class DatabaseManager:
             if not common_cols:
                 raise Exception('No common columns between backup and main tables')
             col_list = ', '.join('[' + c + ']' for c in common_cols)
+            # Delta versions are rebuilt from their snapshot; full copies are read directly
+            delta_source = self._delta_backup_source(connection, base_name, ref_data_version_id)
+            if delta_source is None:
+                version_from = "[" + self.backup_schema + "].[" + backup_table + "] WHERE ref_data_version_id = ?"
+                version_params = [ref_data_version_id]
+            else:
+                version_from = delta_source
+                version_params = []
             # Truncate main
             cursor.execute("TRUNCATE TABLE [" + self.data_schema + "].[" + base_name + "]")
             # Insert from backup version
             insert_sql = (
                 "INSERT INTO [" + self.data_schema + "].[" + base_name + "] (" + col_list + ") "
-                "SELECT " + col_list + " FROM [" + self.backup_schema + "].[" + backup_table + "] WHERE ref_data_version_id = ?"
+                "SELECT " + col_list + " FROM " + version_from
             )
-            cursor.execute(insert_sql, ref_data_version_id)
+            cursor.execute(insert_sql, *version_params)
             outcome['main_rows'] = cursor.rowcount if cursor.rowcount is not None else 0
             # Stage table optional
             if stage_exists:
                 # Use same columns intersection for stage
                 cursor.execute("TRUNCATE TABLE [" + self.data_schema + "].[" + stage_name + "]")
                 cursor.execute(
-                    "INSERT INTO [" + self.data_schema + "].[" + stage_name + "] (" + col_list + ") SELECT " + col_list + " FROM [" + self.backup_schema + "].[" + backup_table + "] WHERE ref_data_version_id = ?",
-                    ref_data_version_id
+                    "INSERT INTO [" + self.data_schema + "].[" + stage_name + "] (" + col_list + ") SELECT " + col_list + " FROM " + version_from,
+                    *version_params
                 )
                 outcome['stage_rows'] = cursor.rowcount if cursor.rowcount is not None else 0
             connection.commit()
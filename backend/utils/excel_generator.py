@@ -321,10 +321,10 @@ class ExcelFormGenerator:
         mode_cell.fill = PatternFill(start_color="FFEB3B", end_color="FFEB3B", fill_type="solid")  # Yellow highlight
 
         # Add processing mode validation with enhanced settings
-        mode_validation = DataValidation(type="list", formula1='"fullload,append"', showDropDown=False)
-        mode_validation.error = "Please select processing mode: fullload (truncates existing data) or append (adds to existing data)"
+        mode_validation = DataValidation(type="list", formula1='"fullload,append,upsert"', showDropDown=False)
+        mode_validation.error = "Please select processing mode: fullload (truncates existing data), append (adds to existing data) or upsert (updates/inserts by key)"
         mode_validation.errorTitle = "Processing Mode Required"
-        mode_validation.prompt = "REQUIRED: Click dropdown arrow to select fullload or append mode"
+        mode_validation.prompt = "REQUIRED: Click dropdown arrow to select fullload, append or upsert mode"
         mode_validation.promptTitle = "Processing Mode Selection"
         mode_validation.showErrorMessage = True
         mode_validation.showInputMessage = True
@@ -350,6 +350,18 @@ class ExcelFormGenerator:
         ws[f'B{row}'].font = Font(size=9, italic=True, color="666666")
         row += 1
 
+        ws[f'A{row}'].value = ""
+        ws[f'B{row}'].value = "• upsert: Updates rows with matching key, adds new ones"
+        ws[f'B{row}'].font = Font(size=9, italic=True, color="666666")
+        row += 1
+
+        # Key Columns (upsert only)
+        ws[f'A{row}'].value = "Key Columns:"
+        ws[f'A{row}'].font = label_font
+        ws[f'B{row}'].border = border_thin
+        ws[f'C{row}'].value = "Required for upsert: comma-separated column names"
+        row += 1
+
         # Reference Data Table
         ws[f'A{row}'].value = "Reference Data Table:"
         ws[f'A{row}'].font = Font(bold=True, size=11, color="2F5597")
@@ -20,7 +20,7 @@ class ExcelProcessor:
         # Valid options for form validation
         self.valid_delimiters = [',', ';', '|', 'Tab']
         self.valid_encodings = ['utf-8', 'utf-16', 'iso-8859-1', 'cp1252']
-        self.valid_processing_modes = ['fullload', 'append']
+        self.valid_processing_modes = ['fullload', 'append', 'upsert']
         self.valid_yes_no = ['Yes', 'No']
 
     def validate_form(self, excel_path: str) -> Tuple[bool, Dict[str, Any], List[str]]:
@@ -81,6 +81,7 @@ class ExcelProcessor:
                 'encoding': 'utf-8',
                 'has_headers': True,
                 'processing_mode': 'fullload',
+                'key_columns': [],
                 'is_reference_data': True,
                 'table_name': '',
                 'confirmed': False,
@@ -116,6 +117,7 @@ class ExcelProcessor:
 
                 # Processing section mappings
                 'Mode:': 'processing_mode',
+                'Key Columns:': 'key_columns',
                 'Create Config Record:': 'is_reference_data',
                 'Table Name:': 'table_name',
                 'Target Schema:': 'target_schema',
@@ -144,10 +146,15 @@ class ExcelProcessor:
                     config['processing_mode'] = 'fullload'
                 elif config['processing_mode'] == 'append':
                     config['processing_mode'] = 'append'
+                elif config['processing_mode'] == 'upsert':
+                    config['processing_mode'] = 'upsert'
                 elif config['processing_mode'] == 'Select Mode':
                     # User hasn't selected a mode yet
                     config['processing_mode'] = ''
 
+            if 'key_columns' in config:
+                config['key_columns'] = [k.strip() for k in config['key_columns'].split(',') if k.strip()]
+
             if 'is_reference_data' in config:
                 config['is_reference_data'] = (config['is_reference_data'] == 'Yes')
 
@@ -228,8 +235,12 @@ class ExcelProcessor:
 
         # Processing mode validation
         processing_mode = config.get('processing_mode', '')
-        if not processing_mode or processing_mode not in ['fullload', 'append']:
-            errors.append("Processing mode is required. Please select 'fullload' or 'append'")
+        if not processing_mode or processing_mode not in self.valid_processing_modes:
+            errors.append("Processing mode is required. Please select 'fullload', 'append' or 'upsert'")
+
+        # Upsert merges on a business key
+        if processing_mode == 'upsert' and not config.get('key_columns'):
+            errors.append("Key Columns are required for upsert mode (comma-separated column names)")
 
         # Table name validation (if provided)
         table_name = config.get('table_name', '')
@@ -275,6 +286,7 @@ class ExcelProcessor:
         processing_config = {
             'csv_file_path': str(csv_path),
             'load_type': config['processing_mode'],
+            'key_columns': config.get('key_columns', []),
             'is_reference_data': config['is_reference_data'],
             'table_name': config.get('table_name', ''),
             'target_schema': config.get('target_schema', 'ref'),
@@ -4,19 +4,89 @@ Data ingestion utilities for processing CSV files and loading into SQL Server
 
 import os
 import re
+import csv
+import math
+import asyncio
+import hashlib
+import queue
+import threading
 import pandas as pd
+import pyodbc
 import traceback
 import time
-from typing import AsyncGenerator, Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from itertools import repeat
+from typing import AsyncGenerator, AsyncIterator, Dict, Any, Iterator, List
 from datetime import datetime
 
-from utils.database import DatabaseManager
+from utils.database import DatabaseManager, ROW_HASH_COLUMN
 from utils.file_handler import FileHandler
 from utils.logger import Logger
 from utils import progress as prog
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # Optional: csv_engine 'pyarrow' falls back to the pandas parser without it
+    pa = None
+    pa_csv = None
+
+
+class _BatchSizer:
+    """Hill-climbing batch size controller for the stage load.
+    Each full batch reports its row count and duration; the size keeps moving in the same
+    direction while rows/s improves, turns around with a smaller step when it drops, and
+    shrinks whenever a batch exceeds target_seconds. The size stays within [lower, upper]."""
+
+    def __init__(self, start: int, lower: int, upper: int, target_seconds: float):
+        self.lower = max(1, lower)
+        self.upper = max(self.lower, upper)
+        self.target_seconds = target_seconds
+        self.size = self._clamp(start)
+        self.step = 2.0
+        self.direction = 1
+        self.last_rate = None
+
+    def _clamp(self, size: int) -> int:
+        return min(self.upper, max(self.lower, int(size)))
+
+    def record(self, rows: int, seconds: float) -> int:
+        """Feed back one batch and return the size for the next one."""
+        # Short final batches and unmeasurable ones say nothing about the current size
+        if rows < self.size or seconds <= 0:
+            return self.size
+        rate = rows / seconds
+        if seconds > self.target_seconds:
+            self.direction = -1
+        elif self.last_rate is not None:
+            if rate < self.last_rate * 0.95:
+                # Went past the optimum: turn around and take finer steps
+                self.direction = -self.direction
+                self.step = max(1.1, self.step ** 0.5)
+            elif rate < self.last_rate * 1.05:
+                # Within noise of the previous size: close in on it
+                self.step = max(1.1, self.step ** 0.5)
+        self.last_rate = rate
+        if self.direction > 0:
+            # Never grow past the size expected to hit the latency target
+            new_size = min(self.size * self.step, self.size * self.target_seconds / seconds)
+        else:
+            new_size = self.size / self.step
+        self.size = self._clamp(new_size)
+        return self.size
+
+
 class DataIngester:
     """Handles CSV data ingestion into SQL Server database"""
 
+    # Stage row number used to move stage rows to the main table in key ranges
+    _STAGE_ROW_COLUMN = 'ref_data_stage_row'
+    # SQL Server character types; anything else in a main table is a typed column
+    _TEXT_TYPES = ('varchar', 'nvarchar', 'char', 'nchar', 'text', 'ntext')
+    _INT_PATTERN = r'[+-]?(?:0|[1-9]\d*)'
+    _DECIMAL_PATTERN = r'[+-]?(?:(?:0|[1-9]\d*)(?:\.\d+)?|\.\d+)'
+    _DATETIME_PATTERN = r'(\d{4})-(\d{2})-(\d{2})(?:[ T](\d{2}):(\d{2})(?::(\d{2})(?:\.\d{1,7})?)?)?'
+
     def __init__(self, db_manager: DatabaseManager, logger: Logger):
         self.db_manager = db_manager
         self.logger = logger
@@ -37,7 +107,100 @@ class DataIngester:
         self.enable_type_inference = ingest_config['type_inference']
         self.type_sample_rows = ingest_config['type_sample_rows']
         self.date_parse_threshold = ingest_config['date_threshold']
+        # Typed columns: main-table columns whose sample values are all integers/decimals (or at
+        # least date_threshold ISO dates) become int/bigint/decimal/date/datetime2; stage stays varchar
+        self.typed_columns = ingest_config.get('typed_columns', False) is True
+        # Width profiling: size each varchar from the exact max byte length over the whole file
+        # (plus width_headroom, at least width_min) instead of the sampled 1024/4000/8000/MAX buckets
+        self.width_profiling = ingest_config.get('width_profiling', False) is True
+        try:
+            self.width_headroom = max(0.0, float(ingest_config.get('width_headroom', 0.25)))
+        except Exception:
+            self.width_headroom = 0.25
+        try:
+            self.width_min = max(1, int(ingest_config.get('width_min', 50)))
+        except Exception:
+            self.width_min = 50
         self.slow_progress_demo = ingest_config.get('slow_progress_demo', False)
+        # Stage load engine: 'executemany' binds each batch as parameter arrays,
+        # 'tvp' sends each batch as one table-valued parameter, 'row' issues one INSERT per row (kept as fallback)
+        self.load_engine = str(ingest_config.get('load_engine', 'executemany') or 'executemany').lower()
+        # TVP batches are a single parameter, so they are not subject to the 990-row cap above
+        try:
+            self.tvp_batch_size = max(1, int(ingest_config.get('tvp_batch_size', 50000)))
+        except Exception:
+            self.tvp_batch_size = 50000
+        # Adaptive batching: tune the executemany/tvp batch size per load from measured rows/s.
+        # The upper bound is a budget of bound values per batch (rows * columns), so wide
+        # tables get smaller batches than narrow ones; 'row' loads and parallel loads stay fixed.
+        self.adaptive_batch = ingest_config.get('adaptive_batch', False) is True
+        try:
+            self.adaptive_min_batch = max(1, int(ingest_config.get('adaptive_min_batch', 100)))
+        except Exception:
+            self.adaptive_min_batch = 100
+        try:
+            self.adaptive_max_params = max(1, int(ingest_config.get('adaptive_max_params', 1000000)))
+        except Exception:
+            self.adaptive_max_params = 1000000
+        try:
+            self.adaptive_target_seconds = max(0.1, float(ingest_config.get('adaptive_target_seconds', 2.0)))
+        except Exception:
+            self.adaptive_target_seconds = 2.0
+        # CSV reader for full-file reads: 'pandas' (C parser, object columns) or 'pyarrow'
+        # (multi-threaded Arrow parser, Arrow-backed string columns; needs the pyarrow package)
+        self.csv_engine = str(ingest_config.get('csv_engine', 'pandas') or 'pandas').lower()
+        # Streaming mode: read/normalize/load the file chunk by chunk so memory is bounded by chunk_rows
+        self.streaming = ingest_config.get('streaming', False) is True
+        try:
+            self.chunk_rows = max(1, int(ingest_config.get('chunk_rows', 100000)))
+        except Exception:
+            self.chunk_rows = 100000
+        # Heap staging: stage table without constraints, loaded WITH (TABLOCK) and committed
+        # every heap_commit_rows rows instead of every batch to cut transaction log traffic
+        self.heap_stage = ingest_config.get('heap_stage', False) is True
+        try:
+            self.heap_commit_rows = max(1, int(ingest_config.get('heap_commit_rows', 500000)))
+        except Exception:
+            self.heap_commit_rows = 500000
+        # Swap full load: build the new rows in a shadow table and switch it in at the end, so the
+        # main table keeps serving its old rows during the load instead of being truncated up front
+        self.swap_full_load = ingest_config.get('swap_full_load', False) is True
+        # Delta full load: the loader stores a per-row content hash on stage and main rows, and a
+        # full load into an existing table only deletes/inserts the rows whose hashes differ
+        self.delta_full_load = ingest_config.get('delta_full_load', False) is True
+        # Skip the post-load backup when the main table's content fingerprint equals the latest backup version's
+        self.skip_identical_backups = ingest_config.get('skip_identical_backups', False) is True
+        # >1 stores backup versions as deltas against the previous version, with a full snapshot every N versions
+        try:
+            self.backup_snapshot_interval = max(0, int(ingest_config.get('backup_snapshot_interval', 0)))
+        except Exception:
+            self.backup_snapshot_interval = 0
+        # Chunked transfer: >0 moves stage rows to the main table in slices of this many rows
+        # (one committed INSERT ... SELECT per stage row-number range) instead of one statement
+        try:
+            self.transfer_chunk_rows = max(0, int(ingest_config.get('transfer_chunk_rows', 0)))
+        except Exception:
+            self.transfer_chunk_rows = 0
+        # Checkpoints: record committed stage rows per batch so an interrupted load can resume.
+        # Off by default - every batch pays for the write, and only a resume=True caller reads them
+        self.checkpoints = ingest_config.get('checkpoints', False) is True
+        # Parallel stage load: >1 splits each load into contiguous row ranges inserted
+        # concurrently over pooled connections (one per worker)
+        try:
+            self.parallel_workers = max(1, int(ingest_config.get('parallel_workers', 1)))
+        except Exception:
+            self.parallel_workers = 1
+        # Each worker holds a pooled connection for its whole range; extra workers would only time out waiting
+        pool_size = getattr(db_manager, 'pool_size', None)
+        if isinstance(pool_size, int) and pool_size > 0:
+            self.parallel_workers = min(self.parallel_workers, pool_size)
+        # Pipelined mode (implies streaming): a producer thread parses/normalizes chunks into a
+        # bounded queue while the stage load drains it, overlapping CSV parsing with DB inserts
+        self.pipeline = ingest_config.get('pipeline', False) is True
+        try:
+            self.pipeline_queue_depth = max(1, int(ingest_config.get('pipeline_queue_depth', 2)))
+        except Exception:
+            self.pipeline_queue_depth = 2
         # Legacy bulk/stream settings removed.
 
     async def ingest_data(
@@ -48,14 +211,28 @@ class DataIngester:
         filename: str,
         override_load_type: str = None,
         config_reference_data: bool = False,
-        target_schema: str = None
+        target_schema: str = None,
+        load_engine: str = None,
+        streaming: bool = None,
+        pipeline: bool = None,
+        resume: bool = False,
+        key_columns: List[str] = None
     ) -> AsyncGenerator[str, None]:
         """Main ingestion function.
-        Simplified: always reads full file then performs multi-row INSERT batching (≤990 rows per statement).
-        load_mode: 'full' or 'append'.
+        Reads the full file then loads the stage table in batches, or with streaming
+        (defaults to the ingest.streaming setting) reads and loads it chunk by chunk.
+        pipeline (defaults to ingest.pipeline) streams with parsing on a producer thread.
+        load_mode: 'full' (or 'fullload', as the library API names it), 'append' or 'upsert'.
+        load_engine: 'executemany', 'tvp' or 'row'; defaults to the ingest.load_engine setting.
+        resume: keep the stage table and skip rows already committed by an interrupted load of the
+        same file (matched by its checkpoint fingerprint); falls back to a fresh load when there is none.
+        key_columns: business key for upsert mode; defaults to processing_options.key_columns in the format file.
         """
         connection = None
         overall_start = time.perf_counter()
+        # The library API submits full loads as 'fullload'; every full-load path below checks for 'full'
+        if isinstance(load_mode, str) and load_mode.strip().lower() in ('full', 'fullload'):
+            load_mode = 'full'
         # Capture a single static load timestamp for all rows in this ingestion
         static_load_timestamp = datetime.utcnow()
 
@@ -73,7 +250,12 @@ class DataIngester:
             # Step 1: Get database connection
             yield "Connecting to database..."
             t_connect_start = time.perf_counter()
+            # A dedicated connection, not a pooled one: it is held for the whole load, and the parallel
+            # stage workers check out up to parallel_workers pooled connections while it is, so taking
+            # a pool slot here would leave them one short (and pin a slot for minutes per load)
             connection = self.db_manager.get_connection()
+            # Table existence/column lookups are served from a cache for the rest of this run
+            self.db_manager.begin_metadata_cache(connection)
 
             # Use target schema or default to configured data schema
             if target_schema:
@@ -112,10 +294,21 @@ class DataIngester:
             if progress_key and prog.is_canceled(progress_key):
                 yield "Cancellation requested - stopping after format configuration"
                 raise Exception("Ingestion canceled by user")
-            # Step 4: Read and validate CSV file (always full read)
+            # Step 4: Read and validate CSV file (full read, or first chunk when streaming)
             yield "Reading CSV file..."
             t_read = time.perf_counter()
-            df = await self._read_csv_file(file_path, csv_format, progress_key)
+            chunk_iter = None
+            use_pipeline = self.pipeline if pipeline is None else bool(pipeline)
+            use_streaming = use_pipeline or (self.streaming if streaming is None else bool(streaming))
+            if use_streaming:
+                # Headers and type inference come from the first chunk; the rest is read during the load
+                chunk_iter = self._iter_csv_chunks(file_path, csv_format)
+                df = next(chunk_iter, None)
+                if df is None:
+                    df = pd.DataFrame()
+                yield f"Streaming mode: reading {self.chunk_rows} rows per chunk"
+            else:
+                df = await self._read_csv_file(file_path, csv_format, progress_key)
 
             # Trailer handling is now done inside _read_csv_file
             has_trailer = csv_format.get('has_trailer', False)
@@ -124,7 +317,7 @@ class DataIngester:
 
             total_rows = len(df)
             prog.update_progress(progress_key, total=total_rows, inserted=0, stage='read_csv')
-            yield f"CSV file loaded: {total_rows} rows (read in {(time.perf_counter()-t_read):.2f}s, {(total_rows/(time.perf_counter()-t_read) if total_rows else 0):.0f} rows/s)"
+            yield f"CSV {'first chunk' if chunk_iter is not None else 'file'} loaded: {total_rows} rows (read in {(time.perf_counter()-t_read):.2f}s, {(total_rows/(time.perf_counter()-t_read) if total_rows else 0):.0f} rows/s)"
             if total_rows == 0:
                 yield "ERROR! CSV file contains no data rows"
                 # Auto-cancel on empty file
@@ -164,6 +357,12 @@ class DataIngester:
                 return
             yield f"Headers processed: {len(valid_headers)} valid columns ({(time.perf_counter()-t_headers):.2f}s)"
 
+            if load_mode == "upsert":
+                if key_columns is None:
+                    key_columns = format_config.get('processing_options', {}).get('key_columns')
+                key_columns = self._resolve_key_columns(key_columns, valid_headers)
+                yield f"upsert mode: merging on key columns {key_columns}"
+
             # Check for cancellation after header processing
             if progress_key and prog.is_canceled(progress_key):
                 yield "Cancellation requested - stopping after header processing"
@@ -171,7 +370,27 @@ class DataIngester:
 
             # Step 6: Prepare column definitions
             columns = []
-            if self.enable_type_inference:
+            if self.width_profiling:
+                yield "Profiling column widths over the full file..."
+                t_profile = time.perf_counter()
+                if chunk_iter is not None:
+                    # Streaming keeps memory bounded, so widths come from a separate chunked pass
+                    profile = await asyncio.to_thread(self._profile_file, file_path, csv_format, valid_headers)
+                else:
+                    profile = self._profile_columns(df, valid_headers)
+                inferred_map = self._size_columns(profile)
+                profiled_rows = next(iter(profile.values()))['rows'] if profile else 0
+                yield f"Column widths profiled over {profiled_rows} rows in {(time.perf_counter()-t_profile):.2f}s"
+                try:
+                    self._persist_inferred_schema(fmt_file_path, inferred_map, profile)
+                    yield "Inferred schema persisted to format file"
+                except Exception as _e:
+                    yield f"WARNING: Failed to persist inferred schema: {_e}"
+
+                if progress_key and prog.is_canceled(progress_key):
+                    yield "Cancellation requested - stopping after width profiling"
+                    raise Exception("Ingestion canceled by user")
+            elif self.enable_type_inference:
                 yield "Inferring column data types..."
                 t_infer = time.perf_counter()
                 sample_df = df.head(self.type_sample_rows)
@@ -195,9 +414,21 @@ class DataIngester:
                     raise Exception("Ingestion canceled by user")
             else:
                 inferred_map = {san: 'varchar(4000)' for _, san in valid_headers}
+            # The stage table always lands the raw text; typed columns only apply to the main table
+            stage_map = inferred_map
+            if self.typed_columns:
+                t_typed = time.perf_counter()
+                sample_typed = df.head(self.type_sample_rows).rename(columns={orig: san for orig, san in valid_headers})
+                typed_map = self._detect_column_types(sample_typed, [san for _, san in valid_headers])
+                inferred_map = {**inferred_map, **typed_map}
+                yield f"Typed columns detected: {len(typed_map)} of {len(valid_headers)} ({(time.perf_counter()-t_typed):.2f}s)"
+                for col_name, col_type in list(typed_map.items())[:10]:
+                    yield f"  - Column '{col_name}': {col_type}"
+            stage_columns = []
             for _, sanitized_header in valid_headers:
                 dtype = inferred_map.get(sanitized_header, 'varchar(4000)')
                 columns.append({'name': sanitized_header,'data_type': dtype})
+                stage_columns.append({'name': sanitized_header, 'data_type': stage_map.get(sanitized_header, 'varchar(4000)')})
             # All columns are varchar - no numeric validation needed
             yield "Column definitions prepared"
             prog.update_progress(progress_key, stage='prepared')
@@ -210,10 +441,11 @@ class DataIngester:
             # Step 7: Determine load type for this ingestion
             yield "Determining load type based on existing data..."
             determined_load_type = self.db_manager.determine_load_type(connection, table_name, load_mode, override_load_type)
+            load_type_name = {'F': 'fullload', 'U': 'upsert'}.get(determined_load_type, 'append')
             if override_load_type:
-                yield f"Load type overridden by user: {'fullload' if determined_load_type == 'F' else 'append'} (code: {determined_load_type})"
+                yield f"Load type overridden by user: {load_type_name} (code: {determined_load_type})"
             else:
-                yield f"Load type determined: {'fullload' if determined_load_type == 'F' else 'append'} (code: {determined_load_type})"
+                yield f"Load type determined: {load_type_name} (code: {determined_load_type})"
 
             # Step 8: Check existing data for backup (BEFORE creating tables)
             existing_rows = 0
@@ -227,6 +459,9 @@ class DataIngester:
             elif table_exists and load_mode == "append":
                 existing_rows = self.db_manager.get_row_count(connection, table_name)
                 yield f"append mode: main table already has {existing_rows} rows (will preserve and append)"
+            elif table_exists and load_mode == "upsert":
+                existing_rows = self.db_manager.get_row_count(connection, table_name)
+                yield f"upsert mode: main table already has {existing_rows} rows (matching keys are updated, new keys inserted)"
 
             # Check for cancellation before table operations
             if progress_key and prog.is_canceled(progress_key):
@@ -275,16 +510,21 @@ class DataIngester:
                         yield f"WARNING: Main table column sync failed: {_e}"
 
                     # Clear existing data for fullload (but preserve table structure)
-                    if existing_rows > 0:
+                    if self.delta_full_load:
+                        yield "fullload mode: delta load - only changed rows will be applied to the main table"
+                    elif self.swap_full_load:
+                        yield "fullload mode: existing rows stay visible until the new data is swapped in"
+                    elif existing_rows > 0:
                         yield f"fullload mode: truncating {existing_rows} existing rows from main table..."
                         self.db_manager.truncate_table(connection, table_name)
                         yield "Main table data cleared for fullload"
-            else:  # append
+            else:  # append / upsert
+                mode_label = "upsert" if load_mode == "upsert" else "append"
                 if not table_exists:
-                    yield "append mode: main table does not exist yet, creating new main table..."
+                    yield f"{mode_label} mode: main table does not exist yet, creating new main table..."
                     self.db_manager.create_table(connection, table_name, columns, add_metadata_columns=True)
                 else:
-                    yield "append mode: preserving existing main table schema"
+                    yield f"{mode_label} mode: preserving existing main table schema"
                     # Ensure metadata columns exist first
                     try:
                         meta_actions = self.db_manager.ensure_metadata_columns(connection, table_name)
@@ -307,58 +547,156 @@ class DataIngester:
                     except Exception as _e:
                         yield f"WARNING: Main table column sync failed: {_e}"
 
-            # Handle stage table - always drop and recreate to match input file exactly
-            if stage_exists:
-                yield "Stage table exists, dropping and recreating to match input file columns..."
-                # Drop existing stage table
-                self.db_manager.drop_table_if_exists(connection, stage_table_name)
-                yield "Existing stage table dropped"
+            if load_mode == "upsert":
+                # The MERGE looks up every stage key in the main table; an index keeps that a seek
+                try:
+                    if self.db_manager.ensure_key_index(connection, table_name, key_columns):
+                        yield f"Created key index on main table: {key_columns}"
+                except Exception as _e:
+                    yield f"WARNING: Failed to create key index on main table: {_e}"
+
+            if self.delta_full_load:
+                # Main rows carry the content hash so full loads can be applied as deltas
+                if self.db_manager.ensure_row_hash_column(connection, table_name, index=True) and existing_rows:
+                    yield "Added row hash column to main table - existing rows are replaced once by this load"
+
+            # Checkpoints identify the file by a fingerprint (size, mtime, head and tail) so a resume never
+            # mixes two different files without hashing the whole file on every load
+            resume_offset = 0
+            file_hash = None
+            if self.checkpoints:
+                file_hash = await asyncio.to_thread(self._file_fingerprint, file_path)
+                self.db_manager.ensure_ingest_checkpoint_table(connection)
+                if resume and stage_exists:
+                    resume_offset = self.db_manager.get_ingest_checkpoint(connection, stage_table_name, file_hash) or 0
+                if resume and not resume_offset:
+                    yield "No checkpoint found for this file - loading from the start"
+            elif resume:
+                yield "WARNING: Resume requested but ingest checkpoints are disabled - loading from the start"
+
+            if resume_offset:
+                yield f"Resuming stage load: {resume_offset} rows already committed to {stage_table_name}"
             else:
-                yield "Creating new stage table to match input file columns..."
+                # Handle stage table - always drop and recreate to match input file exactly
+                if stage_exists:
+                    yield "Stage table exists, dropping and recreating to match input file columns..."
+                    # Drop existing stage table
+                    self.db_manager.drop_table_if_exists(connection, stage_table_name)
+                    yield "Existing stage table dropped"
+                else:
+                    yield "Creating new stage table to match input file columns..."
 
-            # Always create fresh stage table with exact input file structure
-            self.db_manager.create_table(connection, stage_table_name, columns, add_metadata_columns=True)
-            column_names = [col['name'] for col in columns]
-            yield f"Stage table recreated with {len(columns)} data columns: {column_names[:5]}{'...' if len(columns) > 5 else ''}"
+                # Always create fresh stage table with exact input file structure
+                self.db_manager.create_table(
+                    connection, stage_table_name, stage_columns, add_metadata_columns=True, heap=self.heap_stage,
+                    identity_column=self._STAGE_ROW_COLUMN if self.transfer_chunk_rows else None
+                )
+                if self.delta_full_load:
+                    # The server hashes each stage row as it is inserted
+                    self.db_manager.ensure_row_hash_column(
+                        connection, stage_table_name, hash_columns=[col['name'] for col in stage_columns]
+                    )
+                if file_hash:
+                    self.db_manager.clear_ingest_checkpoint(connection, stage_table_name)
+                column_names = [col['name'] for col in columns]
+                yield f"Stage table recreated with {len(columns)} data columns: {column_names[:5]}{'...' if len(columns) > 5 else ''}"
             yield "Stage table ready for data loading"
-
             self.db_manager.create_validation_procedure(connection, table_base_name)
+            if (load_engine or self.load_engine).lower() == 'tvp':
+                self.db_manager.create_stage_load_procedure(
+                    connection, stage_table_name, stage_columns, tablock=self.heap_stage
+                )
+                yield "Stage load procedure created for table-valued parameter batches"
             yield f"Database tables created/validated ({(time.perf_counter()-t_tables):.2f}s)"
             prog.update_progress(progress_key, stage='tables_ready')
 
             # Step 10: Process and load data to stage table
-            yield "Processing CSV data..."
-            t_process = time.perf_counter()
-            column_mapping = {orig: san for orig, san in valid_headers}
-            df_processed = df[list(column_mapping.keys())].rename(columns=column_mapping)
-
-            for col in df_processed.columns:
-                df_processed[col] = df_processed[col].astype(str).replace({'nan':'','None':''})
-            # All columns are varchar - no numeric validation needed
-            yield f"Data processing completed ({(time.perf_counter()-t_process):.2f}s)"
-
-            # Check for cancellation after data processing
-            if progress_key and prog.is_canceled(progress_key):
-                yield "Cancellation requested - stopping after data processing"
-                raise Exception("Ingestion canceled by user")
+            if chunk_iter is None:
+                yield "Processing CSV data..."
+                t_process = time.perf_counter()
+                df_processed = self._normalize_frame(df, valid_headers)
+                # All columns are varchar - no numeric validation needed
+                yield f"Data processing completed ({(time.perf_counter()-t_process):.2f}s)"
+
+                # Check for cancellation after data processing
+                if progress_key and prog.is_canceled(progress_key):
+                    yield "Cancellation requested - stopping after data processing"
+                    raise Exception("Ingestion canceled by user")
 
-            yield "Loading data to stage table..."
-            t_load = time.perf_counter()
-            # Update progress to show we're starting the insert phase
-            prog.update_progress(progress_key, inserted=0, total=total_rows, stage='loading')
-            await self._load_dataframe_to_table(
-                connection,
-                df_processed,
-                stage_table_name,
-                self.db_manager.data_schema,
-                total_rows,
-                progress_key,
-                determined_load_type,
-                static_load_timestamp
-            )
-            elapsed_load = time.perf_counter()-t_load
-            rps = (total_rows/elapsed_load) if elapsed_load>0 else 0
-            yield f"Data loaded to stage table: {total_rows} rows in {elapsed_load:.2f}s ({rps:.0f} rows/s)"
+                yield "Loading data to stage table..."
+                t_load = time.perf_counter()
+                # Update progress to show we're starting the insert phase
+                prog.update_progress(progress_key, inserted=resume_offset, total=total_rows, stage='loading')
+                if resume_offset:
+                    df_processed = df_processed.iloc[resume_offset:]
+                await self._load_dataframe_to_table(
+                    connection,
+                    df_processed,
+                    stage_table_name,
+                    self.db_manager.data_schema,
+                    total_rows,
+                    progress_key,
+                    determined_load_type,
+                    static_load_timestamp,
+                    load_engine,
+                    truncate=not resume_offset,
+                    row_offset=resume_offset,
+                    checkpoint=file_hash
+                )
+                elapsed_load = time.perf_counter()-t_load
+                rps = (total_rows/elapsed_load) if elapsed_load>0 else 0
+                yield f"Data loaded to stage table: {total_rows} rows in {elapsed_load:.2f}s ({rps:.0f} rows/s)"
+            else:
+                yield "Loading data to stage table in chunks..."
+                t_load = time.perf_counter()
+                prog.update_progress(progress_key, inserted=0, total=total_rows, stage='loading')
+                loaded_rows = 0
+                chunk_count = 0
+                # Only the chunk being loaded plus a bounded read-ahead (one chunk for trailer
+                # handling, pipeline_queue_depth chunks when pipelined) is held in memory
+                if use_pipeline:
+                    yield f"Pipelined load: parsing up to {self.pipeline_queue_depth} chunks ahead of the stage insert"
+                    frames = self._pipelined_chunks(df, chunk_iter, valid_headers, progress_key)
+                else:
+                    frames = self._sequential_chunks(df, chunk_iter, valid_headers)
+                df = None
+                async with aclosing(frames):
+                    async for chunk_processed in frames:
+                        prog.update_progress(progress_key, total=loaded_rows + len(chunk_processed))
+                        # On resume, skip chunks (and the part of a chunk) committed by the earlier run
+                        if loaded_rows + len(chunk_processed) <= resume_offset:
+                            loaded_rows += len(chunk_processed)
+                            continue
+                        if loaded_rows < resume_offset:
+                            chunk_processed = chunk_processed.iloc[resume_offset - loaded_rows:]
+                            loaded_rows = resume_offset
+                        await self._load_dataframe_to_table(
+                            connection,
+                            chunk_processed,
+                            stage_table_name,
+                            self.db_manager.data_schema,
+                            len(chunk_processed),
+                            progress_key,
+                            determined_load_type,
+                            static_load_timestamp,
+                            load_engine,
+                            truncate=(chunk_count == 0 and not resume_offset),
+                            row_offset=loaded_rows,
+                            checkpoint=file_hash
+                        )
+                        loaded_rows += len(chunk_processed)
+                        chunk_count += 1
+                        chunk_processed = None
+                        yield f"Chunk {chunk_count} loaded to stage table ({loaded_rows} rows so far)"
+
+                        if progress_key and prog.is_canceled(progress_key):
+                            yield "Cancellation requested - stopping chunked stage load"
+                            raise Exception("Ingestion canceled by user")
+                total_rows = loaded_rows
+                prog.update_progress(progress_key, total=total_rows)
+                elapsed_load = time.perf_counter()-t_load
+                rps = (total_rows/elapsed_load) if elapsed_load>0 else 0
+                yield f"Data loaded to stage table: {total_rows} rows in {chunk_count} chunks, {elapsed_load:.2f}s ({rps:.0f} rows/s)"
             prog.update_progress(progress_key, stage='loaded_stage')
 
             # Check for cancellation after stage loading
@@ -409,6 +747,8 @@ class DataIngester:
             # Step 12: Prepare for data load (existing data backed up and main table cleared for fullload)
             if load_mode == "full":
                 yield "Preparing for fullload (existing data backed up, main table structure preserved)"
+            elif load_mode == "upsert":
+                yield "upsert mode: will merge stage rows into main table on key columns"
             else:
                 yield "append mode: will insert new rows into existing main table"
 
@@ -435,15 +775,28 @@ class DataIngester:
             # Build column lists ensuring both tables have the columns
             insert_columns = []  # Columns for main table INSERT
             select_columns = []  # Columns for stage table SELECT
+            conversions = {}  # Text stage columns feeding typed main columns
 
             for stage_col in stage_table_columns:
                 col_name = stage_col['name']
                 col_name_lower = col_name.lower()
 
+                if col_name_lower == self._STAGE_ROW_COLUMN:
+                    continue
                 if col_name_lower in main_cols:
                     # Column exists in both tables
                     insert_columns.append(f"[{col_name}]")
-                    select_columns.append(f"[{col_name}]")
+                    main_col = main_cols[col_name_lower]
+                    main_type = str(main_col.get('data_type') or '').lower()
+                    stage_type = str(stage_col.get('data_type') or '').lower()
+                    if main_type and main_type not in self._TEXT_TYPES and stage_type in self._TEXT_TYPES:
+                        target_type = self.db_manager._normalize_data_type(
+                            main_type, main_col.get('max_length'), main_col.get('numeric_precision'), main_col.get('numeric_scale')
+                        )
+                        conversions[col_name] = target_type
+                        select_columns.append(f"TRY_CONVERT({target_type}, [{col_name}])")
+                    else:
+                        select_columns.append(f"[{col_name}]")
                 else:
                     # Stage column doesn't exist in main table - skip it
                     yield f"WARNING: Skipping stage column [{col_name}] - not found in main table"
@@ -461,18 +814,99 @@ class DataIngester:
             if not insert_columns:
                 raise Exception("No compatible columns found between stage and main tables")
 
+            if conversions:
+                # TRY_CONVERT would turn values outside the sample that do not fit the typed column into
+                # NULL; such columns go back to the stage's varchar type so the text loads intact
+                failed = self.db_manager.count_failed_conversions(connection, stage_table_name, conversions)
+                widen = []
+                for col_name, failures in failed.items():
+                    if failures:
+                        stage_col = stage_cols[col_name.lower()]
+                        text_type = self.db_manager._normalize_data_type(
+                            str(stage_col.get('data_type') or 'varchar'), stage_col.get('max_length'),
+                            stage_col.get('numeric_precision'), stage_col.get('numeric_scale')
+                        )
+                        widen.append({'name': main_cols[col_name.lower()]['name'], 'data_type': text_type})
+                        select_columns[insert_columns.index(f"[{col_name}]")] = f"[{col_name}]"
+                        yield f"WARNING: {failures} values in column [{col_name}] are not valid {conversions[col_name]} - converting the main table column to {text_type}"
+                if widen:
+                    self.db_manager.sync_table_schema(connection, table_name, widen)
+
             # Build explicit INSERT statement with column lists
             insert_column_list = ", ".join(insert_columns)
             select_column_list = ", ".join(select_columns)
 
+            # Delta full load: apply only the rows whose content hash changed
+            use_delta = (
+                load_mode == "full" and self.delta_full_load and table_exists
+                and ROW_HASH_COLUMN in stage_cols and ROW_HASH_COLUMN in main_cols
+            )
+            # Swap full load: fill an empty shadow copy of the main table (bulk, TABLOCK) and swap it in below
+            use_swap = load_mode == "full" and self.swap_full_load and table_exists and not use_delta
+            target_table = table_name
+            table_hint = ""
+            if use_swap:
+                target_table = self.db_manager.create_swap_table(connection, table_name)
+                table_hint = " WITH (TABLOCK)"
+                yield f"fullload swap: building new data in {target_table}"
+
             insert_sql = (
-                f"INSERT INTO [{self.db_manager.data_schema}].[{table_name}] ({insert_column_list}) "
+                f"INSERT INTO [{self.db_manager.data_schema}].[{target_table}]{table_hint} ({insert_column_list}) "
                 f"SELECT {select_column_list} FROM [{self.db_manager.data_schema}].[{stage_table_name}]"
             )
 
             yield f"Transferring {len(insert_columns)} matching columns from stage to main table"
-            cursor.execute(insert_sql)
-            final_rows = cursor.rowcount
+            if load_mode == "upsert":
+                merged = self.db_manager.merge_stage_into_main(
+                    connection, table_name, stage_table_name, key_columns, insert_columns, select_columns
+                )
+                final_rows = merged['updated'] + merged['inserted']
+                yield f"Upsert applied: {merged['updated']} rows updated, {merged['inserted']} rows inserted (existing rows: {existing_rows})"
+            elif use_delta:
+                delta = self.db_manager.apply_row_hash_delta(
+                    connection, table_name, stage_table_name, insert_column_list, select_column_list
+                )
+                final_rows = delta['deleted'] + delta['inserted']
+                yield f"Delta applied: {delta['deleted']} rows deleted, {delta['inserted']} rows inserted (existing rows: {existing_rows})"
+            elif self.transfer_chunk_rows and self._STAGE_ROW_COLUMN in stage_cols:
+                # Slices keep each transaction (and its locks and log) bounded; readers of the
+                # main table are only blocked for one slice at a time
+                if self.heap_stage:
+                    self.db_manager.ensure_clustered_index(connection, stage_table_name, self._STAGE_ROW_COLUMN)
+                move_total = self.db_manager.get_row_count(connection, stage_table_name)
+                cursor.execute(
+                    f"SELECT MIN([{self._STAGE_ROW_COLUMN}]), MAX([{self._STAGE_ROW_COLUMN}]) "
+                    f"FROM [{self.db_manager.data_schema}].[{stage_table_name}]"
+                )
+                low, high = cursor.fetchone()
+                final_rows = 0
+                slices = 0
+                prog.mark_moving(progress_key, 0, move_total)
+                slice_start = low
+                while slice_start is not None and slice_start <= high:
+                    if progress_key and prog.is_canceled(progress_key):
+                        yield f"Cancellation requested - stopping after {final_rows} rows moved to main table"
+                        raise Exception("Ingestion canceled by user")
+                    slice_end = slice_start + self.transfer_chunk_rows - 1
+                    cursor.execute(insert_sql + f" WHERE [{self._STAGE_ROW_COLUMN}] BETWEEN ? AND ?", slice_start, slice_end)
+                    final_rows += max(cursor.rowcount, 0)
+                    connection.commit()
+                    slices += 1
+                    prog.mark_moving(progress_key, final_rows, move_total)
+                    if slices % max(1, self.progress_batch_interval) == 0:
+                        yield f"Moved {final_rows}/{move_total} rows to main table ({slices} slices)"
+                    slice_start = slice_end + 1
+                    await asyncio.sleep(0)
+            else:
+                cursor.execute(insert_sql)
+                final_rows = cursor.rowcount
+            if use_swap:
+                t_swap = time.perf_counter()
+                switched = self.db_manager.swap_in_table(connection, table_name)
+                yield f"fullload swap: new data swapped into {table_name} by {'metadata switch' if switched else 'row copy'} ({(time.perf_counter()-t_swap):.2f}s)"
+            if file_hash:
+                # Stage rows are in the main table now; nothing left to resume
+                self.db_manager.clear_ingest_checkpoint(connection, stage_table_name)
             if load_mode == "append":
                 yield f"Data successfully appended: {final_rows} new rows ({(time.perf_counter()-t_move):.2f}s). Total rows now may be ~{existing_rows + final_rows if existing_rows else final_rows}"
             else:
@@ -480,7 +914,20 @@ class DataIngester:
                 prog.update_progress(progress_key, stage='moved_main')
 
             # Create backup after successful data changes to main table
-            if final_rows > 0:
+            skip_backup = False
+            fingerprint = None
+            if final_rows > 0 and self.skip_identical_backups:
+                t_fingerprint = time.perf_counter()
+                if self.db_manager.table_exists(connection, f"{table_base_name}_backup", self.db_manager.backup_schema):
+                    latest = self.db_manager.get_latest_backup_version(connection, table_base_name)
+                    # The content fingerprint hashes the whole main table; only take it when the row count matches
+                    if latest and latest['row_count'] == self.db_manager.get_row_count(connection, table_name):
+                        fingerprint = self.db_manager.get_table_fingerprint(connection, table_name)
+                        if latest['content_hash'] == fingerprint['content_hash'] \
+                                and latest['row_count'] == fingerprint['row_count']:
+                            skip_backup = True
+                            yield f"Main table content is identical to backup version {latest['version_id']} ({fingerprint['row_count']} rows) - skipping backup ({(time.perf_counter()-t_fingerprint):.2f}s)"
+            if final_rows > 0 and not skip_backup:
                 yield f"Data changes detected in main table ({final_rows} rows affected), creating backup..."
 
                 # First, create/validate backup table with schema compatibility check
@@ -505,7 +952,9 @@ class DataIngester:
                         yield f"Added missing metadata columns to backup table: {[col['column'] for col in backup_meta_actions['added']]}"
 
                 # Backup the current main table data AFTER successful data transfer
-                backup_rows = self.db_manager.backup_existing_data(connection, table_name, table_base_name)
+                backup_rows = self.db_manager.backup_existing_data(
+                    connection, table_name, table_base_name, fingerprint, snapshot_interval=self.backup_snapshot_interval
+                )
                 yield f"Current main table state backed up: {backup_rows} rows with version tracking"
 
             # Check for cancellation before archiving
@@ -583,57 +1032,79 @@ class DataIngester:
             if target_schema and 'original_data_schema' in locals():
                 self.db_manager.data_schema = original_data_schema
             if connection:
+                self.db_manager.end_metadata_cache(connection)
                 connection.close()
 
+    def _build_read_csv_kwargs(self, csv_format: Dict[str, Any]) -> Dict[str, Any]:
+        """Translate csv_format settings into pandas.read_csv keyword arguments"""
+        # Extract format parameters
+        delimiter = csv_format.get("column_delimiter", ",")
+        text_qualifier = csv_format.get("text_qualifier", '"')
+        skip_lines = csv_format.get("skip_lines", 0)
+
+        # Handle row delimiter (pandas uses lineterminator)
+        row_delimiter = csv_format.get("row_delimiter", "\n")
+
+        # Pandas only supports single-character line terminators
+        # Map complex delimiters to standard ones
+        if len(row_delimiter) > 1 or row_delimiter in ['|""\\r\\n', '\\r\\n', '\\n', '\\r']:
+            if '\\r\\n' in row_delimiter or '\r\n' in row_delimiter:
+                row_delimiter = "\r\n"
+            elif '\\n' in row_delimiter or '\n' in row_delimiter:
+                row_delimiter = "\n"
+            elif '\\r' in row_delimiter or '\r' in row_delimiter:
+                row_delimiter = "\r"
+            else:
+                row_delimiter = "\n"  # Safe fallback
+
+        # Read CSV with pandas
+        # For complex row delimiters, let pandas auto-detect line endings
+        pandas_kwargs = {
+            'sep': delimiter,
+            'quotechar': text_qualifier if text_qualifier else None,
+            'skiprows': skip_lines,
+            'dtype': str,  # Read everything as string
+            'keep_default_na': False,  # Don't convert empty strings to NaN
+            'na_values': [],  # Don't convert anything to NaN
+            'encoding': 'utf-8'
+        }
+
+        # Only set lineterminator for simple single-character delimiters
+        if len(row_delimiter) == 1 and row_delimiter in ['\n', '\r']:
+            pandas_kwargs['lineterminator'] = row_delimiter
+        return pandas_kwargs
+
     async def _read_csv_file(self, file_path: str, csv_format: Dict[str, Any], progress_key: str = None) -> pd.DataFrame:
         """Read CSV file with specified format parameters"""
         try:
-            # Extract format parameters
-            delimiter = csv_format.get("column_delimiter", ",")
-            text_qualifier = csv_format.get("text_qualifier", '"')
-            skip_lines = csv_format.get("skip_lines", 0)
-
-            # Handle row delimiter (pandas uses lineterminator)
-            row_delimiter = csv_format.get("row_delimiter", "\n")
-
-            # Pandas only supports single-character line terminators
-            # Map complex delimiters to standard ones
-            if len(row_delimiter) > 1 or row_delimiter in ['|""\\r\\n', '\\r\\n', '\\n', '\\r']:
-                if '\\r\\n' in row_delimiter or '\r\n' in row_delimiter:
-                    row_delimiter = "\r\n"
-                elif '\\n' in row_delimiter or '\n' in row_delimiter:
-                    row_delimiter = "\n"
-                elif '\\r' in row_delimiter or '\r' in row_delimiter:
-                    row_delimiter = "\r"
+            df = None
+            if self.csv_engine == 'pyarrow':
+                if pa_csv is None:
+                    await self.logger.log_warning(
+                        "csv_engine",
+                        "csv_engine is 'pyarrow' but pyarrow is not installed; reading with pandas"
+                    )
+                elif not self._arrow_supports_format(csv_format):
+                    await self.logger.log_warning(
+                        "csv_engine",
+                        "pyarrow needs single-character column delimiter and text qualifier; reading with pandas"
+                    )
                 else:
-                    row_delimiter = "\n"  # Safe fallback
-
-            # Read CSV with pandas
-            # For complex row delimiters, let pandas auto-detect line endings
-            pandas_kwargs = {
-                'sep': delimiter,
-                'quotechar': text_qualifier if text_qualifier else None,
-                'skiprows': skip_lines,
-                'dtype': str,  # Read everything as string
-                'keep_default_na': False,  # Don't convert empty strings to NaN
-                'na_values': [],  # Don't convert anything to NaN
-                'encoding': 'utf-8'
-            }
+                    df = await asyncio.to_thread(self._read_csv_arrow, file_path, csv_format)
 
-            # Only set lineterminator for simple single-character delimiters
-            if len(row_delimiter) == 1 and row_delimiter in ['\n', '\r']:
-                pandas_kwargs['lineterminator'] = row_delimiter
+            if df is None:
+                pandas_kwargs = self._build_read_csv_kwargs(csv_format)
 
-            try:
-                df = pd.read_csv(file_path, **pandas_kwargs)
-            except Exception as e:
-                # Fallback: if multi-character (or problematic) line terminator slipped through
-                # or pandas raises the specific ValueError, retry without lineterminator so it auto-detects
-                if 'Only length-1 line terminators supported' in str(e):
-                    pandas_kwargs.pop('lineterminator', None)
+                try:
                     df = pd.read_csv(file_path, **pandas_kwargs)
-                else:
-                    raise
+                except Exception as e:
+                    # Fallback: if multi-character (or problematic) line terminator slipped through
+                    # or pandas raises the specific ValueError, retry without lineterminator so it auto-detects
+                    if 'Only length-1 line terminators supported' in str(e):
+                        pandas_kwargs.pop('lineterminator', None)
+                        df = pd.read_csv(file_path, **pandas_kwargs)
+                    else:
+                        raise
 
             # Handle trailer removal immediately after successful CSV read
             has_trailer = csv_format.get('has_trailer', False)
@@ -682,6 +1153,199 @@ class DataIngester:
 
             raise Exception(f"Failed to read CSV file {file_path}: {str(e)}")
 
+    def _arrow_supports_format(self, csv_format: Dict[str, Any]) -> bool:
+        """pyarrow only parses single-character delimiters and quote characters."""
+        delimiter = csv_format.get("column_delimiter", ",")
+        text_qualifier = csv_format.get("text_qualifier", '"')
+        return len(delimiter) == 1 and (not text_qualifier or len(text_qualifier) == 1)
+
+    def _read_csv_arrow(self, file_path: str, csv_format: Dict[str, Any]) -> pd.DataFrame:
+        """Read the whole CSV with the multi-threaded pyarrow parser into Arrow-backed string columns.
+        Mirrors _build_read_csv_kwargs: every column is a string, nothing becomes NaN, skip_lines
+        rows precede the header and duplicate headers get pandas-style '.N' suffixes.
+        Line endings (\n, \r\n, \r) are detected by the parser; the trailer is left to the caller."""
+        delimiter = csv_format.get("column_delimiter", ",")
+        text_qualifier = csv_format.get("text_qualifier", '"')
+        skip_lines = int(csv_format.get("skip_lines", 0) or 0)
+
+        # Arrow infers column types from the data; read the header first to pin them all to string
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            for _ in range(skip_lines):
+                f.readline()
+            header_reader = csv.reader(
+                f,
+                delimiter=delimiter,
+                quotechar=text_qualifier or '"',
+                quoting=csv.QUOTE_MINIMAL if text_qualifier else csv.QUOTE_NONE
+            )
+            headers = next(header_reader, [])
+
+        table = pa_csv.read_csv(
+            file_path,
+            read_options=pa_csv.ReadOptions(skip_rows=skip_lines, use_threads=True, encoding='utf8'),
+            parse_options=pa_csv.ParseOptions(
+                delimiter=delimiter,
+                quote_char=text_qualifier if text_qualifier else False,
+                # Qualified values may span lines, as the pandas parser allows
+                newlines_in_values=bool(text_qualifier)
+            ),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={name: pa.string() for name in headers},
+                null_values=[],
+                strings_can_be_null=False,
+                quoted_strings_can_be_null=False
+            )
+        )
+
+        names = []
+        used = set()
+        for name in table.column_names:
+            candidate, suffix = name, 0
+            while candidate in used:
+                suffix += 1
+                candidate = f"{name}.{suffix}"
+            used.add(candidate)
+            names.append(candidate)
+        if names != table.column_names:
+            table = table.rename_columns(names)
+
+        return table.to_pandas(types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+
+    def _iter_csv_chunks(self, file_path: str, csv_format: Dict[str, Any], chunk_rows: int = None) -> Iterator[pd.DataFrame]:
+        """Yield the CSV file as DataFrames of at most chunk_rows rows (same format handling as _read_csv_file).
+        With has_trailer, one chunk is held back so the trailer row can be dropped from the final chunk."""
+        pandas_kwargs = self._build_read_csv_kwargs(csv_format)
+        pandas_kwargs['chunksize'] = chunk_rows or self.chunk_rows
+        has_trailer = csv_format.get('has_trailer', False)
+        try:
+            try:
+                reader = pd.read_csv(file_path, **pandas_kwargs)
+            except Exception as e:
+                if 'Only length-1 line terminators supported' in str(e):
+                    pandas_kwargs.pop('lineterminator', None)
+                    reader = pd.read_csv(file_path, **pandas_kwargs)
+                else:
+                    raise
+
+            with reader:
+                pending = None
+                for chunk in reader:
+                    if not has_trailer:
+                        if len(chunk) > 0:
+                            yield chunk
+                        continue
+                    if pending is not None and len(pending) > 0:
+                        yield pending
+                    pending = chunk
+                if pending is not None:
+                    pending = pending.iloc[:-1]  # Remove last row (trailer)
+                    if len(pending) > 0:
+                        yield pending
+        except Exception as e:
+            raise Exception(f"Failed to read CSV file {file_path}: {str(e)}")
+
+    def _normalize_frame(self, df: pd.DataFrame, valid_headers: List[tuple]) -> pd.DataFrame:
+        """Select the valid columns under their sanitized names with values normalized to strings."""
+        column_mapping = {orig: san for orig, san in valid_headers}
+        df_processed = df[list(column_mapping.keys())].rename(columns=column_mapping)
+
+        for col in df_processed.columns:
+            df_processed[col] = df_processed[col].astype(str).replace({'nan':'','None':''})
+        return df_processed
+
+    async def _sequential_chunks(self, first_chunk: pd.DataFrame, chunk_iter: Iterator[pd.DataFrame],
+                                 valid_headers: List[tuple]) -> AsyncIterator[pd.DataFrame]:
+        """Yield normalized chunks, reading the next one only after the caller has loaded the current one."""
+        chunk, first_chunk = first_chunk, None
+        while chunk is not None:
+            frame = self._normalize_frame(chunk, valid_headers)
+            chunk = None
+            yield frame
+            frame = None
+            chunk = next(chunk_iter, None)
+
+    async def _pipelined_chunks(self, first_chunk: pd.DataFrame, chunk_iter: Iterator[pd.DataFrame],
+                                valid_headers: List[tuple], progress_key: str = None) -> AsyncIterator[pd.DataFrame]:
+        """Yield normalized chunks produced by a background thread through a bounded queue.
+        The thread parses and normalizes the next chunks while the caller inserts the current one;
+        pipeline_queue_depth caps how many parsed chunks wait in memory. Parse errors are re-raised here."""
+        chunk_queue = queue.Queue(maxsize=self.pipeline_queue_depth)
+        stop = threading.Event()
+        done = object()
+
+        def put(item) -> bool:
+            # Block while the queue is full, but give up once the consumer has gone away
+            while not stop.is_set():
+                try:
+                    chunk_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            parsed = 0
+            chunk = pending.pop()
+            try:
+                while chunk is not None:
+                    frame = self._normalize_frame(chunk, valid_headers)
+                    chunk = None
+                    parsed += len(frame)
+                    if progress_key:
+                        prog.update_progress(progress_key, parsed=parsed)
+                    if not put(frame):
+                        return
+                    frame = None
+                    if progress_key and prog.is_canceled(progress_key):
+                        break
+                    chunk = next(chunk_iter, None)
+                put(done)
+            except Exception as e:
+                put(e)
+            finally:
+                close = getattr(chunk_iter, 'close', None)
+                if close:
+                    close()
+
+        # Handed over through a list so the thread drops its reference once the chunk is normalized
+        pending = [first_chunk]
+        first_chunk = None
+        producer = threading.Thread(target=produce, name=f"ingest-parse-{progress_key}", daemon=True)
+        producer.start()
+        try:
+            while True:
+                try:
+                    item = await asyncio.to_thread(chunk_queue.get, True, 0.5)
+                except queue.Empty:
+                    if not producer.is_alive() and chunk_queue.empty():
+                        raise Exception("CSV parser thread stopped without finishing the file")
+                    continue
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                item = None
+        finally:
+            stop.set()
+            await asyncio.to_thread(producer.join)
+
+    _FINGERPRINT_BLOCK = 1024 * 1024
+
+    def _file_fingerprint(self, file_path: str) -> str:
+        """
+        SHA-256 over the file size, modification time and its first and last 1 MiB, used to match a
+        resume to its checkpoint. Reads at most 2 MiB, so taking it costs the same for any file size.
+        """
+        stat = os.stat(file_path)
+        digest = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+        with open(file_path, 'rb') as f:
+            digest.update(f.read(self._FINGERPRINT_BLOCK))
+            if stat.st_size > self._FINGERPRINT_BLOCK:
+                f.seek(max(self._FINGERPRINT_BLOCK, stat.st_size - self._FINGERPRINT_BLOCK))
+                digest.update(f.read(self._FINGERPRINT_BLOCK))
+        return digest.hexdigest()
+
     def _sanitize_headers(self, headers: List[str]) -> List[str]:
         """Sanitize column headers to be valid SQL identifiers"""
         sanitized = []
@@ -731,6 +1395,31 @@ class DataIngester:
                 result.append(new_name)
         return result
 
+    def _resolve_key_columns(self, key_columns, valid_headers: List[tuple]) -> List[str]:
+        """Map upsert key columns (a list or comma-separated string of file headers, original or sanitized)
+        to sanitized column names. Raises ValueError when none are given or one is not in the file."""
+        if isinstance(key_columns, str):
+            key_columns = key_columns.split(',')
+        requested = [str(k).strip() for k in (key_columns or []) if str(k).strip()]
+        if not requested:
+            raise ValueError("upsert mode requires key columns (key_columns in the format file or form)")
+
+        lookup = {}
+        for orig, san in valid_headers:
+            lookup.setdefault(str(orig).strip().lower(), san)
+            lookup.setdefault(san.lower(), san)
+        resolved = []
+        missing = []
+        for key in requested:
+            san = lookup.get(key.lower())
+            if san is None:
+                missing.append(key)
+            elif san not in resolved:
+                resolved.append(san)
+        if missing:
+            raise ValueError(f"Key columns not found in file: {missing}")
+        return resolved
+
     def _infer_types(self, sample_df: pd.DataFrame, columns: List[str]) -> Dict[str, str]:
         """Determine varchar lengths from sample dataframe (all columns as varchar only)."""
         inferred = {}
@@ -759,17 +1448,256 @@ class DataIngester:
             inferred[col] = f'varchar({size})' if size != 'MAX' else 'varchar(MAX)'
         return inferred
 
-    def _persist_inferred_schema(self, fmt_file_path: str, inferred_map: Dict[str, str]) -> None:
-        """append inferred schema info into existing .fmt file under key inferred_schema."""
+    def _profile_columns(self, df: pd.DataFrame, valid_headers: List[tuple]) -> Dict[str, Dict[str, int]]:
+        """Exact per-column stats over every row of df, keyed by sanitized name.
+        Values are measured as they will be loaded (stripped, null tokens excluded):
+        max_bytes is the longest UTF-8 encoded value, nulls the count of NULL values."""
+        profile = {}
+        for orig, san in valid_headers:
+            stripped, null_mask = self._strip_and_null_mask(df[orig])
+            values = stripped[~null_mask]
+            lengths = values.str.len()
+            # Character count equals byte count unless the value has non-ASCII characters
+            non_ascii = values.str.contains(r'[^\x00-\x7f]', regex=True)
+            if non_ascii.any():
+                lengths[non_ascii] = values[non_ascii].str.encode('utf-8').str.len()
+            profile[san] = {
+                'rows': len(df),
+                'nulls': int(null_mask.sum()),
+                'max_bytes': int(lengths.max()) if len(lengths) else 0,
+            }
+        return profile
+
+    def _profile_file(self, file_path: str, csv_format: Dict[str, Any], valid_headers: List[tuple]) -> Dict[str, Dict[str, int]]:
+        """_profile_columns over the whole file, one chunk at a time."""
+        profile = {}
+        for chunk in self._iter_csv_chunks(file_path, csv_format):
+            for san, stats in self._profile_columns(chunk, valid_headers).items():
+                total = profile.setdefault(san, {'rows': 0, 'nulls': 0, 'max_bytes': 0})
+                total['rows'] += stats['rows']
+                total['nulls'] += stats['nulls']
+                total['max_bytes'] = max(total['max_bytes'], stats['max_bytes'])
+        return profile
+
+    def _size_columns(self, profile: Dict[str, Dict[str, int]]) -> Dict[str, str]:
+        """varchar type per profiled column: max_bytes plus width_headroom, at least width_min.
+        Anything over the 8000-byte in-row limit becomes varchar(MAX)."""
+        inferred = {}
+        for col, stats in profile.items():
+            size = max(self.width_min, math.ceil(stats['max_bytes'] * (1 + self.width_headroom)))
+            inferred[col] = f'varchar({size})' if size <= 8000 else 'varchar(MAX)'
+        return inferred
+
+    def _detect_column_types(self, sample_df: pd.DataFrame, columns: List[str]) -> Dict[str, str]:
+        """Typed SQL Server column for each column whose non-null sample values fit one; others are omitted.
+        Integers (no leading zeros, so codes like '007' stay text) become int, bigint or decimal(p,0);
+        decimals become decimal(p,s). ISO dates ('YYYY-MM-DD', optionally with a time) become date or
+        datetime2 when at least date_threshold of the values are valid calendar dates."""
+        typed = {}
+        for col in columns:
+            stripped, null_mask = self._strip_and_null_mask(sample_df[col])
+            values = stripped[~null_mask]
+            if values.empty:
+                continue
+
+            if values.str.fullmatch(self._INT_PATTERN).all():
+                digits = int(values.str.lstrip('+-').str.len().max())
+                if digits <= 18:
+                    numbers = values.astype('int64')
+                    fits_int = numbers.min() >= -2**31 and numbers.max() < 2**31
+                    typed[col] = 'int' if fits_int else 'bigint'
+                elif digits <= 38:
+                    typed[col] = f'decimal({digits},0)'
+                continue
+
+            if values.str.fullmatch(self._DECIMAL_PATTERN).all():
+                parts = values.str.lstrip('+-').str.partition('.')
+                scale = int(parts[2].str.len().max())
+                precision = max(1, int(parts[0].str.len().max())) + scale
+                if precision <= 38:
+                    typed[col] = f'decimal({precision},{scale})'
+                continue
+
+            fields = values.str.extract(f'^{self._DATETIME_PATTERN}$').astype(float)
+            year, month, day = fields[0], fields[1], fields[2]
+            leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+            month_days = month.map({1: 31, 2: 28, 3: 31, 4: 30, 5: 31, 6: 30, 7: 31, 8: 31, 9: 30, 10: 31, 11: 30, 12: 31})
+            month_days = month_days + (leap & (month == 2)).astype(int)
+            valid = (year >= 1) & (day >= 1) & (day <= month_days)
+            has_time = fields[3].notna()
+            valid &= ~has_time | ((fields[3] < 24) & (fields[4] < 60) & ~(fields[5] >= 60))
+            if valid.mean() >= self.date_parse_threshold:
+                typed[col] = 'datetime2' if (has_time & valid).any() else 'date'
+        return typed
+
+    def _persist_inferred_schema(self, fmt_file_path: str, inferred_map: Dict[str, str],
+                                 profile: Dict[str, Dict[str, int]] = None) -> None:
+        """append inferred schema info into existing .fmt file under key inferred_schema
+        (and the width profile, with null ratios, under column_profile)."""
         import json
         if not os.path.exists(fmt_file_path):
             return
         with open(fmt_file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
         data['inferred_schema'] = inferred_map
+        if profile is not None:
+            data['column_profile'] = {
+                col: {
+                    'max_bytes': stats['max_bytes'],
+                    'null_ratio': round(stats['nulls'] / stats['rows'], 4) if stats['rows'] else 0.0,
+                }
+                for col, stats in profile.items()
+            }
         with open(fmt_file_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2)
 
+    def _strip_and_null_mask(self, series: pd.Series) -> tuple:
+        """Stripped string values of series and the mask of those loaded as NULL
+        (missing, empty, or 'none'/'nan'/'null' in any case)."""
+        stripped = series.astype(str).str.strip()
+        null_mask = series.isna() | stripped.eq('') | stripped.str.lower().isin(['none', 'nan', 'null'])
+        return stripped, null_mask
+
+    def _prepare_rows(self, df: pd.DataFrame, load_timestamp: datetime, load_type: str) -> List[tuple]:
+        """Build bind-ready row tuples from df with column-wise string operations.
+        Values are stripped; empty strings and 'none'/'nan'/'null' (any case) become NULL.
+        The static load timestamp and load type are appended to every row."""
+        columns = []
+        for col in df.columns:
+            stripped, null_mask = self._strip_and_null_mask(df[col])
+            columns.append(stripped.astype(object).where(~null_mask, None).tolist())
+        row_count = len(df)
+        return list(zip(*columns, repeat(load_timestamp, row_count), repeat(load_type, row_count)))
+
+    def _execute_batch(self, cursor, engine: str, insert_sql: str, batch_rows: List[tuple],
+                       input_sizes: List[tuple] | None = None, tvp_sql: str | None = None,
+                       tvp_objects: Dict[str, str] | None = None) -> None:
+        """Send one prepared batch with the given engine (no fallback; the caller handles errors).
+        A row-by-row failure carries the failing row's position in the batch as batch_row."""
+        if engine == 'tvp':
+            cursor.execute(tvp_sql, ([tvp_objects['type'], tvp_objects['schema']] + batch_rows,))
+        elif engine == 'executemany':
+            cursor.fast_executemany = True
+            if input_sizes:
+                cursor.setinputsizes(input_sizes)
+            cursor.executemany(insert_sql, batch_rows)
+        else:
+            for pos, row_values in enumerate(batch_rows):
+                try:
+                    cursor.execute(insert_sql, row_values)
+                except Exception as e:
+                    # Tell the caller which row of the batch failed
+                    e.batch_row = pos
+                    raise
+
+    async def _load_ranges_parallel(
+        self,
+        df: pd.DataFrame,
+        workers: int,
+        effective_batch: int,
+        engine: str,
+        insert_sql: str,
+        input_sizes: List[tuple] | None,
+        tvp_sql: str | None,
+        tvp_objects: Dict[str, str] | None,
+        load_timestamp: datetime,
+        load_type: str,
+        progress_key: str | None = None,
+        row_offset: int = 0
+    ) -> tuple:
+        """Insert df over `workers` pooled connections, one contiguous row range per worker.
+        Each worker commits per batch and checks for cancellation before every batch; the first
+        worker error stops the others and is re-raised once all workers have returned their
+        connections. Returns (rows inserted, batches committed)."""
+        total = len(df)
+        bounds = [total * i // workers for i in range(workers + 1)]
+        stop = threading.Event()
+        tally_lock = threading.Lock()
+        worker_inserted = [0] * workers
+        batch_counts = [0] * workers
+
+        def load_range(worker_id: int, start: int, end: int) -> None:
+            connection = self.db_manager.get_pooled_connection()
+            try:
+                cursor = connection.cursor()
+                connection.autocommit = False
+                pos = start
+                while pos < end:
+                    if stop.is_set() or (progress_key and prog.is_canceled(progress_key)):
+                        break
+                    batch_end = min(pos + effective_batch, end)
+                    batch_rows = self._prepare_rows(df.iloc[pos:batch_end], load_timestamp, load_type)
+                    try:
+                        self._execute_batch(cursor, engine, insert_sql, batch_rows, input_sizes, tvp_sql, tvp_objects)
+                        connection.commit()
+                    except Exception as e:
+                        stop.set()
+                        try:
+                            connection.rollback()
+                        except Exception:
+                            pass
+                        raise Exception(f"Worker {worker_id} failed at rows {pos}-{batch_end - 1}: {str(e)}")
+                    with tally_lock:
+                        worker_inserted[worker_id] += batch_end - pos
+                        batch_counts[worker_id] += 1
+                        if progress_key:
+                            prog.update_progress(
+                                progress_key,
+                                inserted=row_offset + sum(worker_inserted),
+                                worker_inserted=list(worker_inserted),
+                                stage='inserting'
+                            )
+                    pos = batch_end
+            finally:
+                try:
+                    connection.autocommit = True
+                except Exception:
+                    pass
+                self.db_manager.release_connection(connection)
+
+        await self.logger.log_info(
+            "bulk_insert",
+            f"Parallel {engine} insert: {total} rows over {workers} connections"
+        )
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"ingest-load-{progress_key}") as executor:
+            results = await asyncio.gather(
+                *[loop.run_in_executor(executor, load_range, i, bounds[i], bounds[i + 1]) for i in range(workers)],
+                return_exceptions=True
+            )
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            raise errors[0]
+        return sum(worker_inserted), sum(batch_counts)
+
+    def _get_input_sizes(self, connection, table_name: str, schema: str, insert_columns: List[str]) -> List[tuple] | None:
+        """Derive pyodbc setinputsizes() descriptors from the stage table's column widths.
+        Returns None when the table definition cannot be read so the driver falls back to its defaults."""
+        try:
+            table_columns = {
+                c['name'].lower(): c
+                for c in self.db_manager.get_table_columns(connection, table_name, schema)
+            }
+        except Exception:
+            return None
+
+        input_sizes = []
+        for col in insert_columns:
+            if col == 'ref_data_loadtime':
+                input_sizes.append((pyodbc.SQL_TYPE_TIMESTAMP, 23, 3))
+                continue
+            col_info = table_columns.get(col.lower())
+            if col_info is None:
+                return None
+            max_length = col_info.get('max_length')
+            if isinstance(max_length, int) and max_length > 0:
+                input_sizes.append((pyodbc.SQL_VARCHAR, max_length, 0))
+            else:
+                # varchar(MAX) (max_length -1): size 0 streams the value instead of
+                # allocating a full-width parameter buffer for every row
+                input_sizes.append((pyodbc.SQL_VARCHAR, 0, 0))
+        return input_sizes
+
     async def _load_dataframe_to_table(
         self,
         connection,
@@ -779,15 +1707,28 @@ class DataIngester:
         total_rows: int,
         progress_key: str | None = None,
         load_type: str = 'F',
-        static_load_timestamp: datetime | None = None
+        static_load_timestamp: datetime | None = None,
+        load_engine: str | None = None,
+        truncate: bool = True,
+        row_offset: int = 0,
+        heap: bool | None = None,
+        checkpoint: str | None = None
     ) -> None:
+        """Insert df into the stage table in batches.
+        truncate=False appends to rows already loaded (streaming chunks); row_offset is the
+        number of rows loaded by earlier chunks and is added to the reported progress.
+        heap (defaults to ingest.heap_stage) inserts WITH (TABLOCK) and commits every
+        heap_commit_rows rows; a failed batch then aborts the load instead of falling back.
+        checkpoint is the file fingerprint; when set, the committed row count (including row_offset)
+        is saved to Ingest_Checkpoint in the same transaction as each commit."""
         try:
             cursor = connection.cursor()
 
             # Clear stage table first - use dynamic SQL with proper quoting
-            truncate_sql = "TRUNCATE TABLE [" + schema + "].[" + table_name + "]"
-            cursor.execute(truncate_sql)
-            connection.commit()
+            if truncate:
+                truncate_sql = "TRUNCATE TABLE [" + schema + "].[" + table_name + "]"
+                cursor.execute(truncate_sql)
+                connection.commit()
 
             # Check for cancellation after table truncation
             if progress_key and prog.is_canceled(progress_key):
@@ -802,32 +1743,80 @@ class DataIngester:
             # Insert explicit static ref_data_loadtime plus ref_data_loadtype
             insert_columns = data_columns + ['ref_data_loadtime', 'ref_data_loadtype']
             column_list = ', '.join([f'[{col}]' for col in insert_columns])
+            heap_mode = self.heap_stage if heap is None else heap
+            table_hint = " WITH (TABLOCK)" if heap_mode else ""
+            insert_sql = f"INSERT INTO [{schema}].[{table_name}]{table_hint} ({column_list}) VALUES ({', '.join(['?' for _ in insert_columns])})"
+            # Rows per transaction; 1 commits after every batch
+            commit_rows = self.heap_commit_rows if heap_mode else 1
             # Trailer removal is now handled before this function is called
 
+            # Engine selection: 'executemany' sends each batch as bound parameter arrays
+            # (one round trip per batch); 'tvp' passes the batch as a single table-valued
+            # parameter to sp_ref_load_<table>; 'row' executes the INSERT once per row.
+            engine = (load_engine or self.load_engine or 'executemany').lower()
+            if engine not in ('executemany', 'tvp', 'row'):
+                raise Exception(f"Unsupported load engine: {engine}")
+            input_sizes = None
+            if engine == 'executemany':
+                input_sizes = self._get_input_sizes(connection, table_name, schema, insert_columns)
+            tvp_objects = None
+            tvp_sql = None
+            if engine == 'tvp':
+                tvp_objects = self.db_manager.get_stage_load_objects(table_name)
+                tvp_sql = "{CALL [" + tvp_objects['schema'] + "].[" + tvp_objects['procedure'] + "] (?)}"
+
             # Batch sizing
-            # SQL Server supports maximum 1000 row value expressions per VALUES clause.
-            # We intentionally cap at 990 to keep headroom and avoid edge-case failures if additional
-            # rows (e.g., metadata) were ever appended in future logic.
-            effective_batch = self.batch_size
+            # The VALUES/parameter-array paths keep the 990-row cap from __init__; a TVP
+            # batch is one parameter regardless of row count, so it uses tvp_batch_size.
+            effective_batch = self.tvp_batch_size if engine == 'tvp' else self.batch_size
             total = len(df)
+            # No more workers than there are batches to share out. Heap mode loads on one connection:
+            # each worker's TABLOCK insert would take an exclusive table lock and run one at a time,
+            # and the workers commit per batch instead of every heap_commit_rows rows
+            workers = min(self.parallel_workers, -(-total // effective_batch)) if total else 1
+            if heap_mode and workers > 1:
+                await self.logger.log_info(
+                    "bulk_insert",
+                    f"Heap staging loads on a single connection; ignoring parallel_workers={self.parallel_workers}"
+                )
+                workers = 1
+            sizer = None
+            if self.adaptive_batch and engine != 'row' and workers <= 1:
+                sizer = _BatchSizer(
+                    effective_batch,
+                    self.adaptive_min_batch,
+                    self.adaptive_max_params // len(insert_columns),
+                    self.adaptive_target_seconds
+                )
+                effective_batch = sizer.size
             start_time = time.perf_counter()
             await self.logger.log_info(
                 "bulk_insert",
-                f"Starting multi-row VALUES insert: {total} rows, batch_rows={effective_batch}"
+                f"Starting {engine} insert: {total} rows, batch_rows={effective_batch}{' (adaptive)' if sizer else ''}"
             )
             inserted = 0
             batch_count = 0
+            uncommitted = 0
+            load_timestamp = static_load_timestamp if static_load_timestamp else datetime.utcnow()
 
             # All columns are varchar - no datetime processing needed
 
-            def prepare_value(val, col_name):
-                """Prepare value for parameterized query - all columns as varchar strings"""
-                if val is None or (isinstance(val, float) and pd.isna(val)):
-                    return None
-                s = str(val).strip()
-                if s == '' or s.lower() in {'none', 'nan', 'null'}:
-                    return None
-                return s
+            if workers > 1:
+                try:
+                    inserted, batch_count = await self._load_ranges_parallel(
+                        df, workers, effective_batch, engine, insert_sql, input_sizes, tvp_sql, tvp_objects,
+                        load_timestamp, load_type, progress_key, row_offset
+                    )
+                    if progress_key and prog.is_canceled(progress_key):
+                        raise Exception("Ingestion canceled by user")
+                except Exception:
+                    # Worker ranges commit independently, so a partial parallel load has no single
+                    # committed offset; drop the checkpoint so a resume rebuilds the stage table
+                    if checkpoint:
+                        self.db_manager.clear_ingest_checkpoint(connection, table_name)
+                    raise
+                if checkpoint:
+                    self.db_manager.save_ingest_checkpoint(connection, table_name, checkpoint, row_offset + inserted)
 
             while inserted < total:
                 # Cancellation check
@@ -837,71 +1826,75 @@ class DataIngester:
                         f"Cancellation requested after {inserted} rows; stopping batch loop"
                     )
                     break
+                batch_start = time.perf_counter()
                 slice_df = df.iloc[inserted: inserted + effective_batch]
                 batch_size = len(slice_df)
 
-                # Use parameterized queries with multi-row VALUES to prevent SQL injection
-                # Create placeholders for all rows in this batch: (?,?,...), (?,?,...), (?,?,...)...
-                # Include placeholders for data columns + ref_data_loadtype (ref_data_loadtime uses DEFAULT)
-                single_row_placeholders = '(' + ', '.join(['?' for _ in insert_columns]) + ')'
-                all_rows_placeholders = ', '.join([single_row_placeholders for _ in range(batch_size)])
-                sql = f"INSERT INTO [{schema}].[{table_name}] ({column_list}) VALUES {all_rows_placeholders}"
-
-                # Flatten all row values into a single parameter list
-                batch_params = []
-                for _, row in slice_df.iterrows():
-                    row_values = [prepare_value(row[c], c) for c in data_columns]
-                    # append static ref_data_loadtime then ref_data_loadtype
-                    row_values.append(static_load_timestamp if static_load_timestamp else datetime.utcnow())
-                    row_values.append(load_type)
-                    batch_params.extend(row_values)  # Flatten into single list
-
-                # Debug: Check parameter count before execution
-                expected_params = batch_size * len(insert_columns)
-                actual_params = len(batch_params)
-                placeholder_count = sql.count('?')
-
-                if expected_params != actual_params or expected_params != placeholder_count:
-                    error_msg = f"Parameter mismatch: expected={expected_params}, actual={actual_params}, placeholders={placeholder_count}, batch_size={batch_size}, columns={len(insert_columns)}"
-                    await self.logger.log_error("parameter_mismatch", error_msg)
-                    raise Exception(error_msg)
-
-                # Temporarily use individual INSERT statements to avoid SQL Server issues
-                single_sql = f"INSERT INTO [{schema}].[{table_name}] ({column_list}) VALUES ({', '.join(['?' for _ in insert_columns])})"
+                # Build parameter rows: data columns + static ref_data_loadtime + ref_data_loadtype
+                batch_rows = self._prepare_rows(slice_df, load_timestamp, load_type)
 
                 connection.autocommit = False
-                for row_idx, row in slice_df.iterrows():
-                    row_values = []
+                while True:
                     try:
-                        for col in data_columns:
-                            value = prepare_value(row[col], col)
-                            row_values.append(value)
-                        # append static load timestamp then ref_data_loadtype
-                        row_values.append(static_load_timestamp if static_load_timestamp else datetime.utcnow())
-                        row_values.append(load_type)
-                        cursor.execute(single_sql, row_values)
-
+                        self._execute_batch(cursor, engine, insert_sql, batch_rows, input_sizes, tvp_sql, tvp_objects)
+                        break
                     except Exception as e:
-                        # Log detailed error information for debugging
-                        error_details = f"Error at row {row_idx}: {str(e)}\n"
-                        error_details += f"Column values: {dict(zip(data_columns, row_values))}\n"
-                        error_details += f"Raw row data: {dict(row)}"
-                        await self.logger.log_error("insert_row_error", error_details)
-                        raise e
-
-                connection.commit()  # Commit after each batch of rows
-                connection.autocommit = True
+                        if engine == 'row':
+                            pos = getattr(e, 'batch_row', None)
+                            if pos is not None:
+                                # Log detailed error information for debugging
+                                error_details = f"Error at row {slice_df.index[pos]}: {str(e)}\n"
+                                error_details += f"Column values: {dict(zip(data_columns, batch_rows[pos]))}\n"
+                                error_details += f"Raw row data: {dict(slice_df.iloc[pos])}"
+                                await self.logger.log_error("insert_row_error", error_details)
+                            raise
+                        try:
+                            connection.rollback()
+                        except Exception:
+                            pass
+                        if uncommitted:
+                            # The rollback also discarded earlier batches of the open transaction
+                            raise
+                        if engine == 'tvp':
+                            await self.logger.log_warning(
+                                "bulk_insert_fallback",
+                                f"Table-valued parameter insert failed at rows {inserted}-{inserted + batch_size - 1} ({str(e)}); falling back to array-bound inserts"
+                            )
+                            engine = 'executemany'
+                            input_sizes = self._get_input_sizes(connection, table_name, schema, insert_columns)
+                        else:
+                            # Driver or data problem with array binding - redo this batch row by row
+                            # (which also pinpoints the offending row) and stay on that path
+                            await self.logger.log_warning(
+                                "bulk_insert_fallback",
+                                f"Array-bound insert failed at rows {inserted}-{inserted + batch_size - 1} ({str(e)}); falling back to row-by-row inserts"
+                            )
+                            engine = 'row'
+                            # Row-by-row cost does not depend on the batch size; go back to the static one
+                            sizer = None
+                            effective_batch = min(effective_batch, self.batch_size)
+                        cursor = connection.cursor()
+
+                uncommitted += batch_size
+                if uncommitted >= commit_rows:
+                    if checkpoint:
+                        self.db_manager.save_ingest_checkpoint(connection, table_name, checkpoint, row_offset + inserted + batch_size)
+                    connection.commit()  # Commit after each batch of rows (heap mode: every heap_commit_rows)
+                    connection.autocommit = True
+                    uncommitted = 0
 
                 inserted += batch_size
                 batch_count += 1
+                current_batch = effective_batch
+                if sizer:
+                    effective_batch = sizer.record(batch_size, time.perf_counter() - batch_start)
                 if progress_key:
-                    prog.update_progress(progress_key, inserted=inserted, stage='inserting')
+                    prog.update_progress(progress_key, inserted=row_offset + inserted, stage='inserting', batch_size=current_batch)
                     # Update progress every batch for real-time feedback
                     elapsed = time.perf_counter() - start_time
                     rate = inserted / elapsed if elapsed > 0 else 0
 
                 # CRITICAL: Yield control to event loop to allow cancel requests
-                import asyncio
                 await asyncio.sleep(0)  # Yield control to FastAPI event loop
 
                 # Add small delay for demo purposes (remove in production)
@@ -917,7 +1910,10 @@ class DataIngester:
                         f"Inserted {inserted}/{total} rows ({rate:.0f} rows/s progress_key:{progress_key} prog.is_canceled:{prog.is_canceled(progress_key)})"
                     )
 
+            if checkpoint and uncommitted:
+                self.db_manager.save_ingest_checkpoint(connection, table_name, checkpoint, row_offset + inserted)
             connection.commit()
+            connection.autocommit = True
 
             if progress_key and prog.is_canceled(progress_key):
                 raise Exception("Ingestion canceled by user")
@@ -925,7 +1921,7 @@ class DataIngester:
             rate_total = inserted / elapsed_total if elapsed_total > 0 else 0
             await self.logger.log_info(
                 "bulk_insert",
-                f"VALUES insert complete: {inserted} rows in {elapsed_total:.2f}s ({rate_total:.0f} rows/s, batches={batch_count})"
+                f"{engine} insert complete: {inserted} rows in {elapsed_total:.2f}s ({rate_total:.0f} rows/s, batches={batch_count})"
             )
 
         except Exception as e:
@@ -6,8 +6,8 @@ _progress: Dict[str, Dict[str, Any]] = {}
 _cancel_flags: Dict[str, bool] = {}
 _lock = Lock()
 
-def init_progress(key: str):
-    data = {
+def _new_progress() -> Dict[str, Any]:
+    return {
         'inserted': 0,
         'total': None,
         'percent': 0.0,
@@ -16,6 +16,9 @@ def init_progress(key: str):
         'error': None,
         'canceled': False
     }
+
+def init_progress(key: str):
+    data = _new_progress()
     with _lock:
         _progress[key] = data
         _cancel_flags[key] = False
@@ -23,7 +26,9 @@ def init_progress(key: str):
 def update_progress(key: str, **kwargs):
     with _lock:
         if key not in _progress:
-            init_progress(key)
+            # _lock is not re-entrant, so initialize inline rather than via init_progress
+            _progress[key] = _new_progress()
+            _cancel_flags.setdefault(key, False)
         _progress[key].update(kwargs)
         inserted = _progress[key].get('inserted')
         total = _progress[key].get('total')
@@ -41,6 +46,10 @@ def get_progress(key: str) -> Dict[str, Any]:
 def mark_error(key: str, message: str):
     update_progress(key, error=message, done=True, stage='error', percent=100.0)
 
+def mark_moving(key: str, moved: int, total: int):
+    """Stage-to-main transfer progress (chunked transfer reports after every slice)."""
+    update_progress(key, stage='moving', moved=moved, move_total=total)
+
 def mark_done(key: str):
     update_progress(key, done=True, stage='completed', percent=100.0)
 
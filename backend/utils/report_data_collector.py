@@ -34,7 +34,7 @@ class ReportDataCollector:
         detailed_info = {}
 
         try:
-            with self.db_manager.get_connection() as connection:
+            with self.db_manager.pooled_connection() as connection:
                 # 1. Table Structure Information
                 detailed_info['table_columns'] = self._get_table_structure(
                     connection, table_name, schema_name
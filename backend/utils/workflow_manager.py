@@ -6,7 +6,9 @@ Orchestrates Excel workflow states and coordinates with processing pipeline
 import os
 import uuid
 import logging
-from typing import Dict, Any, Optional, List
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Set
 from datetime import datetime, timedelta
 from pathlib import Path
 import json
@@ -17,6 +19,9 @@ from .logger import Logger
 class WorkflowManager:
     """Manages Excel workflow lifecycle and state transitions (using legacy database field names)"""
 
+    # Cached statement cursors; the least recently used one is closed beyond this
+    MAX_CACHED_STATEMENTS = 16
+
     def __init__(self, db_manager: Optional[DatabaseManager] = None, logger: Optional[Logger] = None):
         """Initialize the workflow manager"""
         self.db_manager = db_manager or DatabaseManager()
@@ -36,6 +41,12 @@ class WorkflowManager:
         # In-memory workflow tracking for active workflows
         self.active_workflows = {}  # {workflow_id: WorkflowState}
 
+        # Long-lived pooled connection with one cursor per statement text, so pyodbc keeps each
+        # statement prepared across monitor cycles instead of reconnecting per call
+        self._connection = None
+        self._statements = OrderedDict()  # {sql: cursor}, least recently used first
+        self._connection_lock = threading.RLock()
+
         # Initialize database schema if needed
         self._ensure_workflow_table()
 
@@ -60,10 +71,7 @@ class WorkflowManager:
             )
             """
 
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(create_table_sql)
-                conn.commit()
+            self._execute(create_table_sql)
 
             self.logger.info("Excel workflow tracking table ensured")
 
@@ -71,6 +79,83 @@ class WorkflowManager:
             self.logger.error(f"Failed to create workflow tracking table: {str(e)}")
             raise
 
+    def _checkout_connection(self):
+        """Check out the manager's pooled connection on first use and keep it for later calls"""
+        if self._connection is None:
+            self._connection = self.db_manager.get_pooled_connection()
+        return self._connection
+
+    def _reset_connection(self):
+        """Drop cached statements and hand the connection back to the pool (discarded there if broken)"""
+        for cursor in self._statements.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._statements = OrderedDict()
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            self.db_manager.release_connection(connection)
+
+    def _statement_cursor(self, connection, sql: str):
+        """Cached cursor for sql, created on first use; closes the least recently used one past the limit"""
+        cursor = self._statements.get(sql)
+        if cursor is not None:
+            self._statements.move_to_end(sql)
+            return cursor
+        cursor = connection.cursor()
+        self._statements[sql] = cursor
+        if len(self._statements) > self.MAX_CACHED_STATEMENTS:
+            _, evicted = self._statements.popitem(last=False)
+            try:
+                evicted.close()
+            except Exception:
+                pass
+        return cursor
+
+    def _execute(self, sql: str, params=None, handler=None, batch: bool = False):
+        """
+        Run a statement on the cached cursor for its SQL text and return handler(cursor) (or the cursor).
+        A batch executes params as a list of parameter rows in one transaction. A connection held over
+        from an earlier call that fails before the statement is sent is replaced and the call retried
+        once; a failed SELECT is retried the same way. Other statements are never re-run, since the
+        first attempt may already have been applied.
+        """
+        retry_on_execute = not batch and sql.lstrip().upper().startswith('SELECT')
+        with self._connection_lock:
+            for attempt in range(2):
+                reused = self._connection is not None
+                sent = False
+                try:
+                    connection = self._checkout_connection()
+                    cursor = self._statement_cursor(connection, sql)
+                    sent = True
+                    if batch:
+                        cursor.fast_executemany = True
+                        connection.autocommit = False
+                        try:
+                            cursor.executemany(sql, params)
+                            connection.commit()
+                        except Exception:
+                            connection.rollback()
+                            raise
+                        finally:
+                            connection.autocommit = True
+                    elif params is None:
+                        cursor.execute(sql)
+                    else:
+                        cursor.execute(sql, params)
+                    return handler(cursor) if handler else cursor
+                except Exception:
+                    self._reset_connection()
+                    if not reused or attempt or (sent and not retry_on_execute):
+                        raise
+
+    def close(self):
+        """Return the pooled connection held by this manager"""
+        with self._connection_lock:
+            self._reset_connection()
+
     def create_workflow(self, csv_path: str) -> str:
         """
         Create new Excel workflow for a CSV file
@@ -91,15 +176,12 @@ class WorkflowManager:
             VALUES (?, ?, ?, ?)
             """
 
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(insert_sql, (
-                    workflow_id,
-                    csv_path,
-                    self.STATES['PENDING_EXCEL'],
-                    datetime.now()
-                ))
-                conn.commit()
+            self._execute(insert_sql, (
+                workflow_id,
+                csv_path,
+                self.STATES['PENDING_EXCEL'],
+                datetime.now()
+            ))
 
             # Add to active workflows
             self.active_workflows[workflow_id] = {
@@ -132,69 +214,16 @@ class WorkflowManager:
             True if update successful
         """
         try:
-            if status not in self.STATES.values():
-                raise ValueError(f"Invalid workflow status: {status}")
-
-            # Build update query dynamically based on provided kwargs
-            update_fields = ['status = ?']
-            update_values = [status]
-
-            # Add timestamp fields based on status
-            if status == self.STATES['EXCEL_GENERATED']:
-                update_fields.append('excel_generated_at = ?')
-                update_values.append(datetime.now())
-            elif status == self.STATES['APPROVED']:
-                update_fields.append('approved_at = ?')
-                update_values.append(datetime.now())
-            elif status == self.STATES['COMPLETED']:
-                update_fields.append('completed_at = ?')
-                update_values.append(datetime.now())
-
-            # Add optional fields
-            field_mapping = {
-                'excel_path': 'excel_file_path',
-                'error_message': 'error_message',
-                'user_config': 'user_config',
-                'processed_by': 'processed_by',
-                'retry_count': 'retry_count'
-            }
-
-            for key, db_field in field_mapping.items():
-                if key in kwargs:
-                    update_fields.append(f'{db_field} = ?')
-                    value = kwargs[key]
-                    # JSON encode user_config if it's a dict
-                    if key == 'user_config' and isinstance(value, dict):
-                        value = json.dumps(value)
-                    update_values.append(value)
-
+            update_sql, update_values = self._build_status_update(status, kwargs)
             update_values.append(workflow_id)
 
-            update_sql = f"""
-            UPDATE ref.Excel_Workflow_Tracking
-            SET {', '.join(update_fields)}
-            WHERE workflow_id = ?
-            """
-
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(update_sql, update_values)
-                rows_affected = cursor.rowcount
-                conn.commit()
+            rows_affected = self._execute(update_sql, update_values, handler=lambda cursor: cursor.rowcount)
 
             if rows_affected == 0:
                 self.logger.warning(f"No workflow found with ID: {workflow_id}")
                 return False
 
-            # Update in-memory tracking
-            if workflow_id in self.active_workflows:
-                self.active_workflows[workflow_id]['current_status'] = status
-                self.active_workflows[workflow_id]['last_checked'] = datetime.now()
-
-                if 'excel_path' in kwargs:
-                    self.active_workflows[workflow_id]['excel_path'] = kwargs['excel_path']
-                if 'retry_count' in kwargs:
-                    self.active_workflows[workflow_id]['retry_count'] = kwargs['retry_count']
+            self._track_status(workflow_id, status, kwargs)
 
             self.logger.info(f"Updated workflow {workflow_id} to status: {status}")
             return True
@@ -203,6 +232,94 @@ class WorkflowManager:
             self.logger.error(f"Failed to update workflow {workflow_id}: {str(e)}")
             return False
 
+    def update_statuses(self, workflow_ids: List[str], status: str, **kwargs) -> bool:
+        """
+        Move several workflows to the same status in one batched statement
+
+        Args:
+            workflow_ids: Workflow identifiers
+            status: New status from STATES
+            **kwargs: Additional fields to update, applied to every workflow (see update_status)
+
+        Returns:
+            True if the batch was applied
+        """
+        workflow_ids = list(dict.fromkeys(workflow_ids))
+        if not workflow_ids:
+            return True
+
+        try:
+            update_sql, update_values = self._build_status_update(status, kwargs)
+            params = [update_values + [workflow_id] for workflow_id in workflow_ids]
+
+            self._execute(update_sql, params, batch=True)
+
+            for workflow_id in workflow_ids:
+                self._track_status(workflow_id, status, kwargs)
+
+            self.logger.info(f"Updated {len(workflow_ids)} workflows to status: {status}")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Failed to update {len(workflow_ids)} workflows to {status}: {str(e)}")
+            return False
+
+    def _build_status_update(self, status: str, kwargs: Dict[str, Any]):
+        """Build the UPDATE statement and its SET values (without the workflow_id) for a status change"""
+        if status not in self.STATES.values():
+            raise ValueError(f"Invalid workflow status: {status}")
+
+        # Build update query dynamically based on provided kwargs
+        update_fields = ['status = ?']
+        update_values = [status]
+
+        # Add timestamp fields based on status
+        if status == self.STATES['EXCEL_GENERATED']:
+            update_fields.append('excel_generated_at = ?')
+            update_values.append(datetime.now())
+        elif status == self.STATES['APPROVED']:
+            update_fields.append('approved_at = ?')
+            update_values.append(datetime.now())
+        elif status == self.STATES['COMPLETED']:
+            update_fields.append('completed_at = ?')
+            update_values.append(datetime.now())
+
+        # Add optional fields
+        field_mapping = {
+            'excel_path': 'excel_file_path',
+            'error_message': 'error_message',
+            'user_config': 'user_config',
+            'processed_by': 'processed_by',
+            'retry_count': 'retry_count'
+        }
+
+        for key, db_field in field_mapping.items():
+            if key in kwargs:
+                update_fields.append(f'{db_field} = ?')
+                value = kwargs[key]
+                # JSON encode user_config if it's a dict
+                if key == 'user_config' and isinstance(value, dict):
+                    value = json.dumps(value)
+                update_values.append(value)
+
+        update_sql = f"""
+            UPDATE ref.Excel_Workflow_Tracking
+            SET {', '.join(update_fields)}
+            WHERE workflow_id = ?
+            """
+        return update_sql, update_values
+
+    def _track_status(self, workflow_id: str, status: str, kwargs: Dict[str, Any]):
+        """Update in-memory tracking after a status change"""
+        if workflow_id in self.active_workflows:
+            self.active_workflows[workflow_id]['current_status'] = status
+            self.active_workflows[workflow_id]['last_checked'] = datetime.now()
+
+            if 'excel_path' in kwargs:
+                self.active_workflows[workflow_id]['excel_path'] = kwargs['excel_path']
+            if 'retry_count' in kwargs:
+                self.active_workflows[workflow_id]['retry_count'] = kwargs['retry_count']
+
     def get_workflow_status(self, workflow_id: str) -> Optional[Dict[str, Any]]:
         """
         Get current workflow status and details
@@ -222,16 +339,14 @@ class WorkflowManager:
             WHERE workflow_id = ?
             """
 
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(query_sql, (workflow_id,))
-                row = cursor.fetchone()
+            # Drain the whole result set: a pending one keeps the shared connection busy (no MARS)
+            rows, columns = self._execute(query_sql, (workflow_id,), handler=self._fetch_all)
 
-            if not row:
+            if not rows:
                 return None
+            row = rows[0]
 
             # Convert row to dictionary
-            columns = [desc[0] for desc in cursor.description]
             workflow_data = dict(zip(columns, row))
 
             # Parse JSON config if present
@@ -292,16 +407,12 @@ class WorkflowManager:
             ORDER BY created_at ASC
             """
 
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(query_sql, (
-                    self.STATES['PENDING_EXCEL'],
-                    self.STATES['EXCEL_GENERATED']
-                ))
-                rows = cursor.fetchall()
+            rows, columns = self._execute(
+                query_sql, (self.STATES['PENDING_EXCEL'], self.STATES['EXCEL_GENERATED']),
+                handler=self._fetch_all
+            )
 
             # Convert rows to dictionaries
-            columns = [desc[0] for desc in cursor.description]
             workflows = [dict(zip(columns, row)) for row in rows]
 
             return workflows
@@ -326,13 +437,9 @@ class WorkflowManager:
             ORDER BY approved_at ASC
             """
 
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(query_sql, (self.STATES['APPROVED'],))
-                rows = cursor.fetchall()
+            rows, columns = self._execute(query_sql, (self.STATES['APPROVED'],), handler=self._fetch_all)
 
             # Convert rows to dictionaries
-            columns = [desc[0] for desc in cursor.description]
             workflows = []
 
             for row in rows:
@@ -353,6 +460,37 @@ class WorkflowManager:
             self.logger.error(f"Failed to get approved workflows: {str(e)}")
             return []
 
+    def get_active_file_paths(self) -> Optional[Set[str]]:
+        """
+        Get the CSV paths of all workflows that are not yet completed or in error
+
+        Returns:
+            Set of csv_file_path values, or None if the query failed
+        """
+        try:
+            query_sql = """
+            SELECT DISTINCT csv_file_path
+            FROM ref.Excel_Workflow_Tracking
+            WHERE status NOT IN (?, ?)
+            """
+
+            rows, _ = self._execute(
+                query_sql, (self.STATES['COMPLETED'], self.STATES['ERROR']),
+                handler=self._fetch_all
+            )
+
+            return {row[0] for row in rows}
+
+        except Exception as e:
+            self.logger.error(f"Failed to get active workflow file paths: {str(e)}")
+            return None
+
+    @staticmethod
+    def _fetch_all(cursor):
+        """Fetch all rows and the column names of the cursor's result set"""
+        rows = cursor.fetchall()
+        return rows, [desc[0] for desc in cursor.description or []]
+
     def cleanup_completed_workflows(self, days_old: int = 7) -> int:
         """
         Clean up completed workflows older than specified days
@@ -371,11 +509,10 @@ class WorkflowManager:
             WHERE status = ? AND completed_at < ?
             """
 
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(delete_sql, (self.STATES['COMPLETED'], cutoff_date))
-                deleted_count = cursor.rowcount
-                conn.commit()
+            deleted_count = self._execute(
+                delete_sql, (self.STATES['COMPLETED'], cutoff_date),
+                handler=lambda cursor: cursor.rowcount
+            )
 
             self.logger.info(f"Cleaned up {deleted_count} completed workflows older than {days_old} days")
             return deleted_count
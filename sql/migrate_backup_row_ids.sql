@@ -0,0 +1,50 @@
+-- One-off migration: add the keyset pagination row id and clustered index to existing backup tables
+--
+-- Backup tables created by the application already have [ref_data_backup_row_id] and the clustered
+-- index on ([ref_data_version_id], [ref_data_backup_row_id]). Tables created before that are paged by
+-- OFFSET until this script has run. Both statements rebuild the table and hold a schema lock for the
+-- duration, so run it in a maintenance window, not during ingestion. It is safe to re-run.
+
+DECLARE @backup_schema SYSNAME = N'bkp';  -- database.backup_schema in config.yaml
+DECLARE @table_name SYSNAME;
+DECLARE @sql NVARCHAR(MAX);
+
+DECLARE backup_tables CURSOR LOCAL FAST_FORWARD FOR
+    SELECT t.name
+    FROM sys.tables AS t
+    WHERE t.schema_id = SCHEMA_ID(@backup_schema)
+      AND t.name LIKE N'%[_]backup'
+    ORDER BY t.name;
+
+OPEN backup_tables;
+FETCH NEXT FROM backup_tables INTO @table_name;
+
+WHILE @@FETCH_STATUS = 0
+BEGIN
+    IF COL_LENGTH(QUOTENAME(@backup_schema) + N'.' + QUOTENAME(@table_name), N'ref_data_backup_row_id') IS NULL
+    BEGIN
+        SET @sql = N'ALTER TABLE ' + QUOTENAME(@backup_schema) + N'.' + QUOTENAME(@table_name) +
+                   N' ADD [ref_data_backup_row_id] bigint IDENTITY(1,1) NOT NULL';
+        EXEC sp_executesql @sql;
+        PRINT 'Added ref_data_backup_row_id to ' + @backup_schema + '.' + @table_name;
+    END
+
+    IF NOT EXISTS (
+        SELECT 1 FROM sys.indexes
+        WHERE object_id = OBJECT_ID(QUOTENAME(@backup_schema) + N'.' + QUOTENAME(@table_name)) AND type = 1
+    )
+    BEGIN
+        SET @sql = N'CREATE CLUSTERED INDEX ' + QUOTENAME(N'cx_' + @table_name + N'_version_row') +
+                   N' ON ' + QUOTENAME(@backup_schema) + N'.' + QUOTENAME(@table_name) +
+                   N' ([ref_data_version_id], [ref_data_backup_row_id])';
+        EXEC sp_executesql @sql;
+        PRINT 'Created clustered index on ' + @backup_schema + '.' + @table_name;
+    END
+
+    FETCH NEXT FROM backup_tables INTO @table_name;
+END
+
+CLOSE backup_tables;
+DEALLOCATE backup_tables;
+
+PRINT 'Backup row id migration complete';